@@ -12,6 +12,7 @@ from stack.app.schema.rag import (
     IngestRequestPayload,
     QueryRequestPayload,
     QueryResponsePayload,
+    ResumeIngestRequestPayload,
 )
 from stack.app.repositories.assistant import (
     get_assistant_repository,
@@ -31,6 +32,25 @@ from stack.app.core.datastore import get_redis_connection
 from stack.app.rag.embedding_service import EmbeddingService
 from stack.app.core.redis import RedisService, get_redis_service
 from stack.app.utils.stream import ingest_task_event_generator
+from stack.app.cache.embedding_cache import get_embedding_cache
+from stack.app.cache.summary_cache import get_summary_cache
+from stack.app.workers.queue import IngestionJobQueue
+from stack.app.rag.checkpoints import (
+    CHUNKS_STAGE,
+    CHUNKS_UPSERTED_STAGE,
+    EMBEDDINGS_STAGE,
+    PAYLOAD_STAGE,
+    STALE_POINTS_DELETED_STAGE,
+    SUMMARIES_STAGE,
+    SUMMARIES_UPSERTED_STAGE,
+    IngestionCheckpoints,
+    dump_chunks,
+    dump_embeddings,
+    dump_payload,
+    get_ingestion_checkpoints,
+    load_chunks,
+    restore_embeddings,
+)
 
 
 logger = structlog.get_logger()
@@ -57,9 +77,10 @@ async def prepare_files(
             if not assistant:
                 raise ValueError(f"Assistant with ID {payload.namespace} not found.")
             existing_file_ids: set = set(assistant.file_ids or [])
-            new_file_ids = set(str(file_id) for file_id in payload.files) - set(
-                existing_file_ids
-            )
+            new_file_ids = set(str(file_id) for file_id in payload.files)
+            # Incremental ingestion diffs files that are already attached
+            if not payload.incremental:
+                new_file_ids -= set(existing_file_ids)
             if not new_file_ids:
                 await redis_service.set_ingestion_status(task_id, "completed")
                 await redis_service.push_progress_message(
@@ -90,30 +111,162 @@ async def prepare_files(
         raise
 
 
-async def generate_chunks_and_summaries(
+async def generate_chunks(
     task_id: str,
     embedding_service: EmbeddingService,
     payload: IngestRequestPayload,
     redis_service: RedisService,
-) -> tuple[list[BaseDocumentChunk], Optional[list[BaseDocumentChunk]]]:
-    try:
-        await redis_service.push_progress_message(task_id, "Generating chunks")
-        chunks = await embedding_service.generate_chunks(payload.document_processor)
+) -> tuple[
+    list[BaseDocumentChunk], list[BaseDocumentChunk], dict[str, list[str]]
+]:
+    """Generate the chunks of all files and the chunks to upsert.
+
+    In incremental mode only chunks that are not indexed yet are upserted,
+    and the ids of stale points per index are returned with them. Files that
+    could not be chunked are removed from `payload.files`.
+    """
+    await redis_service.push_progress_message(task_id, "Generating chunks")
+    all_chunks = await embedding_service.generate_chunks(payload.document_processor)
+    await redis_service.push_progress_message(
+        task_id, f"Generated {len(all_chunks)} chunks"
+    )
+    if embedding_service.failed_file_ids:
+        failed_file_ids = set(embedding_service.failed_file_ids)
+        payload.files = [
+            file_id for file_id in payload.files if str(file_id) not in failed_file_ids
+        ]
+
+    chunks = all_chunks
+    stale_point_ids: dict[str, list[str]] = {}
+    if payload.incremental:
+        chunks, stale_point_ids[
+            payload.index_name
+        ] = await embedding_service.diff_against_index(
+            all_chunks, index_name=payload.index_name
+        )
         await redis_service.push_progress_message(
-            task_id, f"Generated {len(chunks)} chunks"
+            task_id,
+            f"{len(chunks)} new chunks, "
+            f"{len(stale_point_ids[payload.index_name])} removed chunks",
         )
 
-        summary_documents = None
-        if payload.document_processor and payload.document_processor.summarize:
-            await redis_service.push_progress_message(task_id, "Generating summaries")
-            summary_documents = await embedding_service.generate_summary_documents(
-                chunks
+    deduplication = (
+        payload.document_processor.deduplication
+        if payload.document_processor
+        else None
+    )
+    if deduplication and deduplication.enabled:
+        chunks = await embedding_service.remove_near_duplicates(
+            chunks,
+            deduplication,
+            index_name=payload.index_name,
+            exclude_point_ids=stale_point_ids.get(payload.index_name),
+        )
+        await redis_service.push_progress_message(
+            task_id, f"{len(chunks)} chunks left after removing near-duplicates"
+        )
+    return all_chunks, chunks, stale_point_ids
+
+
+async def generate_summaries(
+    task_id: str,
+    embedding_service: EmbeddingService,
+    payload: IngestRequestPayload,
+    all_chunks: list[BaseDocumentChunk],
+    stale_point_ids: dict[str, list[str]],
+    redis_service: RedisService,
+) -> list[BaseDocumentChunk]:
+    """Summarize the pages of all files. In incremental mode only pages that
+    are not summarized yet are, and the ids of stale summaries are added to
+    `stale_point_ids`."""
+    await redis_service.push_progress_message(task_id, "Generating summaries")
+    if payload.incremental:
+        summary_index_name = f"{payload.index_name}_summary"
+        (
+            summary_documents,
+            stale_point_ids[summary_index_name],
+        ) = await embedding_service.generate_incremental_summary_documents(
+            all_chunks, index_name=summary_index_name
+        )
+    else:
+        summary_documents = await embedding_service.generate_summary_documents(
+            all_chunks
+        )
+    await redis_service.push_progress_message(
+        task_id, f"Generated {len(summary_documents)} summaries"
+    )
+    return summary_documents
+
+
+async def generate_chunks_and_summaries(
+    task_id: str,
+    embedding_service: EmbeddingService,
+    payload: IngestRequestPayload,
+    redis_service: RedisService,
+    checkpoints: IngestionCheckpoints,
+) -> tuple[
+    list[BaseDocumentChunk], Optional[list[BaseDocumentChunk]], dict[str, list[str]]
+]:
+    """Generate the chunks and summaries to upsert.
+
+    In incremental mode only chunks and summaries that are not indexed yet
+    are returned, together with the ids of stale points per index. Both
+    stages are checkpointed and loaded from their checkpoint when resumed.
+    """
+    try:
+        checkpoint = await checkpoints.load(CHUNKS_STAGE)
+        if checkpoint is None:
+            all_chunks, chunks, stale_point_ids = await generate_chunks(
+                task_id, embedding_service, payload, redis_service
             )
+            await checkpoints.save(
+                CHUNKS_STAGE,
+                {
+                    "files": [str(file_id) for file_id in payload.files],
+                    "failed_files": embedding_service.failed_file_ids,
+                    "all_chunks": dump_chunks(all_chunks),
+                    "chunk_ids": [chunk.id for chunk in chunks],
+                    "stale_point_ids": stale_point_ids,
+                },
+            )
+        else:
+            all_chunks = load_chunks(checkpoint["all_chunks"])
+            embedding_service.failed_file_ids = checkpoint.get("failed_files", [])
+            chunk_ids = set(checkpoint["chunk_ids"])
+            chunks = [chunk for chunk in all_chunks if chunk.id in chunk_ids]
+            stale_point_ids = checkpoint["stale_point_ids"]
             await redis_service.push_progress_message(
-                task_id, f"Generated {len(summary_documents)} summaries"
+                task_id, f"Loaded {len(chunks)} chunks from checkpoint"
             )
 
-        return chunks, summary_documents
+        summary_documents = None
+        if payload.document_processor and payload.document_processor.summarize:
+            checkpoint = await checkpoints.load(SUMMARIES_STAGE)
+            if checkpoint is None:
+                summary_documents = await generate_summaries(
+                    task_id,
+                    embedding_service,
+                    payload,
+                    all_chunks,
+                    stale_point_ids,
+                    redis_service,
+                )
+                await checkpoints.save(
+                    SUMMARIES_STAGE,
+                    {
+                        "summary_documents": dump_chunks(summary_documents),
+                        "stale_point_ids": stale_point_ids,
+                    },
+                )
+            else:
+                summary_documents = load_chunks(checkpoint["summary_documents"])
+                stale_point_ids = checkpoint["stale_point_ids"]
+                await redis_service.push_progress_message(
+                    task_id,
+                    f"Loaded {len(summary_documents)} summaries from checkpoint",
+                )
+
+        return chunks, summary_documents, stale_point_ids
     except Exception as e:
         logger.exception(f"Error in generate_chunks_and_summaries: {str(e)}")
         await redis_service.push_progress_message(
@@ -129,25 +282,44 @@ async def embed_and_upsert(
     chunks: list[BaseDocumentChunk],
     summary_documents: Optional[list[BaseDocumentChunk]],
     redis_service: RedisService,
+    checkpoints: IngestionCheckpoints,
 ) -> None:
+    """Embed and upsert the chunks, then the summaries. If either fails, the
+    vectors computed so far are checkpointed, so a retry only embeds the
+    chunks that have none."""
     try:
-        await redis_service.push_progress_message(
-            task_id, "Embedding and upserting chunks"
-        )
-        await embedding_service.embed_and_upsert(
-            chunks=chunks,
-            encoder=payload.document_processor.encoder.get_encoder()
-            if payload.document_processor
-            else None,
-            index_name=payload.index_name,
-            task_id=task_id,
-            redis_service=redis_service,
-        )
-        await redis_service.push_progress_message(
-            task_id, "Completed embedding and upserting chunks"
-        )
+        embeddings = await checkpoints.load(EMBEDDINGS_STAGE)
+        if embeddings is not None:
+            restored = restore_embeddings(chunks, embeddings["chunks"])
+            restored += restore_embeddings(
+                summary_documents or [], embeddings["summaries"]
+            )
+            await redis_service.push_progress_message(
+                task_id, f"Loaded {restored} embeddings from checkpoint"
+            )
+
+        if await checkpoints.load(CHUNKS_UPSERTED_STAGE) is None:
+            await redis_service.push_progress_message(
+                task_id, "Embedding and upserting chunks"
+            )
+            await embedding_service.embed_and_upsert(
+                chunks=chunks,
+                encoder=payload.document_processor.encoder.get_encoder()
+                if payload.document_processor
+                else None,
+                index_name=payload.index_name,
+                task_id=task_id,
+                redis_service=redis_service,
+            )
+            await checkpoints.save(CHUNKS_UPSERTED_STAGE, len(chunks))
+            await redis_service.push_progress_message(
+                task_id, "Completed embedding and upserting chunks"
+            )
 
-        if summary_documents:
+        if (
+            summary_documents
+            and await checkpoints.load(SUMMARIES_UPSERTED_STAGE) is None
+        ):
             await redis_service.push_progress_message(
                 task_id, "Embedding and upserting summaries"
             )
@@ -158,6 +330,7 @@ async def embed_and_upsert(
                 task_id=task_id,
                 redis_service=redis_service,
             )
+            await checkpoints.save(SUMMARIES_UPSERTED_STAGE, len(summary_documents))
             await redis_service.push_progress_message(
                 task_id, "Completed embedding and upserting summaries"
             )
@@ -166,6 +339,46 @@ async def embed_and_upsert(
         await redis_service.push_progress_message(
             task_id, f"Error embedding and upserting: {str(e)}"
         )
+        try:
+            await checkpoints.save(
+                EMBEDDINGS_STAGE,
+                {
+                    "chunks": dump_embeddings(chunks),
+                    "summaries": dump_embeddings(summary_documents or []),
+                },
+            )
+        except Exception as checkpoint_error:
+            logger.exception(
+                f"Error checkpointing embeddings: {str(checkpoint_error)}"
+            )
+        raise
+
+
+async def delete_stale_points(
+    task_id: str,
+    embedding_service: EmbeddingService,
+    stale_point_ids: dict[str, list[str]],
+    redis_service: RedisService,
+    checkpoints: IngestionCheckpoints,
+) -> None:
+    try:
+        if await checkpoints.load(STALE_POINTS_DELETED_STAGE) is not None:
+            return
+        for index_name, point_ids in stale_point_ids.items():
+            if point_ids:
+                await redis_service.push_progress_message(
+                    task_id, f"Deleting {len(point_ids)} stale chunks from {index_name}"
+                )
+                await embedding_service.delete_points(point_ids, index_name=index_name)
+        await checkpoints.save(
+            STALE_POINTS_DELETED_STAGE,
+            sum(len(point_ids) for point_ids in stale_point_ids.values()),
+        )
+    except Exception as e:
+        logger.exception(f"Error in delete_stale_points: {str(e)}")
+        await redis_service.push_progress_message(
+            task_id, f"Error deleting stale chunks: {str(e)}"
+        )
         raise
 
 
@@ -193,7 +406,11 @@ async def update_assistant(
 
 
 async def notify_webhook(
-    webhook_url: str, collection_name: str, namespace: str, file_ids: List[str]
+    webhook_url: str,
+    collection_name: str,
+    namespace: str,
+    file_ids: List[str],
+    failed_file_ids: Optional[List[str]] = None,
 ) -> None:
     try:
         async with aiohttp.ClientSession() as session:
@@ -201,9 +418,12 @@ async def notify_webhook(
                 url=webhook_url,
                 json={
                     "index_name": collection_name,
-                    "status": "completed",
+                    "status": "partially_completed"
+                    if failed_file_ids
+                    else "completed",
                     "namespace": namespace,
                     "file_ids": file_ids,
+                    "failed_file_ids": failed_file_ids or [],
                 },
             )
     except Exception as e:
@@ -217,16 +437,36 @@ async def process_ingestion(
     file_repository: FileRepository,
     assistant_repository: AssistantRepository,
     redis_service: RedisService,
+    raise_errors: bool = False,
 ) -> None:
+    """Run the ingestion pipeline for a task.
+
+    Failures mark the task as failed, unless `raise_errors` is set, in which
+    case they are re-raised so the queue worker can retry the job. Stages
+    completed by an earlier attempt of the task are skipped.
+    """
     redis = await get_redis_connection()
+    checkpoints = get_ingestion_checkpoints(task_id)
     try:
         await redis_service.set_ingestion_status(task_id, "started")
+        if await checkpoints.load(PAYLOAD_STAGE) is None:
+            await checkpoints.save(PAYLOAD_STAGE, dump_payload(payload))
 
-        files_to_ingest, is_assistant = await prepare_files(
-            task_id, payload, file_repository, assistant_repository, redis_service
-        )
-        if files_to_ingest is None:
-            return
+        chunks_checkpoint = await checkpoints.load(CHUNKS_STAGE)
+        if chunks_checkpoint is None:
+            files_to_ingest, is_assistant = await prepare_files(
+                task_id, payload, file_repository, assistant_repository, redis_service
+            )
+            if files_to_ingest is None:
+                await checkpoints.clear()
+                return
+        else:
+            # The files were chunked by an earlier attempt
+            await redis_service.push_progress_message(
+                task_id, "Resuming ingestion from checkpoint"
+            )
+            payload.files = chunks_checkpoint["files"]
+            files_to_ingest, is_assistant = [], payload.purpose == "assistants"
 
         embedding_service = EmbeddingService(
             index_name=payload.index_name,
@@ -245,8 +485,12 @@ async def process_ingestion(
             redis_service=redis_service,
         )
 
-        chunks, summary_documents = await generate_chunks_and_summaries(
-            task_id, embedding_service, payload, redis_service
+        (
+            chunks,
+            summary_documents,
+            stale_point_ids,
+        ) = await generate_chunks_and_summaries(
+            task_id, embedding_service, payload, redis_service, checkpoints
         )
 
         await embed_and_upsert(
@@ -256,6 +500,12 @@ async def process_ingestion(
             chunks,
             summary_documents,
             redis_service,
+            checkpoints,
+        )
+
+        # Stale points are only removed once their replacements are stored
+        await delete_stale_points(
+            task_id, embedding_service, stale_point_ids, redis_service, checkpoints
         )
 
         if is_assistant:
@@ -270,15 +520,29 @@ async def process_ingestion(
                 payload.index_name,
                 payload.namespace,
                 payload.files,
+                embedding_service.failed_file_ids,
             )
 
-        await redis_service.set_ingestion_status(task_id, "completed")
-        await redis_service.push_progress_message(
-            task_id, "Ingestion process completed successfully"
-        )
+        await checkpoints.clear()
+        if embedding_service.failed_file_ids:
+            # The failed files are not attached, so ingesting them again
+            # only processes those
+            await redis_service.set_ingestion_status(task_id, "partially_completed")
+            await redis_service.push_progress_message(
+                task_id,
+                "Ingestion process completed, except for files "
+                f"{', '.join(embedding_service.failed_file_ids)}",
+            )
+        else:
+            await redis_service.set_ingestion_status(task_id, "completed")
+            await redis_service.push_progress_message(
+                task_id, "Ingestion process completed successfully"
+            )
 
     except Exception as e:
         logger.exception(f"Error during ingestion process: {str(e)}")
+        if raise_errors:
+            raise
         await redis_service.set_ingestion_status(task_id, "failed")
         await redis_service.push_progress_message(task_id, f"Error: {str(e)}")
     finally:
@@ -303,6 +567,9 @@ async def ingest(
 ) -> dict:
     try:
         task_id = str(uuid4())
+        if settings.INGESTION_QUEUE_ENABLED:
+            await IngestionJobQueue(redis_service.redis).enqueue(task_id, payload)
+            return {"task_id": task_id, "status": "queued"}
         background_tasks.add_task(
             process_ingestion,
             task_id,
@@ -319,6 +586,57 @@ async def ingest(
         )
 
 
+@router.post(
+    "/ingest/{task_id}/resume",
+    tags=[DEFAULT_TAG],
+    response_model=dict,
+    operation_id="resume_ingestion_task",
+    summary="Resume a failed ingestion task.",
+    description="""
+                Runs a failed ingestion task again, skipping the stages it
+                completed before failing. Requires ingestion checkpoints to
+                be enabled with INGESTION_CHECKPOINT_BACKEND. Credentials are
+                not stored with the checkpoints and are supplied again.
+                """,
+)
+async def resume_ingestion(
+    auth: AuthenticatedUser,
+    task_id: str,
+    resume_payload: ResumeIngestRequestPayload,
+    background_tasks: BackgroundTasks,
+    file_repository: FileRepository = Depends(get_file_repository),
+    assistant_repository: AssistantRepository = Depends(get_assistant_repository),
+    redis_service: RedisService = Depends(get_redis_service),
+) -> dict:
+    status = await redis_service.get_ingestion_status(task_id)
+    if status != "failed":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Only failed tasks can be resumed, task {task_id} is {status}",
+        )
+    stored_payload = await get_ingestion_checkpoints(task_id).load(PAYLOAD_STAGE)
+    if stored_payload is None:
+        raise HTTPException(
+            status_code=404, detail=f"No checkpoints found for task {task_id}"
+        )
+
+    payload = IngestRequestPayload.model_validate(
+        {**stored_payload, **resume_payload.model_dump()}
+    )
+    if settings.INGESTION_QUEUE_ENABLED:
+        await IngestionJobQueue(redis_service.redis).enqueue(task_id, payload)
+        return {"task_id": task_id, "status": "queued"}
+    background_tasks.add_task(
+        process_ingestion,
+        task_id,
+        payload,
+        file_repository,
+        assistant_repository,
+        redis_service,
+    )
+    return {"task_id": task_id, "status": "started"}
+
+
 @router.get(
     "/ingest/{task_id}/progress",
     tags=[DEFAULT_TAG],
@@ -362,6 +680,36 @@ async def query(auth: AuthenticatedUser, payload: QueryRequestPayload):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get(
+    "/embedding-cache/stats",
+    tags=[DEFAULT_TAG],
+    response_model=dict,
+    operation_id="embedding_cache_stats",
+    summary="Get embedding cache statistics.",
+    description="Returns hit and miss counters of the embedding cache for this worker.",
+)
+async def embedding_cache_stats(auth: AuthenticatedUser) -> dict:
+    embedding_cache = get_embedding_cache()
+    if embedding_cache is None:
+        return {"backend": "none", "hits": 0, "misses": 0, "hit_ratio": 0.0}
+    return embedding_cache.stats()
+
+
+@router.get(
+    "/summary-cache/stats",
+    tags=[DEFAULT_TAG],
+    response_model=dict,
+    operation_id="summary_cache_stats",
+    summary="Get summary cache statistics.",
+    description="Returns hit and miss counters of the summary cache for this worker.",
+)
+async def summary_cache_stats(auth: AuthenticatedUser) -> dict:
+    summary_cache = get_summary_cache()
+    if summary_cache is None:
+        return {"backend": "none", "hits": 0, "misses": 0, "hit_ratio": 0.0}
+    return summary_cache.stats()
+
+
 # Temp -> Used for testing the custom langchain retriever
 @router.post("/query-lc-retriever", tags=[DEFAULT_TAG])
 async def query_lc_retriever(auth: AuthenticatedUser, payload: QueryRequestPayload):
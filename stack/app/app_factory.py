@@ -24,6 +24,9 @@ from stack.app.core.datastore import (
     initialize_checkpointer,
     get_checkpointer,
 )
+from stack.app.rag.partition import shutdown_partition_executor
+from stack.app.rag.cpu_executor import shutdown_process_pool
+from stack.app.vectordbs.qdrant import close_qdrant_clients
 
 
 def get_lifespan() -> Callable:
@@ -60,6 +63,9 @@ def get_lifespan() -> Callable:
             yield
         finally:
             await cleanup_db()
+            shutdown_partition_executor()
+            shutdown_process_pool()
+            await close_qdrant_clients()
 
             try:
                 checkpointer = get_checkpointer()
@@ -0,0 +1,173 @@
+"""
+backends.py
+----------
+
+Size-bounded key-value stores shared by the content-addressed caches.
+Values are opaque bytes, and the least recently used ones are evicted once
+the stored values exceed `max_size_bytes`.
+"""
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import structlog
+from redis.asyncio import Redis
+
+logger = structlog.get_logger()
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_cache_key(namespace: str, text: str) -> str:
+    text_hash = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{namespace}:{text_hash}"
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        pass
+
+    @abstractmethod
+    async def set_many(self, items: dict[str, bytes]) -> None:
+        pass
+
+
+class DiskCacheBackend(CacheBackend):
+    """SQLite-backed store of the values of one cache, in table `table`."""
+
+    def __init__(self, path: Path, max_size_bytes: int, table: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = max_size_bytes
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_accessed_at "
+            f"ON {self.table} (accessed_at)"
+        )
+        self._conn.commit()
+
+    def _get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        with self._lock:
+            placeholders = ",".join("?" * len(keys))
+            rows = dict(
+                self._conn.execute(
+                    f"SELECT key, value FROM {self.table} "
+                    f"WHERE key IN ({placeholders})",
+                    keys,
+                ).fetchall()
+            )
+            if rows:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                    [(now, key) for key in rows],
+                )
+                self._conn.commit()
+        return [rows.get(key) for key in keys]
+
+    def _set_many(self, items: dict[str, bytes]) -> None:
+        with self._lock:
+            now = time.time()
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, value, len(value), now) for key, value in items.items()],
+            )
+            (total_size,) = self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+            if total_size > self.max_size_bytes:
+                self._evict(total_size - self.max_size_bytes)
+            self._conn.commit()
+
+    def _evict(self, excess_bytes: int) -> None:
+        evicted, keys = 0, []
+        for key, size in self._conn.execute(
+            f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC"
+        ):
+            keys.append((key,))
+            evicted += size
+            if evicted >= excess_bytes:
+                break
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", keys)
+        logger.debug(f"Evicted {len(keys)} {self.table} from the disk cache")
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return await asyncio.to_thread(self._get_many, keys)
+
+    async def set_many(self, items: dict[str, bytes]) -> None:
+        await asyncio.to_thread(self._set_many, items)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis-backed store of the values of one cache, under keys starting
+    with `prefix`. Access times are tracked in a sorted set to find the
+    least recently used values."""
+
+    def __init__(self, redis: Redis, max_size_bytes: int, prefix: str):
+        self.redis = redis
+        self.max_size_bytes = max_size_bytes
+        self.prefix = prefix
+        self.lru_key = f"{self.prefix}:lru"
+        self.size_key = f"{self.prefix}:size"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        values = await self.redis.mget([self._key(key) for key in keys])
+        hits = {key: time.time() for key, value in zip(keys, values) if value}
+        if hits:
+            await self.redis.zadd(self.lru_key, hits)
+        return values
+
+    async def set_many(self, items: dict[str, bytes]) -> None:
+        # Keys are content addressed, so an existing key already holds the
+        # value and only the keys actually inserted add to the stored size
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self._key(key), value, nx=True)
+            pipe.zadd(self.lru_key, {key: time.time() for key in items})
+            *inserted, _ = await pipe.execute()
+        inserted_size = sum(
+            len(value)
+            for value, was_inserted in zip(items.values(), inserted)
+            if was_inserted
+        )
+        if not inserted_size:
+            return
+        total_size = await self.redis.incrby(self.size_key, inserted_size)
+        if total_size > self.max_size_bytes:
+            await self._evict(total_size - self.max_size_bytes)
+
+    async def _evict(self, excess_bytes: int) -> None:
+        evicted = 0
+        while evicted < excess_bytes:
+            oldest = await self.redis.zpopmin(self.lru_key, count=100)
+            if not oldest:
+                break
+            keys = [self._key(key.decode("utf-8")) for key, _ in oldest]
+            sizes = await asyncio.gather(*[self.redis.strlen(key) for key in keys])
+            await self.redis.delete(*keys)
+            evicted += sum(sizes)
+        await self.redis.decrby(self.size_key, evicted)
+        logger.debug(f"Evicted {evicted} bytes from the redis cache {self.prefix}")
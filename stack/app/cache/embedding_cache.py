@@ -0,0 +1,113 @@
+"""
+embedding_cache.py
+----------
+
+Content-addressed cache of embedding vectors, keyed by encoder provider,
+model, dimensions and a hash of the normalized input text.
+"""
+from typing import Optional
+
+import numpy as np
+from redis.asyncio import Redis
+from semantic_router.encoders import BaseEncoder
+
+from stack.app.cache.backends import (
+    CacheBackend,
+    DiskCacheBackend,
+    RedisCacheBackend,
+    make_cache_key,
+)
+from stack.app.core.configuration import get_settings
+
+settings = get_settings()
+
+
+def get_encoder_namespace(encoder: BaseEncoder) -> str:
+    """Identify the vector space produced by an encoder."""
+    return ":".join(
+        [
+            str(getattr(encoder, "type", type(encoder).__name__)),
+            str(getattr(encoder, "name", "")),
+            str(getattr(encoder, "dimensions", "")),
+        ]
+    )
+
+
+def _to_bytes(vector: list[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _from_bytes(data: bytes) -> list[float]:
+    return np.frombuffer(data, dtype=np.float32).tolist()
+
+
+class EmbeddingCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get_many(
+        self, encoder: BaseEncoder, texts: list[str]
+    ) -> list[Optional[list[float]]]:
+        namespace = get_encoder_namespace(encoder)
+        values = await self.backend.get_many(
+            [make_cache_key(namespace, text) for text in texts]
+        )
+        vectors = [_from_bytes(value) if value else None for value in values]
+        hits = sum(vector is not None for vector in vectors)
+        self.hits += hits
+        self.misses += len(vectors) - hits
+        return vectors
+
+    async def set_many(
+        self, encoder: BaseEncoder, texts: list[str], vectors: list[list[float]]
+    ) -> None:
+        namespace = get_encoder_namespace(encoder)
+        await self.backend.set_many(
+            {
+                make_cache_key(namespace, text): _to_bytes(vector)
+                for text, vector in zip(texts, vectors)
+            }
+        )
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": settings.EMBEDDING_CACHE_BACKEND,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the configured embedding cache, or None if caching is
+    disabled."""
+    global _embedding_cache
+    if _embedding_cache is not None:
+        return _embedding_cache
+
+    backend_name = settings.EMBEDDING_CACHE_BACKEND
+    if backend_name == "redis":
+        backend = RedisCacheBackend(
+            Redis.from_url(settings.REDIS_URL),
+            max_size_bytes=settings.EMBEDDING_CACHE_MAX_SIZE_BYTES,
+            prefix="embedding_cache",
+        )
+    elif backend_name == "disk":
+        backend = DiskCacheBackend(
+            settings.EMBEDDING_CACHE_DIRECTORY.joinpath("embeddings.sqlite3"),
+            max_size_bytes=settings.EMBEDDING_CACHE_MAX_SIZE_BYTES,
+            table="embeddings",
+        )
+    elif backend_name == "none":
+        return None
+    else:
+        raise ValueError(f"Unsupported embedding cache backend: {backend_name}")
+
+    _embedding_cache = EmbeddingCache(backend)
+    return _embedding_cache
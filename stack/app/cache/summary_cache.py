@@ -0,0 +1,104 @@
+"""
+summary_cache.py
+----------
+
+Persistent cache of page summaries, keyed by summarization provider, model
+and a hash of the normalized page content, so re-ingesting unchanged pages
+does not call the LLM again. Stored in the same kind of backends as the
+embedding cache, apart from it.
+"""
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from stack.app.cache.backends import (
+    CacheBackend,
+    DiskCacheBackend,
+    RedisCacheBackend,
+    make_cache_key,
+)
+from stack.app.core.configuration import get_settings
+
+settings = get_settings()
+
+
+def get_summarization_namespace() -> str:
+    """Identify the model that produces the summaries."""
+    return ":".join(
+        [
+            settings.SUMMARIZATION_MODEL_PROVIDER.lower(),
+            settings.SUMMARIZATION_MODEL_NAME,
+        ]
+    )
+
+
+class SummaryCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get_many(self, texts: list[str]) -> list[Optional[str]]:
+        if not texts:
+            return []
+        namespace = get_summarization_namespace()
+        values = await self.backend.get_many(
+            [make_cache_key(namespace, text) for text in texts]
+        )
+        summaries = [value.decode("utf-8") if value else None for value in values]
+        hits = sum(summary is not None for summary in summaries)
+        self.hits += hits
+        self.misses += len(summaries) - hits
+        return summaries
+
+    async def set_many(self, texts: list[str], summaries: list[str]) -> None:
+        if not texts:
+            return
+        namespace = get_summarization_namespace()
+        await self.backend.set_many(
+            {
+                make_cache_key(namespace, text): summary.encode("utf-8")
+                for text, summary in zip(texts, summaries)
+            }
+        )
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": settings.SUMMARY_CACHE_BACKEND,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+_summary_cache: Optional[SummaryCache] = None
+
+
+def get_summary_cache() -> Optional[SummaryCache]:
+    """Return the configured summary cache, or None if caching is
+    disabled."""
+    global _summary_cache
+    if _summary_cache is not None:
+        return _summary_cache
+
+    backend_name = settings.SUMMARY_CACHE_BACKEND
+    if backend_name == "redis":
+        backend = RedisCacheBackend(
+            Redis.from_url(settings.REDIS_URL),
+            max_size_bytes=settings.SUMMARY_CACHE_MAX_SIZE_BYTES,
+            prefix="summary_cache",
+        )
+    elif backend_name == "disk":
+        backend = DiskCacheBackend(
+            settings.SUMMARY_CACHE_DIRECTORY.joinpath("summaries.sqlite3"),
+            max_size_bytes=settings.SUMMARY_CACHE_MAX_SIZE_BYTES,
+            table="summaries",
+        )
+    elif backend_name == "none":
+        return None
+    else:
+        raise ValueError(f"Unsupported summary cache backend: {backend_name}")
+
+    _summary_cache = SummaryCache(backend)
+    return _summary_cache
@@ -7,6 +7,7 @@ This module is responsible for managing configuration settings for the Backend A
 """
 import os
 import sys
+import json
 import enum
 from pathlib import Path
 from dotenv import load_dotenv
@@ -79,6 +80,10 @@ class Settings(BaseSettings):
     UNSTRUCTURED_BASE_URL: str = os.getenv(
         "UNSTRUCTURED_BASE_URL", "http://localhost:8000"
     )
+    # Size of the shared connection pool and thread pool used for partition requests
+    UNSTRUCTURED_MAX_CONNECTIONS: int = int(
+        os.getenv("UNSTRUCTURED_MAX_CONNECTIONS", 8)
+    )
 
     # If using openai
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY", None)
@@ -162,6 +167,25 @@ class Settings(BaseSettings):
     VECTOR_DB_NAME: str = os.getenv("VECTOR_DB_NAME", "qdrant")
     VECTOR_DB_HOST: str = os.getenv("VECTOR_DB_HOST", "localhost")
     VECTOR_DB_PORT: str | int = os.getenv("VECTOR_DB_PORT", 6333)
+    # Talk to Qdrant over gRPC instead of REST
+    VECTOR_DB_PREFER_GRPC: bool = (
+        True if os.getenv("VECTOR_DB_PREFER_GRPC", "false") == "true" else False
+    )
+    VECTOR_DB_GRPC_PORT: int = int(os.getenv("VECTOR_DB_GRPC_PORT", 6334))
+    # Fuse dense and BM25 sparse search with RRF. New collections get a
+    # sparse vector; existing collections without one keep dense search
+    VECTOR_DB_HYBRID_SEARCH: bool = (
+        True if os.getenv("VECTOR_DB_HYBRID_SEARCH", "false") == "true" else False
+    )
+    # Index namespace as a tenant (`is_tenant`), so Qdrant stores the points of
+    # each namespace together. Requires Qdrant 1.11 or later
+    VECTOR_DB_NAMESPACE_TENANT_INDEX: bool = (
+        True
+        if os.getenv("VECTOR_DB_NAMESPACE_TENANT_INDEX", "false") == "true"
+        else False
+    )
+    # Number of vector services (encoder and database client) kept for reuse
+    VECTOR_SERVICE_CACHE_SIZE: int = int(os.getenv("VECTOR_SERVICE_CACHE_SIZE", 32))
     VECTOR_DB_COLLECTION_NAME: str = os.getenv("VECTOR_DB_COLLECTION_NAME", "documents")
     VECTOR_DB_ENCODER_DIMENSIONS: int = int(
         os.getenv("VECTOR_DB_ENCODER_DIMENSIONS", "1536")
@@ -179,6 +203,8 @@ class Settings(BaseSettings):
         return {
             "host": f"http://{self.VECTOR_DB_HOST}:{self.VECTOR_DB_PORT}",
             "api_key": self.VECTOR_DB_API_KEY,
+            "prefer_grpc": self.VECTOR_DB_PREFER_GRPC,
+            "grpc_port": self.VECTOR_DB_GRPC_PORT,
         }
 
     DEFAULT_PARTITION_STRATEGY: str = os.getenv("DEFAULT_PARTITION_STRATEGY", "auto")
@@ -189,6 +215,91 @@ class Settings(BaseSettings):
         True if os.getenv("PROCESS_UNSTRUCTURED_TABLES", "false") == "true" else False
     )
 
+    # Number of files partitioned and chunked concurrently during a single ingestion
+    INGEST_MAX_CONCURRENT_FILES: int = int(os.getenv("INGEST_MAX_CONCURRENT_FILES", 4))
+
+    # Per-provider overrides of encoder request limits, as JSON, e.g.
+    # {"openai": {"max_concurrency": 10, "requests_per_minute": 3000}}
+    ENCODER_RATE_LIMITS: dict = json.loads(os.getenv("ENCODER_RATE_LIMITS", "{}"))
+
+    # Embedding cache: "none", "redis" or "disk"
+    EMBEDDING_CACHE_BACKEND: str = os.getenv("EMBEDDING_CACHE_BACKEND", "none")
+    EMBEDDING_CACHE_DIRECTORY: Path = Path(
+        os.getenv(
+            "EMBEDDING_CACHE_DIRECTORY",
+            str(BASE_DIR.parent.joinpath("cache_data", "embeddings")),
+        )
+    )
+    # Defaults to 1gb
+    EMBEDDING_CACHE_MAX_SIZE_BYTES: int = int(
+        os.getenv("EMBEDDING_CACHE_MAX_SIZE_BYTES", 1000000000)
+    )
+
+    # Summary cache: "none", "redis" or "disk"
+    SUMMARY_CACHE_BACKEND: str = os.getenv("SUMMARY_CACHE_BACKEND", "none")
+    SUMMARY_CACHE_DIRECTORY: Path = Path(
+        os.getenv(
+            "SUMMARY_CACHE_DIRECTORY",
+            str(BASE_DIR.parent.joinpath("cache_data", "summaries")),
+        )
+    )
+    # Defaults to 100mb
+    SUMMARY_CACHE_MAX_SIZE_BYTES: int = int(
+        os.getenv("SUMMARY_CACHE_MAX_SIZE_BYTES", 100000000)
+    )
+
+    # Run /rag/ingest jobs through the Redis queue and `stack.app.workers.ingest`
+    # workers instead of in-process background tasks
+    INGESTION_QUEUE_ENABLED: bool = (
+        True if os.getenv("INGESTION_QUEUE_ENABLED", "false") == "true" else False
+    )
+    INGESTION_WORKER_CONCURRENCY: int = int(
+        os.getenv("INGESTION_WORKER_CONCURRENCY", 2)
+    )
+    # Seconds before a job whose worker stopped heartbeating is requeued
+    INGESTION_VISIBILITY_TIMEOUT: int = int(
+        os.getenv("INGESTION_VISIBILITY_TIMEOUT", 300)
+    )
+    INGESTION_MAX_RETRIES: int = int(os.getenv("INGESTION_MAX_RETRIES", 3))
+    # Base delay in seconds, doubled after every failed attempt
+    INGESTION_RETRY_BACKOFF: int = int(os.getenv("INGESTION_RETRY_BACKOFF", 30))
+    # Checkpoints of completed ingestion stages, so retried and resumed tasks
+    # skip them: "none", "redis" or "disk"
+    INGESTION_CHECKPOINT_BACKEND: str = os.getenv(
+        "INGESTION_CHECKPOINT_BACKEND", "none"
+    )
+    INGESTION_CHECKPOINT_DIRECTORY: Path = Path(
+        os.getenv(
+            "INGESTION_CHECKPOINT_DIRECTORY",
+            str(BASE_DIR.parent.joinpath("cache_data", "checkpoints")),
+        )
+    )
+    # Seconds a failed task can still be resumed. Defaults to 7 days
+    INGESTION_CHECKPOINT_TTL: int = int(
+        os.getenv("INGESTION_CHECKPOINT_TTL", 604800)
+    )
+
+    # Offload chunk filtering, token counting and table splitting to a process pool
+    CHUNK_PROCESS_POOL_ENABLED: bool = (
+        False if os.getenv("CHUNK_PROCESS_POOL_ENABLED", "true") == "false" else True
+    )
+    # Defaults to the number of available cores
+    CHUNK_PROCESS_POOL_SIZE: Optional[int] = (
+        int(os.getenv("CHUNK_PROCESS_POOL_SIZE"))
+        if os.getenv("CHUNK_PROCESS_POOL_SIZE")
+        else None
+    )
+    # Jobs with fewer chunks (or table rows) than this are processed inline
+    CHUNK_PROCESS_POOL_MIN_ITEMS: int = int(
+        os.getenv("CHUNK_PROCESS_POOL_MIN_ITEMS", 500)
+    )
+    CHUNK_PROCESS_POOL_BATCH_SIZE: int = int(
+        os.getenv("CHUNK_PROCESS_POOL_BATCH_SIZE", 256)
+    )
+
+    # Number of embedded batches that may wait for upsert before embedding pauses
+    EMBED_UPSERT_QUEUE_SIZE: int = int(os.getenv("EMBED_UPSERT_QUEUE_SIZE", 4))
+
     DEFAULT_CHUNKING_STRATEGY: str = os.getenv("DEFAULT_CHUNKING_STRATEGY", "semantic")
     DEFAULT_SEMANTIC_CHUNK_MIN_TOKENS: int = int(
         os.getenv("DEFAULT_SEMANTIC_CHUNK_MIN_TOKENS", 30)
@@ -199,6 +310,25 @@ class Settings(BaseSettings):
     SEMANTIC_ROLLING_WINDOW_SIZE: int = int(
         os.getenv("SEMANTIC_ROLLING_WINDOW_SIZE", 1)
     )
+    STRUCTURED_DATA_BATCH_SIZE: int = int(
+        os.getenv("STRUCTURED_DATA_BATCH_SIZE", 1000)
+    )
+    NEAR_DUPLICATE_FILTER_ENABLED: bool = (
+        os.getenv("NEAR_DUPLICATE_FILTER_ENABLED", "false") == "true"
+    )
+    NEAR_DUPLICATE_THRESHOLD: float = float(
+        os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.85)
+    )
+    NEAR_DUPLICATE_AGAINST_NAMESPACE: bool = (
+        os.getenv("NEAR_DUPLICATE_AGAINST_NAMESPACE", "false") == "true"
+    )
+    DEFAULT_CHUNK_OVERLAP: int = int(os.getenv("DEFAULT_CHUNK_OVERLAP", 50))
+    SEMANTIC_VECTORIZED_SPLITTING: bool = (
+        os.getenv("SEMANTIC_VECTORIZED_SPLITTING", "false") == "true"
+    )
+    SEMANTIC_EMBEDDING_BATCH_SIZE: int = int(
+        os.getenv("SEMANTIC_EMBEDDING_BATCH_SIZE", 256)
+    )
     PREFIX_TITLES: bool = (
         False if os.getenv("PREFIX_TITLES", "true") == "false" else True
     )
@@ -216,6 +346,12 @@ class Settings(BaseSettings):
     SUMMARIZATION_MODEL_NAME: str = os.getenv(
         "SUMMARIZATION_MODEL_NAME", "gpt-3.5-turbo"
     )
+    SUMMARIZATION_MAX_CONCURRENCY: int = int(
+        os.getenv("SUMMARIZATION_MAX_CONCURRENCY", 8)
+    )
+    SUMMARIZATION_MAX_INPUT_TOKENS: int = int(
+        os.getenv("SUMMARIZATION_MAX_INPUT_TOKENS", 6000)
+    )
 
     ENABLE_RERANK_BY_DEFAULT: bool = (
         True if os.getenv("ENABLE_RERANK_BY_DEFAULT", "false") == "true" else False
@@ -0,0 +1,240 @@
+"""
+checkpoints.py
+----------
+
+Per-task checkpoints of the ingestion pipeline.
+
+Each stage of `process_ingestion` stores its output under the task id once
+it completes, so a retried or resumed task loads the output of the stages
+that already ran instead of running them again. Checkpoints are removed
+when the task completes and expire after `INGESTION_CHECKPOINT_TTL`
+seconds otherwise. The fields of the payload in `PAYLOAD_CREDENTIAL_FIELDS`
+are not stored, and are supplied again when a task is resumed.
+
+Embedding and upserting run as one overlapping pipeline, so the vectors
+computed before a failure are stored instead, and restored on the chunks
+before the pipeline runs again, which then only embeds the rest.
+"""
+import asyncio
+import os
+import shutil
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Optional
+
+import orjson
+from redis.asyncio import Redis
+
+from stack.app.core.configuration import get_settings
+from stack.app.schema.rag import BaseDocumentChunk, IngestRequestPayload
+
+settings = get_settings()
+
+# Stages in the order they run
+PAYLOAD_STAGE = "payload"
+CHUNKS_STAGE = "chunks"
+SUMMARIES_STAGE = "summaries"
+EMBEDDINGS_STAGE = "embeddings"
+CHUNKS_UPSERTED_STAGE = "chunks_upserted"
+SUMMARIES_UPSERTED_STAGE = "summaries_upserted"
+STALE_POINTS_DELETED_STAGE = "stale_points_deleted"
+STAGES = (
+    PAYLOAD_STAGE,
+    CHUNKS_STAGE,
+    SUMMARIES_STAGE,
+    EMBEDDINGS_STAGE,
+    CHUNKS_UPSERTED_STAGE,
+    SUMMARIES_UPSERTED_STAGE,
+    STALE_POINTS_DELETED_STAGE,
+)
+
+
+# Payload fields that can hold credentials or signed urls
+PAYLOAD_CREDENTIAL_FIELDS = {"vector_database", "webhook_url"}
+
+
+def dump_payload(payload: IngestRequestPayload) -> dict:
+    return payload.model_dump(mode="json", exclude=PAYLOAD_CREDENTIAL_FIELDS)
+
+
+def dump_chunks(chunks: list[BaseDocumentChunk]) -> list[dict]:
+    return [chunk.model_dump() for chunk in chunks]
+
+
+def load_chunks(data: list[dict]) -> list[BaseDocumentChunk]:
+    return [BaseDocumentChunk(**chunk) for chunk in data]
+
+
+def dump_embeddings(chunks: list[BaseDocumentChunk]) -> dict[str, list[float]]:
+    return {
+        chunk.id: chunk.dense_embedding
+        for chunk in chunks
+        if chunk.dense_embedding is not None
+    }
+
+
+def restore_embeddings(
+    chunks: list[BaseDocumentChunk], embeddings: dict[str, list[float]]
+) -> int:
+    """Set the stored vector of each chunk that has none, and return how
+    many were restored."""
+    restored = 0
+    for chunk in chunks:
+        if chunk.dense_embedding is None and chunk.id in embeddings:
+            chunk.dense_embedding = embeddings[chunk.id]
+            restored += 1
+    return restored
+
+
+class CheckpointStore(ABC):
+    @abstractmethod
+    async def get(self, task_id: str, stage: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    async def set(self, task_id: str, stage: str, data: bytes) -> None:
+        pass
+
+    @abstractmethod
+    async def delete(self, task_id: str) -> None:
+        pass
+
+
+class NullCheckpointStore(CheckpointStore):
+    """Used when checkpoints are disabled: nothing is stored."""
+
+    async def get(self, task_id: str, stage: str) -> Optional[bytes]:
+        return None
+
+    async def set(self, task_id: str, stage: str, data: bytes) -> None:
+        pass
+
+    async def delete(self, task_id: str) -> None:
+        pass
+
+
+class DiskCheckpointStore(CheckpointStore):
+    """Stores each stage in `{directory}/{task_id}/{stage}.json`. Files are
+    written to a temporary path first and renamed, so a crash never leaves
+    a partial checkpoint behind. Expired checkpoints are ignored, and
+    deleted whenever the checkpoints of a task are."""
+
+    def __init__(self, directory: Path, ttl: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+    def _path(self, task_id: str, stage: str) -> Path:
+        return self.directory.joinpath(task_id, f"{stage}.json")
+
+    def _get(self, task_id: str, stage: str) -> Optional[bytes]:
+        path = self._path(task_id, stage)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _set(self, task_id: str, stage: str, data: bytes) -> None:
+        path = self._path(task_id, stage)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_suffix(".tmp")
+        temporary_path.write_bytes(data)
+        os.replace(temporary_path, path)
+
+    def _delete(self, task_id: str) -> None:
+        shutil.rmtree(self.directory.joinpath(task_id), ignore_errors=True)
+        # Checkpoints of tasks that were never resumed are removed here too
+        expired_before = time.time() - self.ttl
+        for task_directory in self.directory.iterdir():
+            try:
+                modified_at = task_directory.stat().st_mtime
+            except FileNotFoundError:
+                # Removed by another worker in the meantime
+                continue
+            if modified_at < expired_before:
+                shutil.rmtree(task_directory, ignore_errors=True)
+
+    async def get(self, task_id: str, stage: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, task_id, stage)
+
+    async def set(self, task_id: str, stage: str, data: bytes) -> None:
+        await asyncio.to_thread(self._set, task_id, stage, data)
+
+    async def delete(self, task_id: str) -> None:
+        await asyncio.to_thread(self._delete, task_id)
+
+
+class RedisCheckpointStore(CheckpointStore):
+    """Stores each stage under `ingestion:{task_id}:checkpoint:{stage}`, next
+    to the status and progress of the task."""
+
+    def __init__(self, redis: Redis, ttl: int):
+        self.redis = redis
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(task_id: str, stage: str) -> str:
+        return f"ingestion:{task_id}:checkpoint:{stage}"
+
+    async def get(self, task_id: str, stage: str) -> Optional[bytes]:
+        return await self.redis.get(self._key(task_id, stage))
+
+    async def set(self, task_id: str, stage: str, data: bytes) -> None:
+        await self.redis.set(self._key(task_id, stage), data, ex=self.ttl)
+
+    async def delete(self, task_id: str) -> None:
+        await self.redis.delete(*[self._key(task_id, stage) for stage in STAGES])
+
+
+class IngestionCheckpoints:
+    def __init__(self, store: CheckpointStore, task_id: str):
+        self.store = store
+        self.task_id = task_id
+
+    async def load(self, stage: str) -> Optional[Any]:
+        """Output of `stage`, or None if it has not completed."""
+        data = await self.store.get(self.task_id, stage)
+        return orjson.loads(data) if data is not None else None
+
+    async def save(self, stage: str, output: Any) -> None:
+        await self.store.set(
+            self.task_id,
+            stage,
+            orjson.dumps(output, default=str, option=orjson.OPT_SERIALIZE_NUMPY),
+        )
+
+    async def clear(self) -> None:
+        await self.store.delete(self.task_id)
+
+
+_checkpoint_store: Optional[CheckpointStore] = None
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    global _checkpoint_store
+    if _checkpoint_store is not None:
+        return _checkpoint_store
+
+    backend_name = settings.INGESTION_CHECKPOINT_BACKEND
+    if backend_name == "redis":
+        _checkpoint_store = RedisCheckpointStore(
+            Redis.from_url(settings.REDIS_URL),
+            ttl=settings.INGESTION_CHECKPOINT_TTL,
+        )
+    elif backend_name == "disk":
+        _checkpoint_store = DiskCheckpointStore(
+            settings.INGESTION_CHECKPOINT_DIRECTORY,
+            ttl=settings.INGESTION_CHECKPOINT_TTL,
+        )
+    elif backend_name == "none":
+        _checkpoint_store = NullCheckpointStore()
+    else:
+        raise ValueError(f"Unsupported ingestion checkpoint backend: {backend_name}")
+    return _checkpoint_store
+
+
+def get_ingestion_checkpoints(task_id: str) -> IngestionCheckpoints:
+    return IngestionCheckpoints(get_checkpoint_store(), task_id)
@@ -0,0 +1,83 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, Sequence, TypeVar
+
+import structlog
+
+from stack.app.core.configuration import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Functions sent to the pool must be importable module-level functions. The
+# spawn context keeps workers from inheriting the event loop and open sockets.
+_lock = threading.Lock()
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        with _lock:
+            if _process_pool is None:
+                max_workers = settings.CHUNK_PROCESS_POOL_SIZE or os.cpu_count() or 1
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info(f"Started chunk process pool with {max_workers} workers")
+    return _process_pool
+
+
+def should_offload(num_items: int) -> bool:
+    """Whether a job of `num_items` is large enough to be worth the
+    inter-process overhead."""
+    return (
+        settings.CHUNK_PROCESS_POOL_ENABLED
+        and num_items >= settings.CHUNK_PROCESS_POOL_MIN_ITEMS
+    )
+
+
+async def run_cpu_bound(func: Callable[..., R], *args: Any, offload: bool) -> R:
+    """Run `func` in the process pool, or inline when `offload` is false."""
+    if not offload:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), partial(func, *args))
+
+
+async def map_batches(
+    func: Callable[..., list[R]],
+    items: Sequence[T],
+    *args: Any,
+    batch_size: int = settings.CHUNK_PROCESS_POOL_BATCH_SIZE,
+) -> list[R]:
+    """Apply `func(batch, *args)` over `items` in batches and concatenate
+    the results in order. Batches run in the process pool for large inputs
+    and inline otherwise."""
+    if not should_offload(len(items)):
+        return func(list(items), *args)
+
+    results = await asyncio.gather(
+        *[
+            run_cpu_bound(func, list(items[i : i + batch_size]), *args, offload=True)
+            for i in range(0, len(items), batch_size)
+        ]
+    )
+    return [result for batch in results for result in batch]
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    with _lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+            logger.info("Chunk process pool shut down")
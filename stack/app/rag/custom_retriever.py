@@ -7,7 +7,7 @@ from langchain_core.callbacks import (
 )
 from langchain_core.documents import Document
 from stack.app.schema.rag import QueryRequestPayload, BaseDocumentChunk
-from stack.app.rag.query import query_documents
+from stack.app.rag.query import query_documents, query_documents_batch
 from stack.app.core.configuration import get_settings
 
 
@@ -37,11 +37,8 @@ class Retriever(BaseRetriever):
         metadata = {"namespace": chunk.namespace, **chunk.metadata}
         return Document(page_content=chunk.page_content, metadata=metadata)
 
-    async def _aget_relevant_documents(
-        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
-    ) -> List[Document]:
-        """Async implementations for retriever."""
-        payload = QueryRequestPayload(
+    def _build_payload(self, query: str) -> QueryRequestPayload:
+        return QueryRequestPayload(
             input=query,
             namespace=self.metadata.get("namespace"),
             index_name=self.metadata.get(
@@ -52,5 +49,25 @@ class Retriever(BaseRetriever):
             enable_rerank=self.metadata.get("enable_rerank"),
             exclude_fields=self.metadata.get("exclude_fields"),
         )
-        chunks = await query_documents(payload)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """Async implementations for retriever."""
+        chunks = await query_documents(self._build_payload(query))
         return [self._chunk_to_document(chunk) for chunk in chunks]
+
+    async def aget_relevant_documents_batch(
+        self, queries: List[str]
+    ) -> List[List[Document]]:
+        """Retrieve documents for several queries with one embedding call
+        and one vector search request per collection."""
+        if not queries:
+            return []
+        batch_chunks = await query_documents_batch(
+            self._build_payload(queries[0]), queries
+        )
+        return [
+            [self._chunk_to_document(chunk) for chunk in chunks]
+            for chunks in batch_chunks
+        ]
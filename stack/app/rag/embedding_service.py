@@ -1,32 +1,45 @@
 import asyncio
-import copy
-import uuid
-from typing import Any, Literal, Optional
+from itertools import islice
+from typing import Any, Iterable, Literal, Optional
 import numpy as np
 import structlog
 from semantic_router.encoders import (
     BaseEncoder,
 )
 from tqdm import tqdm
-from unstructured_client import UnstructuredClient
 from unstructured_client.models import shared
 
 from stack.app.schema.rag import (
     BaseDocumentChunk,
+    DeduplicationConfig,
     DocumentProcessorConfig,
     ParserConfig,
 )
 from stack.app.rag.util import (
+    chunk_id,
+    content_fingerprint,
+    filter_chunk_contents,
     get_tiktoken_length,
-    check_content_is_useful,
-    deduplicate_chunk,
+    get_tiktoken_lengths,
 )
 from stack.app.rag.splitter import UnstructuredSemanticSplitter
-from stack.app.rag.summarizer import completion
+from stack.app.rag.vectorized_splitter import VectorizedSemanticSplitter
+from stack.app.rag.partition import apartition, get_unstructured_client
+from stack.app.rag.cpu_executor import map_batches, run_cpu_bound, should_offload
+from stack.app.rag.near_duplicates import find_near_duplicates, minhash_signatures
+from stack.app.rag.local_partition import (
+    can_partition_locally,
+    partition_locally,
+    split_elements,
+    split_texts,
+)
+from stack.app.rag.encoders.async_encoder import AsyncEncoder
+from stack.app.rag.summarizer import get_summarizer
+from stack.app.cache.summary_cache import get_summary_cache
 from stack.app.vectordbs import get_vector_service
 from stack.app.schema.file import FileSchema
 from stack.app.core.configuration import get_settings
-from stack.app.utils.file_helpers import parse_json_file, parse_csv_file
+from stack.app.utils.file_helpers import iter_csv_records, iter_json_records
 from stack.app.core.redis import RedisService
 
 
@@ -37,6 +50,9 @@ from stack.app.core.redis import RedisService
 logger = structlog.get_logger()
 settings = get_settings()
 
+# Upper bound of chunks returned by `_partition_content`, local or not
+CHUNK_MAX_CHARACTERS = 2500
+
 
 def sanitize_metadata(metadata: dict) -> dict:
     def sanitize_value(value):
@@ -56,6 +72,22 @@ def sanitize_metadata(metadata: dict) -> dict:
     return {key: sanitize_value(value) for key, value in metadata.items()}
 
 
+def diff_fingerprints(
+    chunks: list[BaseDocumentChunk], indexed_fingerprints: dict[str, str]
+) -> tuple[list[BaseDocumentChunk], list[str]]:
+    current = {chunk.metadata.get("fingerprint") for chunk in chunks}
+    indexed = set(indexed_fingerprints.values())
+    new_chunks = [
+        chunk for chunk in chunks if chunk.metadata.get("fingerprint") not in indexed
+    ]
+    stale_point_ids = [
+        point_id
+        for point_id, fingerprint in indexed_fingerprints.items()
+        if fingerprint not in current
+    ]
+    return new_chunks, stale_point_ids
+
+
 class EmbeddingService:
     # Extract out to configuration
     MIN_WORD_COUNT = 10
@@ -82,13 +114,12 @@ class EmbeddingService:
         self.dimensions = dimensions
         self.namespace = namespace
         self.purpose = purpose
-        self.unstructured_client = UnstructuredClient(
-            api_key_auth=settings.UNSTRUCTURED_API_KEY,
-            server_url=settings.UNSTRUCTURED_BASE_URL,
-        )
+        self.unstructured_client = get_unstructured_client()
         self.parser_config = parser_config or ParserConfig()
         self.redis_service = redis_service
         self.task_id = task_id
+        # Ids of the files that could not be chunked by `generate_chunks`
+        self.failed_file_ids: list[str] = []
 
     async def _report_progress(self, message: str):
         if self.redis_service and self.task_id:
@@ -110,88 +141,176 @@ class EmbeddingService:
             return doc_chunks
 
         total_files = len(self.files)
-        for index, (file, file_content) in enumerate(self.files, start=1):
-            try:
+        semaphore = asyncio.Semaphore(config.max_concurrent_files)
+
+        async def process_file(
+            index: int, file: FileSchema, file_content: bytes
+        ) -> list[BaseDocumentChunk]:
+            async with semaphore:
                 await self._report_progress(
                     f"Processing file {index}/{total_files}: {file.filename}",
                 )
                 chunks = await self._process_file(file, file_content, config)
-                filtered_chunks = self._filter_chunks(chunks)
-                doc_chunks.extend(filtered_chunks)
+                filtered_chunks = await self._filter_chunks(chunks)
                 await self._report_progress(
                     f"Processed file {index}/{total_files}: {file.filename}"
                 )
-            except Exception as e:
-                logger.error(f"Error loading chunks for file {file.filename}: {e}")
+                return filtered_chunks
+
+        # Files are processed concurrently, but gather preserves the input
+        # order so chunks are still returned in file order.
+        results = await asyncio.gather(
+            *[
+                process_file(index, file, file_content)
+                for index, (file, file_content) in enumerate(self.files, start=1)
+            ],
+            return_exceptions=True,
+        )
+
+        errors: list[Exception] = []
+        self.failed_file_ids = []
+        for (file, _), result in zip(self.files, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error loading chunks for file {file.filename}: {result}")
                 await self._report_progress(
-                    f"Error processing file {file.filename}: {str(e)}"
+                    f"Error processing file {file.filename}: {str(result)}"
                 )
-                raise
+                errors.append(result)
+                self.failed_file_ids.append(str(file.id))
+                continue
+            doc_chunks.extend(result)
+
+        # A single failing file should not discard the others, but if nothing
+        # could be processed the ingestion as a whole has failed. The ids of
+        # the files that failed are kept in `failed_file_ids`.
+        if errors and len(errors) == total_files:
+            raise errors[0]
         return doc_chunks
 
-    def _filter_chunks(
+    async def _filter_chunks(
         self, chunks: list[BaseDocumentChunk]
     ) -> list[BaseDocumentChunk]:
         filtered_chunks = []
-        document_content = ""
-        for chunk in chunks:
-            chunk_content = deduplicate_chunk(chunk.page_content)
-            valid, reason = check_content_is_useful(
-                chunk_content,
-                min_word_count=self.MIN_WORD_COUNT,
-                information_density_ratio=self.INFORMATION_DENSITY_RATIO,
-                max_density_word_count=self.MAX_DENSITY_WORD_COUNT,
-            )
+        has_content = False
+        results = await map_batches(
+            filter_chunk_contents,
+            [chunk.page_content for chunk in chunks],
+            self.MIN_WORD_COUNT,
+            self.INFORMATION_DENSITY_RATIO,
+            self.MAX_DENSITY_WORD_COUNT,
+        )
+        for chunk, (chunk_content, valid, reason) in zip(chunks, results):
             if not valid:
                 logger.debug(f"Filtering out chunk, {reason}")
                 continue
-            document_content += chunk_content
+            has_content = has_content or bool(chunk_content)
             filtered_chunks.append(chunk)
 
-        return filtered_chunks if document_content else []
+        return filtered_chunks if has_content else []
 
     async def _process_file(
         self, file: FileSchema, file_content: bytes, config: DocumentProcessorConfig
     ) -> list[BaseDocumentChunk]:
         if file.mime_type == "application/json":
-            json_data = parse_json_file(file_content)
-            return await self._process_structured_data(file, json_data, config)
+            records = iter_json_records(file_content)
+            return await self._process_structured_data(file, records, config)
         elif file.mime_type == "text/csv":
-            csv_data = parse_csv_file(file_content)
-            return await self._process_structured_data(file, csv_data, config)
+            records = iter_csv_records(file_content)
+            return await self._process_structured_data(file, records, config)
         else:
             return await self._process_unstructured_file(file, file_content, config)
 
     async def _process_structured_data(
-        self, file: FileSchema, data: list[dict], config: DocumentProcessorConfig
+        self, file: FileSchema, records: Iterable[dict], config: DocumentProcessorConfig
     ) -> list[BaseDocumentChunk]:
+        """Chunk the content field of each record, keeping the other fields as
+        metadata.
+
+        Records are read lazily in batches of `STRUCTURED_DATA_BATCH_SIZE`.
+        With the `local` splitter each batch is chunked in one pass of the
+        token splitter, other splitters partition and chunk each record on
+        its own as configured, with up to `UNSTRUCTURED_MAX_CONNECTIONS`
+        records in flight.
+        """
         content_field = self.parser_config.structured_data_content_field
         all_chunks = []
-
-        for item in data:
-            if content_field not in item:
-                logger.warn(
-                    f"Item in file {file.filename} is missing '{content_field}' field. Skipping."
+        skipped = 0
+        semaphore = asyncio.Semaphore(settings.UNSTRUCTURED_MAX_CONNECTIONS)
+
+        async def partition_and_chunk(content: str) -> list[dict]:
+            async with semaphore:
+                return await self._partition_and_chunk(content, config)
+
+        records = iter(records)
+        while batch := list(islice(records, settings.STRUCTURED_DATA_BATCH_SIZE)):
+            contents = []
+            metadatas = []
+            for item in batch:
+                if not isinstance(item, dict) or content_field not in item:
+                    skipped += 1
+                    continue
+                contents.append(str(item[content_field]))
+                metadatas.append({k: v for k, v in item.items() if k != content_field})
+
+            if config.splitter.name == "local":
+                splits = [
+                    [({"page_content": text}, tokens) for text, tokens in item]
+                    for item in await map_batches(
+                        split_texts,
+                        contents,
+                        config.splitter.max_tokens,
+                        config.splitter.chunk_overlap,
+                    )
+                ]
+            else:
+                record_chunks = await asyncio.gather(
+                    *[partition_and_chunk(content) for content in contents]
                 )
-                continue
-
-            item_content = item[content_field]
-            item_metadata = {k: v for k, v in item.items() if k != content_field}
-
-            chunks = await self._partition_and_chunk(item_content, config)
-            item_chunks = [
-                self._create_document_chunk(chunk, file, item_metadata)
-                for chunk in chunks
-            ]
-            all_chunks.extend(item_chunks)
+                token_counts = iter(
+                    await map_batches(
+                        get_tiktoken_lengths,
+                        [
+                            chunk["page_content"]
+                            for chunks in record_chunks
+                            for chunk in chunks
+                        ],
+                    )
+                )
+                splits = [
+                    [(chunk, next(token_counts)) for chunk in chunks]
+                    for chunks in record_chunks
+                ]
 
+            for item_splits, item_metadata in zip(splits, metadatas):
+                for chunk, token_count in item_splits:
+                    all_chunks.append(
+                        self._create_document_chunk(
+                            chunk,
+                            file,
+                            len(all_chunks),
+                            item_metadata,
+                            token_count=token_count,
+                        )
+                    )
+
+        if skipped:
+            logger.warning(
+                f"{skipped} items in file {file.filename} are missing "
+                f"'{content_field}' field. Skipped."
+            )
         return all_chunks
 
     async def _process_unstructured_file(
         self, file: FileSchema, file_content: bytes, config: DocumentProcessorConfig
     ) -> list[BaseDocumentChunk]:
         chunks = await self._partition_and_chunk(file_content, config, file=file)
-        return [self._create_document_chunk(chunk, file) for chunk in chunks]
+        token_counts = await map_batches(
+            get_tiktoken_lengths, [chunk["page_content"] for chunk in chunks]
+        )
+        return [
+            self._create_document_chunk(chunk, file, position, token_count=token_count)
+            for position, (chunk, token_count) in enumerate(zip(chunks, token_counts))
+        ]
 
     async def _partition_and_chunk(
         self,
@@ -203,6 +322,8 @@ class EmbeddingService:
             return await self._partition_by_title(content, config, file)
         elif config.splitter.name == "semantic":
             return await self._partition_semantic(content, config, file)
+        elif config.splitter.name == "local":
+            return await self._partition_local(content, config, file)
         else:
             raise ValueError(f"Unsupported splitter method: {config.splitter.name}")
 
@@ -235,7 +356,12 @@ class EmbeddingService:
             returned_elements_type="original",
             file=file,
         )
-        splitter_config = UnstructuredSemanticSplitter(
+        splitter_class = (
+            VectorizedSemanticSplitter
+            if config.splitter.vectorized
+            else UnstructuredSemanticSplitter
+        )
+        splitter_config = splitter_class(
             encoder=self.encoder,
             window_size=config.splitter.rolling_window_size,
             min_split_tokens=config.splitter.min_tokens,
@@ -243,6 +369,52 @@ class EmbeddingService:
         )
         return await splitter_config(elements=elements)
 
+    async def _partition_local(
+        self,
+        content: Any,
+        config: DocumentProcessorConfig,
+        file: Optional[FileSchema] = None,
+    ) -> list[dict]:
+        elements = await self._partition_content(
+            content, strategy="local", returned_elements_type="original", file=file
+        )
+        return await run_cpu_bound(
+            split_elements,
+            elements,
+            config.splitter.max_tokens,
+            config.splitter.chunk_overlap,
+            offload=should_offload(len(elements)),
+        )
+
+    async def _partition_locally(
+        self,
+        content: Any,
+        mime_type: str,
+        returned_elements_type: Literal["chunked", "original"],
+        file: Optional[FileSchema] = None,
+    ) -> list[dict]:
+        # Parsing PDFs and Word files is CPU-bound, so it runs in the process
+        # pool whenever the pool is enabled
+        elements = await run_cpu_bound(
+            partition_locally,
+            content,
+            mime_type,
+            file.source.split("/")[-1] if file else None,
+            offload=settings.CHUNK_PROCESS_POOL_ENABLED,
+        )
+        if returned_elements_type == "original":
+            return elements
+        return [
+            {
+                "type": "CompositeElement",
+                "text": chunk["page_content"],
+                "metadata": chunk["metadata"],
+            }
+            for chunk in split_elements(
+                elements, CHUNK_MAX_CHARACTERS, 0, length_function=len
+            )
+        ]
+
     async def _partition_content(
         self,
         content: Any,
@@ -250,6 +422,17 @@ class EmbeddingService:
         returned_elements_type: Literal["chunked", "original"] = "chunked",
         file: Optional[FileSchema] = None,
     ) -> list[Any]:
+        if strategy == "local":
+            mime_type = file.mime_type if file else "text/plain"
+            if can_partition_locally(mime_type):
+                return await self._partition_locally(
+                    content, mime_type, returned_elements_type, file=file
+                )
+            logger.warning(
+                f"No local parser for {mime_type}, partitioning with the Unstructured API"
+            )
+            strategy = "auto"
+
         try:
             files = shared.Files(
                 content=content
@@ -261,14 +444,18 @@ class EmbeddingService:
                 files=files,
                 include_page_breaks=True,
                 strategy=strategy,
-                max_characters=2500 if returned_elements_type == "chunked" else None,
+                max_characters=CHUNK_MAX_CHARACTERS
+                if returned_elements_type == "chunked"
+                else None,
                 new_after_n_chars=1000 if returned_elements_type == "chunked" else None,
                 chunking_strategy="by_title"
                 if returned_elements_type == "chunked"
                 else None,
             )
 
-            unstructured_response = self.unstructured_client.general.partition(req)
+            unstructured_response = await apartition(
+                req, client=self.unstructured_client
+            )
             if unstructured_response.elements is not None:
                 return unstructured_response.elements
         except Exception as e:
@@ -277,22 +464,32 @@ class EmbeddingService:
         return []
 
     def _create_document_chunk(
-        self, chunk: dict, file: FileSchema, additional_metadata: Optional[dict] = None
+        self,
+        chunk: dict,
+        file: FileSchema,
+        position: int,
+        additional_metadata: Optional[dict] = None,
+        token_count: Optional[int] = None,
     ) -> BaseDocumentChunk:
+        fingerprint = content_fingerprint(chunk["page_content"])
         metadata = {
             "file_id": str(file.id),
             "purpose": self.purpose,
             "source": file.source,
             "source_type": file.mime_type,
-            "token_count": get_tiktoken_length(chunk["page_content"]),
+            "token_count": token_count
+            if token_count is not None
+            else get_tiktoken_length(chunk["page_content"]),
             **(additional_metadata or {}),
             **chunk.get("metadata", {}),
+            "fingerprint": fingerprint,
         }
         return BaseDocumentChunk(
-            id=str(uuid.uuid4()),
+            id=chunk_id(self.namespace, file.id, position, fingerprint),
             page_content=chunk["page_content"],
             namespace=str(self.namespace),
             metadata=metadata,
+            dense_embedding=chunk.get("dense_embedding"),
         )
 
     async def embed_and_upsert(
@@ -303,10 +500,19 @@ class EmbeddingService:
         batch_size: int = 100,
         task_id: Optional[str] = None,
         redis_service: Optional[RedisService] = None,
+        num_workers: int = 10,
     ) -> list[BaseDocumentChunk]:
+        """Embed chunks and upsert them into the vector database.
+
+        Embedding workers push each embedded batch onto a bounded queue
+        that a single upsert worker drains, so encoder calls and vector
+        store writes overlap and only `EMBED_UPSERT_QUEUE_SIZE` embedded
+        batches are waiting to be written at any time.
+        """
         _redis_service = redis_service or self.redis_service
         _task_id = task_id or self.task_id
 
+        chunks = [chunk for chunk in chunks if chunk and chunk.page_content]
         total_chunks = len(chunks)
 
         if _redis_service and _task_id:
@@ -315,24 +521,42 @@ class EmbeddingService:
                 f"Starting embedding process for {total_chunks} chunks...",
             )
 
-        pbar = tqdm(total=len(chunks), desc="Generating embeddings")
-        queue = asyncio.Queue()
+        if not chunks:
+            logger.warn("No chunks to upsert. Aborting operation.")
+            await self._report_progress("No chunks to upsert. Aborting operation.")
+            return []
+
+        vector_service = get_vector_service(
+            index_name=index_name or self.index_name,
+            credentials=self.vector_credentials,
+            encoder=encoder,
+            dimensions=self.dimensions,
+        )
+
+        async_encoder = AsyncEncoder(encoder)
+        pbar = tqdm(total=total_chunks, desc="Generating embeddings")
+        pending_batches: asyncio.Queue[list[BaseDocumentChunk]] = asyncio.Queue()
+        for i in range(0, total_chunks, batch_size):
+            pending_batches.put_nowait(chunks[i : i + batch_size])
+
+        upsert_queue: asyncio.Queue[Optional[list[BaseDocumentChunk]]] = (
+            asyncio.Queue(maxsize=settings.EMBED_UPSERT_QUEUE_SIZE)
+        )
+        upserted_chunks: list[BaseDocumentChunk] = []
 
         async def embed_batch(
             chunks_batch: list[BaseDocumentChunk],
         ) -> list[BaseDocumentChunk]:
             try:
-                chunk_texts = [
-                    chunk.page_content
-                    for chunk in chunks_batch
-                    if chunk and chunk.page_content
+                # Chunks embedded while splitting keep their vectors
+                chunks_to_embed = [
+                    chunk for chunk in chunks_batch if chunk.dense_embedding is None
                 ]
-                if not chunk_texts:
-                    logger.warning(f"No content to embed in batch {chunks_batch}")
-                    return []
-                embeddings = encoder(chunk_texts)
-                for chunk, embedding in zip(chunks_batch, embeddings):
-                    chunk.dense_embedding = np.array(embedding).tolist()
+                if chunks_to_embed:
+                    chunk_texts = [chunk.page_content for chunk in chunks_to_embed]
+                    embeddings = await async_encoder.acall(chunk_texts)
+                    for chunk, embedding in zip(chunks_to_embed, embeddings):
+                        chunk.dense_embedding = np.array(embedding).tolist()
                 pbar.update(len(chunks_batch))
                 await self._report_progress(
                     f"Embedded {pbar.n}/{total_chunks} chunks ({pbar.n/total_chunks:.2%})"
@@ -342,94 +566,255 @@ class EmbeddingService:
                 logger.error(f"Error embedding a batch of documents: {e}")
                 raise
 
-        # Create batches of chunks
-        chunks_batches = [
-            chunks[i : i + batch_size] for i in range(0, len(chunks), batch_size)
+        async def embed_worker():
+            while True:
+                try:
+                    batch = pending_batches.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                embedded_batch = await embed_batch(batch)
+                # Blocks while the upsert worker is behind, bounding memory
+                await upsert_queue.put(embedded_batch)
+
+        async def upsert_worker():
+            while True:
+                batch = await upsert_queue.get()
+                if batch is None:
+                    return
+                try:
+                    await vector_service.upsert(chunks=batch)
+                except Exception as e:
+                    logger.error(f"Error upserting embeddings: {e}")
+                    await self._report_progress(
+                        f"Error upserting embeddings: {str(e)}"
+                    )
+                    raise
+                upserted_chunks.extend(batch)
+                await self._report_progress(
+                    f"Upserted {len(upserted_chunks)}/{total_chunks} chunks ({len(upserted_chunks)/total_chunks:.2%})"
+                )
+
+        embed_tasks = [
+            asyncio.create_task(embed_worker())
+            for _ in range(min(num_workers, pending_batches.qsize()))
         ]
 
-        # Add batches to the queue
-        for batch in chunks_batches:
-            await queue.put(batch)
+        async def close_upsert_queue():
+            await asyncio.gather(*embed_tasks)
+            await self._report_progress("Embedding completed.")
+            await upsert_queue.put(None)
 
-        async def process_batches():
-            while not queue.empty():
-                batch = await queue.get()
-                await embed_batch(batch)
-                queue.task_done()
+        tasks = [
+            asyncio.create_task(upsert_worker()),
+            asyncio.create_task(close_upsert_queue()),
+            *embed_tasks,
+        ]
+        try:
+            done, pending = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_EXCEPTION
+            )
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            pbar.close()
 
-        # Process batches concurrently
-        tasks = [asyncio.create_task(process_batches()) for _ in range(10)]
-        await asyncio.gather(*tasks)
+        await self._report_progress("Upsert completed.")
+        return upserted_chunks
 
-        chunks_with_embeddings = [
-            chunk for chunk in chunks if chunk.dense_embedding is not None
-        ]
-        pbar.close()
+    async def get_indexed_fingerprints(
+        self, file_ids: list[str], index_name: Optional[str] = None
+    ) -> dict[str, str]:
+        """Map the ids of the points already stored for `file_ids` in this
+        namespace to their content fingerprints."""
+        vector_service = get_vector_service(
+            index_name=index_name or self.index_name,
+            credentials=self.vector_credentials,
+            encoder=self.encoder,
+            dimensions=self.dimensions,
+        )
+        indexed_fingerprints: dict[str, str] = {}
+        for file_id in file_ids:
+            indexed_fingerprints.update(
+                await vector_service.get_fingerprints(
+                    file_id=file_id, namespace=str(self.namespace)
+                )
+            )
+        return indexed_fingerprints
+
+    async def diff_against_index(
+        self, chunks: list[BaseDocumentChunk], index_name: Optional[str] = None
+    ) -> tuple[list[BaseDocumentChunk], list[str]]:
+        """Compare chunks with what is already indexed for their files.
+
+        Returns the chunks whose content is not indexed yet and the ids of
+        indexed points whose content no longer exists in the files.
+        """
+        file_ids = list(dict.fromkeys(chunk.metadata["file_id"] for chunk in chunks))
+        indexed_fingerprints = await self.get_indexed_fingerprints(
+            file_ids, index_name=index_name
+        )
+        return diff_fingerprints(chunks, indexed_fingerprints)
 
-        await self._report_progress(
-            f"Embedding completed. Starting upsert for {len(chunks_with_embeddings)} chunks..."
+    async def remove_near_duplicates(
+        self,
+        chunks: list[BaseDocumentChunk],
+        config: DeduplicationConfig,
+        index_name: Optional[str] = None,
+        exclude_point_ids: Optional[list[str]] = None,
+    ) -> list[BaseDocumentChunk]:
+        """Drop chunks that nearly repeat an earlier chunk of the batch, and
+        with `config.against_namespace` chunks that nearly repeat a chunk
+        already stored in the namespace, other than `exclude_point_ids`."""
+        if not chunks:
+            return chunks
+
+        signatures = await map_batches(
+            minhash_signatures,
+            [chunk.page_content for chunk in chunks],
+            config.num_perm,
+            config.shingle_size,
         )
 
-        if not chunks_with_embeddings:
-            logger.warn("No chunks to upsert. Aborting operation.")
-            await self._report_progress("No chunks to upsert. Aborting operation.")
-            return []
+        indexed_signatures = []
+        if config.against_namespace:
+            vector_service = get_vector_service(
+                index_name=index_name or self.index_name,
+                credentials=self.vector_credentials,
+                encoder=self.encoder,
+                dimensions=self.dimensions,
+            )
+            # Points that are about to be replaced must not shadow the
+            # chunks replacing them
+            excluded_ids = set(exclude_point_ids or []) | {
+                chunk.id for chunk in chunks
+            }
+            async for batch in vector_service.iter_contents(str(self.namespace)):
+                indexed_signatures.extend(
+                    await map_batches(
+                        minhash_signatures,
+                        [
+                            content
+                            for point_id, content in batch
+                            if point_id not in excluded_ids
+                        ],
+                        config.num_perm,
+                        config.shingle_size,
+                    )
+                )
+
+        duplicates = find_near_duplicates(
+            signatures, config.threshold, indexed_signatures
+        )
+        return [chunk for chunk, duplicate in zip(chunks, duplicates) if not duplicate]
 
+    async def delete_points(
+        self, point_ids: list[str], index_name: Optional[str] = None
+    ) -> None:
+        if not point_ids:
+            return
         vector_service = get_vector_service(
             index_name=index_name or self.index_name,
             credentials=self.vector_credentials,
-            encoder=encoder,
+            encoder=self.encoder,
             dimensions=self.dimensions,
         )
-        try:
-            total_chunks = len(chunks_with_embeddings)
-            for i in range(0, total_chunks, batch_size):
-                batch = chunks_with_embeddings[i : i + batch_size]
-                await vector_service.upsert(chunks=batch)
-                await self._report_progress(
-                    f"Upserted {min(i+batch_size, total_chunks)}/{total_chunks} chunks ({min(i+batch_size, total_chunks)/total_chunks:.2%})"
-                )
-        except Exception as e:
-            logger.error(f"Error upserting embeddings: {e}")
-            await self._report_progress(f"Error upserting embeddings: {str(e)}")
-            raise
+        await vector_service.delete_points(point_ids)
+        await self._report_progress(f"Deleted {len(point_ids)} stale chunks")
 
-        await self._report_progress("Upsert completed.")
-        return chunks_with_embeddings
+    def _group_pages(
+        self, documents: list[BaseDocumentChunk]
+    ) -> list[BaseDocumentChunk]:
+        """Join the chunks of each page of each file into one page chunk.
+        Pages are new chunks that take the metadata of their first chunk,
+        but not its embedding, since they have different content. Their id
+        is derived from the page content, so a page whose later chunks
+        changed does not reuse the id of its outdated summary, which is
+        deleted as stale."""
+        pages: dict[tuple, tuple[BaseDocumentChunk, list[str]]] = {}
+        for document in documents:
+            key = (
+                document.metadata.get("file_id"),
+                document.metadata.get("page_number", None),
+            )
+            if key not in pages:
+                pages[key] = (document, [])
+            pages[key][1].append(document.page_content)
+
+        grouped_pages = []
+        for (file_id, page_number), (first_chunk, parts) in pages.items():
+            page_content = "".join(parts)
+            fingerprint = content_fingerprint(page_content)
+            grouped_pages.append(
+                BaseDocumentChunk(
+                    id=chunk_id(
+                        first_chunk.namespace, file_id, page_number or 0, fingerprint
+                    ),
+                    page_content=page_content,
+                    namespace=first_chunk.namespace,
+                    metadata={**first_chunk.metadata, "fingerprint": fingerprint},
+                )
+            )
+        return grouped_pages
 
     async def generate_summary_documents(
         self, documents: list[BaseDocumentChunk]
     ) -> list[BaseDocumentChunk]:
-        pbar = tqdm(total=len(documents), desc="Grouping chunks")
-        pages: dict[int, BaseDocumentChunk] = {}
-        for document in documents:
-            page_number = document.metadata.get("page_number", None)
-            if page_number not in pages:
-                pages[page_number] = copy.deepcopy(document)
-            else:
-                pages[page_number].page_content += document.page_content
-            pbar.update()
-        pbar.close()
+        pages = self._group_pages(documents)
+        return await self._summarize_pages(pages)
+
+    async def generate_incremental_summary_documents(
+        self, documents: list[BaseDocumentChunk], index_name: str
+    ) -> tuple[list[BaseDocumentChunk], list[str]]:
+        """Summarize only the pages whose content is not summarized in
+        `index_name` yet, and return the ids of outdated summaries."""
+        pages = self._group_pages(documents)
+        file_ids = list(dict.fromkeys(page.metadata["file_id"] for page in pages))
+        indexed_fingerprints = await self.get_indexed_fingerprints(
+            file_ids, index_name=index_name
+        )
+        new_pages, stale_point_ids = diff_fingerprints(pages, indexed_fingerprints)
+        return await self._summarize_pages(new_pages), stale_point_ids
 
-        async def safe_completion(
-            document: BaseDocumentChunk,
-        ) -> Optional[BaseDocumentChunk]:
-            try:
-                document.page_content = await completion(document=document)
-                return document
-            except Exception as e:
-                logger.error(f"Error summarizing document {document.id}: {e}")
-                return None
+    async def _summarize_pages(
+        self, pages: list[BaseDocumentChunk]
+    ) -> list[BaseDocumentChunk]:
+        """Replace the content of each page with its summary, dropping pages
+        that could not be summarized. Pages whose content was summarized
+        before by the same model reuse the cached summary."""
+        texts = [page.page_content for page in pages]
+        summary_cache = get_summary_cache()
+        summaries = (
+            await summary_cache.get_many(texts)
+            if summary_cache is not None
+            else [None] * len(texts)
+        )
 
-        pbar = tqdm(desc="Summarizing documents")
-        summary_documents = []
-        for future in asyncio.as_completed(
-            [safe_completion(document) for document in pages.values()]
-        ):
-            document = await future
-            if document:
-                summary_documents.append(document)
-            pbar.update()
-        pbar.close()
+        missing = [index for index, summary in enumerate(summaries) if summary is None]
+        if missing:
+            new_summaries = await get_summarizer().summarize_texts(
+                [texts[index] for index in missing]
+            )
+            for index, summary in zip(missing, new_summaries):
+                summaries[index] = summary
+            if summary_cache is not None:
+                summarized = [
+                    index for index in missing if summaries[index] is not None
+                ]
+                await summary_cache.set_many(
+                    [texts[index] for index in summarized],
+                    [summaries[index] for index in summarized],
+                )
+        if len(missing) < len(pages):
+            await self._report_progress(
+                f"Reused {len(pages) - len(missing)} cached page summaries"
+            )
 
+        summary_documents = []
+        for page, summary in zip(pages, summaries):
+            if summary is not None:
+                page.page_content = summary
+                summary_documents.append(page)
         return summary_documents
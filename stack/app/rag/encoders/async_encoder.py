@@ -0,0 +1,143 @@
+import asyncio
+import time
+import weakref
+from typing import List, Optional
+
+import structlog
+from semantic_router.encoders import BaseEncoder
+
+from stack.app.cache.embedding_cache import EmbeddingCache, get_embedding_cache
+from stack.app.core.configuration import get_settings
+from stack.app.schema.rag import EncoderConfig, EncoderProvider
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+class RateLimiter:
+    """Spaces out requests so no more than `requests_per_minute` start in
+    any minute."""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class ProviderLimiter:
+    def __init__(self, max_concurrency: int, requests_per_minute: Optional[int]):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limiter = (
+            RateLimiter(requests_per_minute) if requests_per_minute else None
+        )
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+# asyncio primitives are bound to the loop they are first used on, so limiters
+# are shared per provider within each running event loop.
+_limiters: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_encoder_provider(encoder: BaseEncoder) -> Optional[EncoderProvider]:
+    for provider in EncoderProvider:
+        encoder_config = EncoderConfig.get_encoder_config(provider)
+        if encoder_config and isinstance(encoder, encoder_config["class"]):
+            return provider
+    return None
+
+
+def get_provider_limiter(encoder: BaseEncoder) -> ProviderLimiter:
+    provider = get_encoder_provider(encoder)
+    key = provider.value if provider else type(encoder).__name__
+    loop_limiters = _limiters.setdefault(asyncio.get_running_loop(), {})
+    if key not in loop_limiters:
+        encoder_config = EncoderConfig.get_encoder_config(provider) or {}
+        overrides = settings.ENCODER_RATE_LIMITS.get(key, {})
+        max_concurrency = overrides.get(
+            "max_concurrency",
+            encoder_config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY),
+        )
+        requests_per_minute = overrides.get(
+            "requests_per_minute", encoder_config.get("requests_per_minute")
+        )
+        logger.debug(
+            f"Creating encoder limiter for {key}: "
+            f"max_concurrency={max_concurrency}, requests_per_minute={requests_per_minute}"
+        )
+        loop_limiters[key] = ProviderLimiter(max_concurrency, requests_per_minute)
+    return loop_limiters[key]
+
+
+def has_native_acall(encoder: BaseEncoder) -> bool:
+    """Whether the encoder class overrides `acall` with a real async
+    implementation."""
+    encoder_acall = getattr(type(encoder), "acall", None)
+    return encoder_acall is not None and encoder_acall is not getattr(
+        BaseEncoder, "acall", None
+    )
+
+
+class AsyncEncoder:
+    """Async wrapper around a semantic_router encoder.
+
+    Uses the encoder's native `acall` when it has one, otherwise runs the
+    blocking `__call__` in the default thread pool. Every call goes through
+    the provider's concurrency and rate limits. When an embedding cache is
+    configured, cached vectors are returned without calling the encoder.
+    """
+
+    def __init__(self, encoder: BaseEncoder, use_cache: bool = True):
+        self.encoder = encoder
+        self.native = has_native_acall(encoder)
+        self.cache: Optional[EmbeddingCache] = (
+            get_embedding_cache() if use_cache else None
+        )
+
+    async def acall(self, docs: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            return await self._encode(docs)
+
+        vectors = await self.cache.get_many(self.encoder, docs)
+        missing = list(
+            dict.fromkeys(doc for doc, vector in zip(docs, vectors) if vector is None)
+        )
+        if missing:
+            encoded = dict(zip(missing, await self._encode(missing)))
+            await self.cache.set_many(self.encoder, missing, list(encoded.values()))
+            vectors = [
+                vector if vector is not None else encoded[doc]
+                for doc, vector in zip(docs, vectors)
+            ]
+        return vectors
+
+    async def _encode(self, docs: List[str]) -> List[List[float]]:
+        async with get_provider_limiter(self.encoder):
+            if self.native:
+                try:
+                    return await self.encoder.acall(docs)
+                except NotImplementedError:
+                    self.native = False
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.encoder, docs)
+
+
+async def aencode(encoder: BaseEncoder, docs: List[str]) -> List[List[float]]:
+    return await AsyncEncoder(encoder).acall(docs)
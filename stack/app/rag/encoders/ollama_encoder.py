@@ -26,3 +26,6 @@ class OllamaEncoder(BaseEncoder):
 
     def __call__(self, docs: List[str]) -> List[List[float]]:
         return self.embeddings.embed_documents(docs)
+
+    async def acall(self, docs: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(docs)
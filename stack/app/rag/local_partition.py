@@ -0,0 +1,114 @@
+"""
+local_partition.py
+----------
+
+Offline alternative to the Unstructured API for formats that the parsers
+in `stack.app.utils.file_helpers.HANDLERS` can read.
+
+Documents are parsed in-process and split into paragraph elements shaped
+like the elements returned by Unstructured, so the existing splitters can
+consume them. `split_elements` turns those elements into token-bounded
+chunks with a recursive splitter.
+"""
+import re
+from typing import Callable, Optional, Union
+
+from langchain_core.document_loaders import Blob
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from stack.app.rag.token_counter import get_token_counter
+from stack.app.utils.file_helpers import get_file_handler
+
+PARAGRAPH_SEPARATOR = re.compile(r"\n\s*\n")
+
+
+def can_partition_locally(mime_type: Optional[str]) -> bool:
+    return get_file_handler(mime_type) is not None
+
+
+def partition_locally(
+    content: Union[bytes, str], mime_type: str, file_name: Optional[str] = None
+) -> list[dict]:
+    """Parse `content` and return one `NarrativeText` element per
+    paragraph."""
+    parser = get_file_handler(mime_type)
+    if parser is None:
+        raise ValueError(f"No local parser for mime type {mime_type}")
+
+    elements = []
+    for document in parser.lazy_parse(Blob.from_data(content, mime_type=mime_type)):
+        metadata = {"filetype": mime_type}
+        if file_name:
+            metadata["filename"] = file_name
+        if "page" in document.metadata:
+            metadata["page_number"] = int(document.metadata["page"]) + 1
+        for paragraph in PARAGRAPH_SEPARATOR.split(document.page_content):
+            paragraph = paragraph.strip()
+            if paragraph:
+                elements.append(
+                    {"type": "NarrativeText", "text": paragraph, "metadata": metadata}
+                )
+    return elements
+
+
+def _recursive_splitter(
+    chunk_size: int,
+    chunk_overlap: int,
+    length_function: Optional[Callable[[str], int]] = None,
+) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=min(chunk_overlap, chunk_size // 2),
+        length_function=length_function or get_token_counter().count,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+
+
+def split_elements(
+    elements: list[dict],
+    chunk_size: int,
+    chunk_overlap: int,
+    length_function: Optional[Callable[[str], int]] = None,
+) -> list[dict]:
+    """Join the elements of each page and split them recursively on
+    paragraphs, lines, sentences and words into chunks of at most
+    `chunk_size`, measured in tokens unless `length_function` is given."""
+    splitter = _recursive_splitter(chunk_size, chunk_overlap, length_function)
+
+    pages: dict[Optional[int], list[dict]] = {}
+    for element in elements:
+        if not element.get("text"):
+            continue
+        page_number = element.get("metadata", {}).get("page_number")
+        pages.setdefault(page_number, []).append(element)
+
+    chunks = []
+    for page_elements in pages.values():
+        text = "\n\n".join(element["text"] for element in page_elements)
+        metadata = page_elements[0].get("metadata", {})
+        chunks.extend(
+            {"page_content": chunk, "metadata": {**metadata}}
+            for chunk in splitter.split_text(text)
+        )
+    return chunks
+
+
+def split_texts(
+    texts: list[str], chunk_size: int, chunk_overlap: int
+) -> list[list[tuple[str, int]]]:
+    """Split each text on its own into chunks of at most `chunk_size`
+    tokens, returned with their token counts. Texts that fit are kept whole
+    without running the splitter, and blank texts have no chunks."""
+    token_counter = get_token_counter()
+    splitter = None
+    results = []
+    for text, token_count in zip(texts, token_counter.count_batch(texts)):
+        if not text.strip():
+            results.append([])
+        elif token_count <= chunk_size:
+            results.append([(text, token_count)])
+        else:
+            splitter = splitter or _recursive_splitter(chunk_size, chunk_overlap)
+            chunks = splitter.split_text(text)
+            results.append(list(zip(chunks, token_counter.count_batch(chunks))))
+    return results
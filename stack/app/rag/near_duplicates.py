@@ -0,0 +1,134 @@
+"""
+near_duplicates.py
+----------
+
+Near-duplicate detection with MinHash signatures and an LSH index.
+
+Each text is reduced to its set of word shingles and summarized by a
+MinHash signature whose positions agree between two texts with a
+probability equal to the Jaccard similarity of their shingle sets. The
+signature is cut into bands, and texts sharing a band are candidates whose
+estimated similarity is then checked against the threshold, so each text is
+compared with a handful of candidates instead of every other text.
+"""
+import hashlib
+import re
+from typing import Iterable
+
+import numpy as np
+
+# Hashes are reduced modulo a Mersenne prime below 2**31 so `a * x + b` fits
+# in an unsigned 64-bit integer
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str, shingle_size: int) -> set[str]:
+    """Set of `shingle_size` consecutive lowercase words in `text`."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= shingle_size:
+        return {" ".join(words)} if words else set()
+    return {
+        " ".join(words[i : i + shingle_size])
+        for i in range(len(words) - shingle_size + 1)
+    }
+
+
+def _permutations(num_perm: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(
+    texts: list[str], num_perm: int, shingle_size: int, seed: int = 1
+) -> list[np.ndarray]:
+    """MinHash signature of each text. Texts without words get a signature
+    of `MERSENNE_PRIME`, which no text with words can have."""
+    a, b = _permutations(num_perm, seed)
+    signatures = []
+    for text in texts:
+        text_shingles = shingles(text, shingle_size)
+        if not text_shingles:
+            signatures.append(np.full(num_perm, MERSENNE_PRIME, dtype=np.uint64))
+            continue
+        hashes = np.fromiter(
+            (
+                int.from_bytes(
+                    hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(),
+                    "little",
+                )
+                for shingle in text_shingles
+            ),
+            dtype=np.uint64,
+            count=len(text_shingles),
+        )
+        hashes %= MERSENNE_PRIME
+        signatures.append(
+            ((np.outer(hashes, a) + b) % MERSENNE_PRIME).min(axis=0).astype(np.uint64)
+        )
+    return signatures
+
+
+def lsh_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """Number of bands and rows per band whose candidate threshold
+    `(1 / bands) ** (1 / rows)` is closest to `threshold`."""
+    return min(
+        (
+            (bands, num_perm // bands)
+            for bands in range(1, num_perm + 1)
+            if num_perm % bands == 0
+        ),
+        key=lambda params: abs((1 / params[0]) ** (1 / params[1]) - threshold),
+    )
+
+
+class MinHashLSH:
+    def __init__(self, threshold: float, num_perm: int):
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self.buckets: list[dict[bytes, list[int]]] = [{} for _ in range(self.bands)]
+        self.signatures: list[np.ndarray] = []
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows : (band + 1) * self.rows].tobytes()
+
+    def insert(self, signature: np.ndarray) -> None:
+        position = len(self.signatures)
+        self.signatures.append(signature)
+        for band, key in self._band_keys(signature):
+            self.buckets[band].setdefault(key, []).append(position)
+
+    def has_near_duplicate(self, signature: np.ndarray) -> bool:
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self.buckets[band].get(key, ()))
+        return any(
+            np.mean(self.signatures[candidate] == signature) >= self.threshold
+            for candidate in candidates
+        )
+
+
+def find_near_duplicates(
+    signatures: list[np.ndarray],
+    threshold: float,
+    indexed_signatures: Iterable[np.ndarray] = (),
+) -> list[bool]:
+    """Flag each signature that is a near-duplicate of an indexed signature
+    or of an earlier one in `signatures`. The first occurrence of a passage
+    is kept."""
+    if not signatures:
+        return []
+    lsh = MinHashLSH(threshold, num_perm=len(signatures[0]))
+    for signature in indexed_signatures:
+        lsh.insert(signature)
+
+    duplicates = []
+    for signature in signatures:
+        is_duplicate = lsh.has_near_duplicate(signature)
+        if not is_duplicate:
+            lsh.insert(signature)
+        duplicates.append(is_duplicate)
+    return duplicates
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+import requests
+import structlog
+from requests.adapters import HTTPAdapter
+from unstructured_client import UnstructuredClient
+from unstructured_client.models import shared
+
+from stack.app.core.configuration import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+# The Unstructured SDK only exposes a blocking API, so partition requests are
+# run on a dedicated thread pool that shares a single pooled HTTP session.
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_unstructured_client: Optional[UnstructuredClient] = None
+_partition_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_unstructured_client() -> UnstructuredClient:
+    """Return the process-wide Unstructured client, creating it on first
+    use."""
+    global _session, _unstructured_client
+    if _unstructured_client is None:
+        with _lock:
+            if _unstructured_client is None:
+                _session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.UNSTRUCTURED_MAX_CONNECTIONS,
+                    pool_maxsize=settings.UNSTRUCTURED_MAX_CONNECTIONS,
+                )
+                _session.mount("http://", adapter)
+                _session.mount("https://", adapter)
+                _unstructured_client = UnstructuredClient(
+                    api_key_auth=settings.UNSTRUCTURED_API_KEY,
+                    server_url=settings.UNSTRUCTURED_BASE_URL,
+                    client=_session,
+                )
+    return _unstructured_client
+
+
+def get_partition_executor() -> ThreadPoolExecutor:
+    """Return the thread pool used to run blocking partition requests."""
+    global _partition_executor
+    if _partition_executor is None:
+        with _lock:
+            if _partition_executor is None:
+                _partition_executor = ThreadPoolExecutor(
+                    max_workers=settings.UNSTRUCTURED_MAX_CONNECTIONS,
+                    thread_name_prefix="unstructured-partition",
+                )
+    return _partition_executor
+
+
+async def apartition(
+    req: shared.PartitionParameters,
+    client: Optional[UnstructuredClient] = None,
+) -> Any:
+    """Run an Unstructured partition request without blocking the event
+    loop."""
+    client = client or get_unstructured_client()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_partition_executor(), client.general.partition, req
+    )
+
+
+def shutdown_partition_executor() -> None:
+    """Release the partition thread pool and HTTP connections."""
+    global _session, _unstructured_client, _partition_executor
+    with _lock:
+        if _partition_executor is not None:
+            _partition_executor.shutdown(wait=False, cancel_futures=True)
+            _partition_executor = None
+        if _session is not None:
+            _session.close()
+            _session = None
+        _unstructured_client = None
+        logger.info("Unstructured partition executor shut down")
@@ -1,9 +1,12 @@
+import asyncio
+
 import structlog
 from semantic_router.layer import RouteLayer
 from semantic_router.route import Route
 from semantic_router.encoders import BaseEncoder
 
 from stack.app.schema.rag import BaseDocumentChunk, QueryRequestPayload
+from stack.app.rag.encoders.async_encoder import AsyncEncoder
 from .summarizer import SUMMARY_SUFFIX
 from stack.app.vectordbs import BaseVectorDatabase, get_vector_service
 
@@ -29,35 +32,104 @@ def create_route_layer(encoder: BaseEncoder) -> RouteLayer:
     return RouteLayer(encoder=encoder, routes=routes)
 
 
-async def get_documents(
-    *, vector_service: BaseVectorDatabase, payload: QueryRequestPayload
+async def rerank_documents(
+    *,
+    vector_service: BaseVectorDatabase,
+    query: str,
+    chunks: list[BaseDocumentChunk],
+    enable_rerank: bool,
 ) -> list[BaseDocumentChunk]:
-    chunks = await vector_service.query(input=payload.input, top_k=5)
     if not len(chunks):
-        logger.info(f"No documents found for query: {payload.input}")
+        logger.info(f"No documents found for query: {query}")
         return []
 
-    if not payload.enable_rerank:
+    if not enable_rerank:
         return chunks
 
     reranked_chunks = []
-    reranked_chunks.extend(
-        await vector_service.rerank(query=payload.input, documents=chunks)
-    )
+    reranked_chunks.extend(await vector_service.rerank(query=query, documents=chunks))
     return reranked_chunks
 
 
+async def get_documents(
+    *, vector_service: BaseVectorDatabase, payload: QueryRequestPayload
+) -> list[BaseDocumentChunk]:
+    chunks = await vector_service.query(input=payload.input, top_k=5)
+    return await rerank_documents(
+        vector_service=vector_service,
+        query=payload.input,
+        chunks=chunks,
+        enable_rerank=payload.enable_rerank,
+    )
+
+
+def get_index_name(payload: QueryRequestPayload, decision: str) -> str:
+    return (
+        f"{payload.index_name}_{SUMMARY_SUFFIX}"
+        if decision == "summarize"
+        else payload.index_name
+    )
+
+
 async def query_documents(payload: QueryRequestPayload) -> list[BaseDocumentChunk]:
     encoder = payload.encoder.get_encoder()
     rl = create_route_layer(encoder)
     decision = rl(payload.input).name
 
     vector_service: BaseVectorDatabase = get_vector_service(
-        index_name=f"{payload.index_name}_{SUMMARY_SUFFIX}"
-        if decision == "summarize"
-        else payload.index_name,
+        index_name=get_index_name(payload, decision),
         credentials=payload.vector_database,
         encoder=encoder,
         namespace=payload.namespace,
     )
     return await get_documents(vector_service=vector_service, payload=payload)
+
+
+async def query_documents_batch(
+    payload: QueryRequestPayload, inputs: list[str]
+) -> list[list[BaseDocumentChunk]]:
+    """Query documents for several inputs that share the settings of
+    `payload` (its `input` is ignored).
+
+    All inputs are embedded in one encoder call, routed with their vectors,
+    and searched with one batch request per collection.
+    """
+    if not inputs:
+        return []
+    encoder = payload.encoder.get_encoder()
+    vectors = await AsyncEncoder(encoder).acall(inputs)
+    rl = create_route_layer(encoder)
+    index_names = [
+        get_index_name(payload, rl(vector=vector).name) for vector in vectors
+    ]
+
+    results: list[list[BaseDocumentChunk]] = [[] for _ in inputs]
+    vector_services: dict[str, BaseVectorDatabase] = {}
+    for index_name in dict.fromkeys(index_names):
+        positions = [i for i, name in enumerate(index_names) if name == index_name]
+        vector_service = vector_services[index_name] = get_vector_service(
+            index_name=index_name,
+            credentials=payload.vector_database,
+            encoder=encoder,
+            namespace=payload.namespace,
+        )
+        batch_chunks = await vector_service.query_batch(
+            [inputs[i] for i in positions],
+            top_k=5,
+            vectors=[vectors[i] for i in positions],
+        )
+        for position, chunks in zip(positions, batch_chunks):
+            results[position] = chunks
+
+    return await asyncio.gather(
+        *[
+            # Each input is reranked by the service of the index it searched
+            rerank_documents(
+                vector_service=vector_services[index_name],
+                query=query,
+                chunks=chunks,
+                enable_rerank=payload.enable_rerank,
+            )
+            for query, chunks, index_name in zip(inputs, results, index_names)
+        ]
+    )
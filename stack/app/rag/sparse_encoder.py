@@ -0,0 +1,54 @@
+"""
+sparse_encoder.py
+----------
+
+Local BM25 sparse vectors for hybrid search.
+
+Document vectors hold the term frequency part of the BM25 score of each
+token. The inverse document frequency part is applied by Qdrant at query
+time (`Modifier.IDF` on the sparse vector), so it follows the collection as
+it grows. Query vectors give every distinct token a weight of one, so the
+score of a document is its BM25 score for the query. Tokens are hashed to
+indices, so no vocabulary has to be built or stored.
+"""
+import hashlib
+import re
+from collections import Counter
+from functools import lru_cache
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Usual BM25 parameters, with a fixed average document length since chunks
+# are bounded in size
+K1 = 1.2
+B = 0.75
+AVERAGE_DOCUMENT_LENGTH = 256
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+@lru_cache(maxsize=65536)
+def token_index(token: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little"
+    )
+
+
+def sparse_document_vector(text: str) -> tuple[list[int], list[float]]:
+    """Indices and BM25 term frequency weights of the tokens of `text`."""
+    tokens = tokenize(text)
+    length_norm = K1 * (1 - B + B * len(tokens) / AVERAGE_DOCUMENT_LENGTH)
+    counts = Counter(token_index(token) for token in tokens)
+    indices = list(counts)
+    return indices, [counts[i] * (K1 + 1) / (counts[i] + length_norm) for i in indices]
+
+
+def sparse_document_vectors(texts: list[str]) -> list[tuple[list[int], list[float]]]:
+    return [sparse_document_vector(text) for text in texts]
+
+
+def sparse_query_vector(text: str) -> tuple[list[int], list[float]]:
+    """Indices of the distinct tokens of `text`, each weighted one."""
+    indices = list(dict.fromkeys(token_index(token) for token in tokenize(text)))
+    return indices, [1.0] * len(indices)
@@ -1,12 +1,11 @@
 import re
-from typing import Any
+from typing import Any, Optional
 import structlog
 from colorama import Fore, Style
 from semantic_router.encoders.base import BaseEncoder
 from semantic_router.splitters import RollingWindowSplitter
-from stack.app.rag.util import get_tiktoken_length
-
-from stack.app.rag.table_parser import TableParser
+from stack.app.rag.cpu_executor import run_cpu_bound, should_offload
+from stack.app.rag.table_parser import split_table
 
 logger = structlog.get_logger()
 
@@ -40,65 +39,7 @@ class UnstructuredSemanticSplitter:
         return True
 
     def _split_table(self, table_html: str, max_split_tokens: int) -> list[str]:
-        parser = TableParser()
-        parser.feed(table_html)
-
-        # Create the full table HTML to check if it needs splitting
-        full_table = (
-            '<table border="1" class="dataframe">'
-            + parser.title_row
-            + "<tbody>"
-            + "".join(parser.rows)
-            + "</tbody></table>"
-        )
-
-        # If the full table is within the token limit, return it without splitting
-        if get_tiktoken_length(full_table) <= max_split_tokens:
-            return [full_table]
-
-        splitted_tables = []  # To store split tables
-        current_chunk = []
-
-        # If the table exceeds the token limit, split it
-        for row in parser.rows:
-            # Temporarily add the current row to the chunk to check size
-            temp_table = (
-                '<table border="1" class="dataframe">'
-                + parser.title_row
-                + "<tbody>"
-                + "".join(current_chunk + [row])
-                + "</tbody></table>"
-            )
-            if get_tiktoken_length(temp_table) > max_split_tokens:
-                if current_chunk:
-                    # Finalize the current chunk if it's not empty
-                    splitted_tables.append(
-                        '<table border="1" class="dataframe">'
-                        + parser.title_row
-                        + "<tbody>"
-                        + "".join(current_chunk)
-                        + "</tbody></table>"
-                    )
-                    current_chunk = [row]  # Start a new chunk with the current row
-                else:
-                    # If a single row exceeds the limit,
-                    # add it anyway (to handle edge cases)
-                    splitted_tables.append(temp_table)
-                    current_chunk = []  # Reset for the next chunk
-            else:
-                current_chunk.append(row)  # Add the row to the current chunk
-
-        # Add any remaining rows as a chunk
-        if current_chunk:
-            splitted_tables.append(
-                '<table border="1" class="dataframe">'
-                + parser.title_row
-                + "<tbody>"
-                + "".join(current_chunk)
-                + "</tbody></table>"
-            )
-
-        return splitted_tables
+        return split_table(table_html, max_split_tokens)
 
     def _group_elements_by_title(self, elements: list[dict[str, Any]]) -> dict:
         grouped_elements = {}
@@ -123,17 +64,50 @@ class UnstructuredSemanticSplitter:
         page_content: str,
         chunk_index: int,
         metadata: dict,
+        dense_embedding: Optional[list[float]] = None,
+    ):
+        chunk = {
+            "page_content": page_content,
+            "metadata": {
+                **metadata,
+                "title": title,
+                "chunk_index": chunk_index,
+            },
+        }
+        if dense_embedding is not None:
+            chunk["dense_embedding"] = dense_embedding
+        chunks_with_title.append(chunk)
+
+    async def _append_table_chunks(
+        self,
+        chunks_with_title: list[dict[str, Any]],
+        title: str,
+        chunk_index: int,
+        element: dict[str, Any],
     ):
-        chunks_with_title.append(
-            {
-                "page_content": page_content,
-                "metadata": {
-                    **metadata,
-                    "title": title,
-                    "chunk_index": chunk_index,
-                },
-            }
+        # Add table as a separate chunk or split it if
+        table_html = element.get("metadata", {}).get("text_as_html", "")
+        # Large tables are split in the process pool
+        splitted_tables = await run_cpu_bound(
+            split_table,
+            table_html,
+            self.max_split_tokens,
+            offload=should_offload(table_html.count("<tr")),
         )
+        metadata = {**element.get("metadata", {})}
+        metadata.pop("text_as_html", None)
+        for table in splitted_tables:
+            if not table:
+                logger.warning("Empty table encountered")
+                continue
+            self._append_chunks(
+                chunks_with_title,
+                title=title,
+                page_content=table,  # TODO: This should be a summary of table
+                chunk_index=chunk_index,
+                # TODO: Think of how to pass this to LLM
+                metadata={"table_content": table, **metadata},
+            )
 
     async def split_grouped_elements(
         self, elements: list[dict[str, Any]], splitter: RollingWindowSplitter
@@ -145,9 +119,7 @@ class UnstructuredSemanticSplitter:
             if not elements:
                 continue
             section_metadata = elements[0].get("metadata", {})
-            accumulated_element_texts: list[str] = [
-                element.get("text") for element in elements if element.get("text")
-            ]
+            accumulated_element_texts: list[str] = []
             chunks: list[dict[str, Any]] = []
 
             for element in elements:
@@ -170,25 +142,12 @@ class UnstructuredSemanticSplitter:
                             []
                         )  # Start new accumulation after table
 
-                    # Add table as a separate chunk or split it if
-                    table_html = element.get("metadata", {}).get("text_as_html", "")
-                    splitted_tables = self._split_table(
-                        table_html, self.max_split_tokens
+                    await self._append_table_chunks(
+                        chunks_with_title,
+                        title=title,
+                        chunk_index=index,
+                        element=element,
                     )
-                    metadata = {**element.get("metadata", {})}
-                    metadata.pop("text_as_html", None)
-                    for table in splitted_tables:
-                        if not table:
-                            logger.warning("Empty table encountered")
-                            continue
-                        self._append_chunks(
-                            chunks_with_title,
-                            title=title,
-                            page_content=table,  # TODO: This should be a summary of table
-                            chunk_index=index,
-                            # TODO: Think of how to pass this to LLM
-                            metadata={"table_content": table, **metadata},
-                        )
                 else:
                     accumulated_element_texts.append(element.get("text"))
 
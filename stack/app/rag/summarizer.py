@@ -1,4 +1,10 @@
+import asyncio
+import weakref
+from collections import defaultdict
+from functools import lru_cache
 from typing import Optional
+
+import structlog
 from stack.app.core.configuration import get_settings
 from stack.app.schema.rag import BaseDocumentChunk
 from stack.app.agents.llm import (
@@ -8,14 +14,33 @@ from stack.app.agents.llm import (
     get_mixtral_fireworks,
     get_ollama_llm,
 )
+from stack.app.rag.local_partition import split_texts
 from langchain_core.language_models import BaseChatModel
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 
 
 SUMMARY_SUFFIX = "summary"
+# Rounds of combining partial summaries before they are kept as they are
+MAX_REDUCE_ROUNDS = 3
+
+logger = structlog.get_logger()
 settings = get_settings()
 
+# asyncio primitives are bound to the loop they are first used on, so the
+# limit on summarization LLM calls is shared per running event loop.
+_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_summarization_semaphore() -> asyncio.Semaphore:
+    """Semaphore bounding the summarization LLM calls in flight across all
+    ingestions running on the current event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(settings.SUMMARIZATION_MAX_CONCURRENCY)
+    return _semaphores[loop]
+
 
 class Summarizer:
     def __init__(self):
@@ -29,6 +54,17 @@ class Summarizer:
             "Your summary:"
         )
         self.chain = self.prompt | self.llm | StrOutputParser()
+        self.reduce_prompt = ChatPromptTemplate.from_template(
+            "The text below consists of summaries of consecutive parts of a "
+            "longer text. Combine them into a single in-depth summary of the "
+            "whole text:\n\n"
+            "Summaries:\n"
+            "------------------------------------------\n"
+            "{text}\n"
+            "------------------------------------------\n\n"
+            "Your summary:"
+        )
+        self.reduce_chain = self.reduce_prompt | self.llm | StrOutputParser()
 
     def _get_llm(self) -> BaseChatModel:
         provider = settings.SUMMARIZATION_MODEL_PROVIDER.lower()
@@ -48,9 +84,93 @@ class Summarizer:
             raise ValueError(f"Unsupported LLM provider: {provider}")
 
     async def summarize(self, document: BaseDocumentChunk) -> str:
-        return await self.chain.ainvoke({"text": document.page_content})
+        async with get_summarization_semaphore():
+            return await self.chain.ainvoke({"text": document.page_content})
+
+    async def summarize_texts(
+        self,
+        texts: list[str],
+        max_input_tokens: int = settings.SUMMARIZATION_MAX_INPUT_TOKENS,
+    ) -> list[Optional[str]]:
+        """Summarize `texts`, returning None for texts that failed.
+
+        Each round sends every pending text to the LLM at once, and the
+        summarization semaphore keeps at most `SUMMARIZATION_MAX_CONCURRENCY`
+        calls in flight across all ingestions. Texts longer
+        than `max_input_tokens` are split into parts (map), and the joined
+        summaries of the parts are summarized again in the next round
+        (reduce) until a single summary is left.
+        """
+        summaries: list[Optional[str]] = [None] * len(texts)
+        pending = dict(enumerate(texts))
+        chain = self.chain
+        for round_number in range(MAX_REDUCE_ROUNDS + 1):
+            if not pending:
+                break
+            owners = []
+            parts = []
+            positions = list(pending)
+            # Tokenizing long pages would block the event loop
+            split_pending = await asyncio.to_thread(
+                split_texts, [pending[p] for p in positions], max_input_tokens, 0
+            )
+            for position, text_parts in zip(positions, split_pending):
+                for part, _ in text_parts:
+                    owners.append(position)
+                    parts.append(part)
+
+            outputs = await self._ainvoke_all(chain, parts)
+            partial_summaries: dict[int, list[str]] = defaultdict(list)
+            failed = set()
+            for position, output in zip(owners, outputs):
+                if isinstance(output, Exception):
+                    logger.error(f"Error summarizing text {position}: {output}")
+                    failed.add(position)
+                else:
+                    partial_summaries[position].append(output)
+
+            next_pending = {}
+            for position in positions:
+                if position in failed or not partial_summaries[position]:
+                    continue
+                if len(partial_summaries[position]) == 1:
+                    summaries[position] = partial_summaries[position][0]
+                elif round_number == MAX_REDUCE_ROUNDS:
+                    summaries[position] = "\n\n".join(partial_summaries[position])
+                else:
+                    next_pending[position] = "\n\n".join(
+                        partial_summaries[position]
+                    )
+            pending = next_pending
+            chain = self.reduce_chain
+        return summaries
+
+    @staticmethod
+    async def _ainvoke_all(chain: Runnable, texts: list[str]) -> list[object]:
+        """Invoke `chain` on every text, returning the exception raised for
+        texts that failed.
+
+        `chain.abatch` with a `max_concurrency` config only bounds the calls
+        of one batch, so the calls are gathered under the summarization
+        semaphore instead to bound them across concurrent ingestions.
+        """
+        semaphore = get_summarization_semaphore()
+
+        async def ainvoke(text: str) -> str:
+            async with semaphore:
+                return await chain.ainvoke({"text": text})
+
+        return await asyncio.gather(
+            *[ainvoke(text) for text in texts], return_exceptions=True
+        )
+
+
+@lru_cache(maxsize=None)
+def get_summarizer() -> Summarizer:
+    """Summarizer shared by all ingestions, so the LLM client is created
+    once."""
+    return Summarizer()
 
 
 async def completion(*, document: BaseDocumentChunk) -> str:
-    summarizer = Summarizer()
-    return await summarizer.summarize(document)
+    return await get_summarizer().summarize(document)
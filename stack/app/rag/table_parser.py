@@ -1,4 +1,9 @@
+from collections import deque
 from html.parser import HTMLParser
+from typing import Iterable, Iterator, Optional, Union
+
+from stack.app.rag.token_counter import get_token_counter
+from stack.app.rag.util import get_tiktoken_length
 
 
 class TableParser(HTMLParser):
@@ -10,7 +15,7 @@ class TableParser(HTMLParser):
         self.in_row = False
         self.in_cell = False
         self.title_row = ""
-        self.current_row = ""
+        self.current_row: list[str] = []
         self.rows = []
         self.capture_next_row_as_title = True
 
@@ -23,10 +28,10 @@ class TableParser(HTMLParser):
             self.in_tbody = True
         elif tag == "tr":
             self.in_row = True
-            self.current_row = ""
+            self.current_row = []
         elif tag in ["td", "th"]:
             self.in_cell = True
-            self.current_row += "<" + tag + ">"
+            self.current_row.append("<" + tag + ">")
 
     def handle_endtag(self, tag):
         if tag == "table":
@@ -37,16 +42,197 @@ class TableParser(HTMLParser):
             self.in_tbody = False
         elif tag == "tr":
             self.in_row = False
-            self.current_row += "</tr>"
+            self.current_row.append("</tr>")
+            row = "".join(self.current_row)
+            self.current_row = []
             if self.capture_next_row_as_title:
-                self.title_row = self.current_row
+                self.title_row = row
                 self.capture_next_row_as_title = False
             else:
-                self.rows.append(self.current_row)
+                self.handle_row(row)
         elif tag in ["td", "th"]:
             self.in_cell = False
-            self.current_row += "</" + tag + ">"
+            self.current_row.append("</" + tag + ">")
 
     def handle_data(self, data):
         if self.in_cell:
-            self.current_row += data
+            self.current_row.append(data)
+
+    def handle_row(self, row: str):
+        self.rows.append(row)
+
+
+TABLE_PREFIX = '<table border="1" class="dataframe">'
+TABLE_SUFFIX = "</tbody></table>"
+
+# Number of characters of a table fed to the streaming splitter at once
+FEED_SIZE = 64 * 1024
+
+
+def build_table(title_row: str, rows: list[str]) -> str:
+    return TABLE_PREFIX + title_row + "<tbody>" + "".join(rows) + TABLE_SUFFIX
+
+
+def _is_well_formed_row(row: str) -> bool:
+    return (
+        len(row) > 3
+        and row[0] == "<"
+        and row[1].isalpha()
+        and row[-1] == ">"
+        and row[-2].isalpha()
+    )
+
+
+class StreamingTableSplitter(TableParser):
+    """Table parser that splits the table while it is being fed.
+
+    Rows are added to the current table as soon as they are parsed and
+    finished tables of at most `max_split_tokens` tokens are collected in
+    `tables`, so only the rows of the table being built are kept in memory.
+    Tables are built the same way as `split_table_by_retokenizing` builds
+    them, but each row is tokenized only once: a row of the form
+    `<td>...</tr>` is tokenized by tiktoken at the same points whether it
+    stands alone without its outer `<` and `>` or is joined with other rows,
+    the `><` between two rows being a token sequence of its own. The token
+    count of a table is then a running sum. Tables containing other rows
+    fall back to tokenizing the candidate table.
+    """
+
+    def __init__(self, max_split_tokens: int):
+        super().__init__()
+        self.max_split_tokens = max_split_tokens
+        self.token_counter = get_token_counter()
+        self.tables: deque[str] = deque()
+        self.num_tables = 0
+        self.current_chunk: list[str] = []
+        # Token count of the rows of the current chunk without their outer
+        # `<` and `>`, or None if one of them is not well-formed
+        self.current_tokens: Optional[int] = 0
+        self._head_tokens: Optional[int] = None
+        self._tail_tokens = self.token_counter.count(">" + TABLE_SUFFIX)
+        self._join_tokens = self.token_counter.count("><")
+
+    def handle_row(self, row: str):
+        if self._head_tokens is None:
+            self._head_tokens = self.token_counter.count(
+                TABLE_PREFIX + self.title_row + "<tbody"
+            )
+
+        row_tokens = None
+        if self.current_tokens is not None and _is_well_formed_row(row):
+            row_tokens = self.token_counter.count(row[1:-1])
+            candidate_tokens = (
+                self._head_tokens
+                + (len(self.current_chunk) + 1) * self._join_tokens
+                + self.current_tokens
+                + row_tokens
+                + self._tail_tokens
+            )
+        else:
+            candidate_tokens = self.token_counter.count(
+                build_table(self.title_row, self.current_chunk + [row])
+            )
+
+        if candidate_tokens > self.max_split_tokens:
+            if self.current_chunk:
+                # Finalize the current chunk and start a new one with this row
+                self._emit(self.current_chunk)
+                self._start_chunk(row)
+            else:
+                # If a single row exceeds the limit,
+                # add it anyway (to handle edge cases)
+                self._emit([row])
+        else:
+            self.current_chunk.append(row)
+            if self.current_tokens is not None and row_tokens is not None:
+                self.current_tokens += row_tokens
+            else:
+                self.current_tokens = None
+
+    def _start_chunk(self, row: str):
+        self.current_chunk = [row]
+        self.current_tokens = (
+            self.token_counter.count(row[1:-1]) if _is_well_formed_row(row) else None
+        )
+
+    def _emit(self, rows: list[str]):
+        self.tables.append(build_table(self.title_row, rows))
+        self.num_tables += 1
+
+    def close(self):
+        super().close()
+        # Add any remaining rows as a chunk
+        if self.current_chunk:
+            self._emit(self.current_chunk)
+            self.current_chunk, self.current_tokens = [], 0
+        elif self.num_tables == 0:
+            # A table without rows is kept as long as its title row fits
+            table = build_table(self.title_row, [])
+            if self.token_counter.fits_within(table, self.max_split_tokens):
+                self._emit([])
+
+    def pop_tables(self) -> Iterator[str]:
+        while self.tables:
+            yield self.tables.popleft()
+
+
+def iter_split_table(
+    table_html: Union[str, Iterable[str]],
+    max_split_tokens: int,
+    feed_size: int = FEED_SIZE,
+) -> Iterator[str]:
+    """Split an HTML table into tables of at most `max_split_tokens` tokens,
+    repeating the title row in each of them. Tables are yielded as soon as
+    they are complete. `table_html` is either the whole table or an iterable
+    of consecutive pieces of it."""
+    pieces = table_html
+    if isinstance(table_html, str):
+        pieces = (
+            table_html[i : i + feed_size] for i in range(0, len(table_html), feed_size)
+        )
+
+    splitter = StreamingTableSplitter(max_split_tokens)
+    for piece in pieces:
+        splitter.feed(piece)
+        yield from splitter.pop_tables()
+    splitter.close()
+    yield from splitter.pop_tables()
+
+
+def split_table(table_html: str, max_split_tokens: int) -> list[str]:
+    """Split an HTML table into tables of at most `max_split_tokens` tokens,
+    repeating the title row in each of them. A table that fits is returned
+    whole."""
+    return list(iter_split_table(table_html, max_split_tokens))
+
+
+def split_table_by_retokenizing(
+    title_row: str, rows: list[str], max_split_tokens: int
+) -> list[str]:
+    """Reference splitter that re-tokenizes the candidate table for every
+    row. Quadratic in the number of rows, so it is only used for rows that
+    `split_table` cannot count one at a time."""
+    splitted_tables = []  # To store split tables
+    current_chunk = []
+
+    for row in rows:
+        # Temporarily add the current row to the chunk to check size
+        temp_table = build_table(title_row, current_chunk + [row])
+        if get_tiktoken_length(temp_table) > max_split_tokens:
+            if current_chunk:
+                # Finalize the current chunk if it's not empty
+                splitted_tables.append(build_table(title_row, current_chunk))
+                current_chunk = [row]  # Start a new chunk with the current row
+            else:
+                # If a single row exceeds the limit,
+                # add it anyway (to handle edge cases)
+                splitted_tables.append(temp_table)
+                current_chunk = []  # Reset for the next chunk
+        else:
+            current_chunk.append(row)  # Add the row to the current chunk
+
+    # Add any remaining rows as a chunk
+    if current_chunk:
+        splitted_tables.append(build_table(title_row, current_chunk))
+
+    return splitted_tables
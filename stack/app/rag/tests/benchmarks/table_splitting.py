@@ -0,0 +1,80 @@
+"""
+Benchmark for splitting large HTML tables into token-bounded tables.
+
+Compares the single-pass splitter with the reference splitter that
+re-tokenizes the candidate table for every row, and checks that both
+produce the same tables.
+
+Usage:
+    python -m stack.app.rag.tests.benchmarks.table_splitting --rows 2000
+"""
+import argparse
+import random
+import timeit
+
+from stack.app.rag.table_parser import (
+    TableParser,
+    split_table,
+    split_table_by_retokenizing,
+)
+
+CELLS = (
+    "the model retrieval 2023 4.1 GPT-4 Llama-2 (7B, 13B) 85.25 0.731 "
+    "precision recall TriviaQA n/a — naïve"
+).split()
+
+
+def build_table_html(num_rows: int, num_cols: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    header = "".join(f"<th>Column {i}</th>" for i in range(num_cols))
+    body = "".join(
+        "<tr>"
+        + "".join(
+            f"<td>{' '.join(rng.choices(CELLS, k=rng.randint(1, 4)))}</td>"
+            for _ in range(num_cols)
+        )
+        + "</tr>"
+        for _ in range(num_rows)
+    )
+    return f"<table><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def split_by_retokenizing(table_html: str, max_split_tokens: int) -> list[str]:
+    parser = TableParser()
+    parser.feed(table_html)
+    return split_table_by_retokenizing(
+        parser.title_row, parser.rows, max_split_tokens
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--cols", type=int, default=8)
+    parser.add_argument("--max-split-tokens", type=int, default=1500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    table_html = build_table_html(args.rows, args.cols)
+    assert split_table(table_html, args.max_split_tokens) == split_by_retokenizing(
+        table_html, args.max_split_tokens
+    )
+
+    candidates = {
+        "re-tokenize per row": lambda: split_by_retokenizing(
+            table_html, args.max_split_tokens
+        ),
+        "single pass": lambda: split_table(table_html, args.max_split_tokens),
+    }
+    baseline = None
+    for name, func in candidates.items():
+        seconds = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        baseline = baseline or seconds
+        print(
+            f"{name:<24} {seconds * 1000:9.1f} ms "
+            f"{args.rows / seconds:12.0f} rows/s {baseline / seconds:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Micro-benchmark for token counting over a corpus of chunk-sized texts.
+
+The baseline is `get_tiktoken_lengths` as it was before `TokenCounter`.
+tiktoken already caches encodings by name, so counting text by text costs
+about the same either way; the batch encoder and the estimate are what
+can be faster.
+
+Usage:
+    python -m stack.app.rag.tests.benchmarks.token_counting --chunks 5000
+"""
+import argparse
+import random
+import timeit
+
+import tiktoken
+
+from stack.app.rag.token_counter import get_token_counter
+
+WORDS = (
+    "the model retrieval document embedding vector query answer table section "
+    "results evaluation judge human agreement precision recall benchmark data "
+    "training validation sample question reference response system context "
+    "2023 4.1 GPT-4 Llama-2 (7B, 13B) Table 1: Figure 3. et al., Appendix G"
+).split()
+
+
+def build_corpus(num_chunks: int, seed: int = 0) -> list[str]:
+    """Chunks of 150-600 words, roughly the size produced by the splitters."""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choices(WORDS, k=rng.randint(150, 600)))
+        for _ in range(num_chunks)
+    ]
+
+
+def previous_get_tiktoken_length(text: str) -> int:
+    tokenizer = tiktoken.get_encoding("cl100k_base")
+    tokens = tokenizer.encode(text, disallowed_special=())
+    return len(tokens)
+
+
+def previous_get_tiktoken_lengths(texts: list[str]) -> list[int]:
+    return [previous_get_tiktoken_length(text) for text in texts]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.chunks)
+    token_counter = get_token_counter()
+    assert previous_get_tiktoken_lengths(corpus) == token_counter.count_batch(corpus)
+
+    candidates = {
+        "previous lengths": lambda: previous_get_tiktoken_lengths(corpus),
+        "count": lambda: [token_counter.count(text) for text in corpus],
+        "count_batch": lambda: token_counter.count_batch(corpus),
+        "estimate": lambda: [token_counter.estimate(text) for text in corpus],
+    }
+    baseline = None
+    for name, func in candidates.items():
+        seconds = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        baseline = baseline or seconds
+        print(
+            f"{name:<24} {seconds * 1000:9.1f} ms "
+            f"{args.chunks / seconds:12.0f} chunks/s {baseline / seconds:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+from semantic_router.encoders import BaseEncoder, OpenAIEncoder
+
+from stack.app.rag.encoders import async_encoder
+from stack.app.rag.encoders.async_encoder import (
+    DEFAULT_MAX_CONCURRENCY,
+    AsyncEncoder,
+    RateLimiter,
+    get_provider_limiter,
+)
+
+
+class InFlight:
+    def __init__(self):
+        self.current = 0
+        self.max = 0
+
+
+class SlowEncoder(BaseEncoder):
+    name: str = "slow"
+    in_flight: InFlight
+
+    async def acall(self, docs: list[str]) -> list[list[float]]:
+        self.in_flight.current += 1
+        self.in_flight.max = max(self.in_flight.max, self.in_flight.current)
+        await asyncio.sleep(0.01)
+        self.in_flight.current -= 1
+        return [[1.0] for _ in docs]
+
+
+class SyncEncoder(BaseEncoder):
+    name: str = "sync"
+    threads: list = []
+
+    def __call__(self, docs: list[str]) -> list[list[float]]:
+        self.threads.append(threading.current_thread())
+        return [[float(len(doc))] for doc in docs]
+
+
+class UnimplementedAsyncEncoder(SyncEncoder):
+    async def acall(self, docs: list[str]) -> list[list[float]]:
+        raise NotImplementedError
+
+
+def openai_encoder() -> OpenAIEncoder:
+    # Skips creating the OpenAI client, which is not needed for the limits
+    return OpenAIEncoder.construct(name="text-embedding-3-small")
+
+
+async def max_in_flight(calls: int, encoders: int = 1) -> int:
+    in_flight = InFlight()
+    slow_encoders = [SlowEncoder(in_flight=in_flight) for _ in range(encoders)]
+    await asyncio.gather(
+        *(
+            AsyncEncoder(slow_encoders[i % encoders], use_cache=False).acall(["text"])
+            for i in range(calls)
+        )
+    )
+    return in_flight.max
+
+
+def test_provider_concurrency_is_limited() -> None:
+    assert asyncio.run(max_in_flight(10)) == DEFAULT_MAX_CONCURRENCY
+
+
+def test_concurrency_limit_is_shared_across_encoder_instances() -> None:
+    assert asyncio.run(max_in_flight(10, encoders=3)) == DEFAULT_MAX_CONCURRENCY
+
+
+def test_provider_limits_default_to_the_encoder_config() -> None:
+    async def run():
+        return get_provider_limiter(openai_encoder())
+
+    limiter = asyncio.run(run())
+    assert limiter.semaphore._value == 10
+    assert limiter.rate_limiter.interval == 60 / 3000
+
+
+def test_encoder_rate_limits_override_the_provider_defaults() -> None:
+    overrides = {
+        "openai": {"requests_per_minute": 600},
+        "SlowEncoder": {"max_concurrency": 2},
+    }
+
+    async def run():
+        return (
+            get_provider_limiter(openai_encoder()),
+            get_provider_limiter(SlowEncoder(in_flight=InFlight())),
+        )
+
+    with patch.object(async_encoder.settings, "ENCODER_RATE_LIMITS", overrides):
+        openai_limiter, slow_limiter = asyncio.run(run())
+        assert asyncio.run(max_in_flight(6)) == 2
+
+    assert openai_limiter.semaphore._value == 10
+    assert openai_limiter.rate_limiter.interval == 0.1
+    assert slow_limiter.semaphore._value == 2
+    assert slow_limiter.rate_limiter is None
+
+
+def test_rate_limiter_spaces_out_requests() -> None:
+    waits = []
+
+    async def sleep(delay: float) -> None:
+        waits.append(delay)
+
+    async def run():
+        rate_limiter = RateLimiter(requests_per_minute=60)
+        for _ in range(3):
+            await rate_limiter.acquire()
+
+    with patch.object(async_encoder.time, "monotonic", return_value=100.0), (
+        patch.object(async_encoder.asyncio, "sleep", sleep)
+    ):
+        asyncio.run(run())
+
+    # The first request starts immediately, the next ones a second apart
+    assert waits == [1.0, 2.0]
+
+
+def test_encoders_without_acall_run_in_the_thread_pool() -> None:
+    for encoder in (SyncEncoder(), UnimplementedAsyncEncoder()):
+        async_wrapper = AsyncEncoder(encoder, use_cache=False)
+        vectors = asyncio.run(async_wrapper.acall(["a", "bb"]))
+
+        assert vectors == [[1.0], [2.0]]
+        assert encoder.threads[0] is not threading.main_thread()
+        assert not async_wrapper.native
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from stack.app.rag.checkpoints import (
+    CHUNKS_STAGE,
+    PAYLOAD_STAGE,
+    DiskCheckpointStore,
+    IngestionCheckpoints,
+    NullCheckpointStore,
+    dump_chunks,
+    dump_embeddings,
+    dump_payload,
+    load_chunks,
+    restore_embeddings,
+)
+from stack.app.schema.rag import BaseDocumentChunk, IngestRequestPayload, VectorDatabase
+
+
+def test_disk_checkpoints_round_trip_chunks(tmp_path) -> None:
+    checkpoints = IngestionCheckpoints(
+        DiskCheckpointStore(tmp_path, ttl=3600), task_id="task"
+    )
+    chunks = [
+        BaseDocumentChunk(
+            id="chunk",
+            page_content="text",
+            namespace="namespace",
+            metadata={"page_number": 1},
+            dense_embedding=[0.5, 0.25],
+        )
+    ]
+
+    async def run():
+        assert await checkpoints.load(CHUNKS_STAGE) is None
+        await checkpoints.save(CHUNKS_STAGE, {"all_chunks": dump_chunks(chunks)})
+        return await checkpoints.load(CHUNKS_STAGE)
+
+    checkpoint = asyncio.run(run())
+
+    assert load_chunks(checkpoint["all_chunks"]) == chunks
+
+
+def test_disk_checkpoints_expire_and_are_cleared(tmp_path) -> None:
+    store = DiskCheckpointStore(tmp_path, ttl=60)
+    current = IngestionCheckpoints(store, task_id="current")
+    expired = IngestionCheckpoints(store, task_id="expired")
+
+    async def run():
+        await expired.save(PAYLOAD_STAGE, {"files": []})
+        long_ago = time.time() - 120
+        for path in (tmp_path / "expired", tmp_path / "expired" / "payload.json"):
+            os.utime(path, (long_ago, long_ago))
+        assert await expired.load(PAYLOAD_STAGE) is None
+
+        await current.save(PAYLOAD_STAGE, {"files": []})
+        await current.clear()
+
+    asyncio.run(run())
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_null_checkpoints_store_nothing() -> None:
+    checkpoints = IngestionCheckpoints(NullCheckpointStore(), task_id="task")
+
+    async def run():
+        await checkpoints.save(PAYLOAD_STAGE, {"files": []})
+        return await checkpoints.load(PAYLOAD_STAGE)
+
+    assert asyncio.run(run()) is None
+
+
+def test_payload_checkpoint_leaves_out_credentials() -> None:
+    payload = IngestRequestPayload(
+        files=[],
+        namespace="namespace",
+        vector_database=VectorDatabase(
+            config={"host": "http://qdrant:6333", "api_key": "secret"}
+        ),
+        webhook_url="https://example.com/hook?token=secret",
+    )
+
+    stored = dump_payload(payload)
+
+    assert "secret" not in str(stored)
+    assert stored["namespace"] == "namespace"
+
+
+def test_disk_checkpoints_clear_skips_directories_removed_concurrently(
+    tmp_path,
+) -> None:
+    store = DiskCheckpointStore(tmp_path, ttl=60)
+    (tmp_path / "removed").mkdir()
+    iterdir = Path.iterdir
+
+    def iterdir_then_remove(path: Path):
+        entries = list(iterdir(path))
+        (tmp_path / "removed").rmdir()
+        return iter(entries)
+
+    async def run():
+        await store.set("current", PAYLOAD_STAGE, b"{}")
+        with patch.object(Path, "iterdir", iterdir_then_remove):
+            await store.delete("current")
+
+    asyncio.run(run())
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_embeddings_are_restored_on_chunks_without_vectors() -> None:
+    def chunk(id: str, dense_embedding=None) -> BaseDocumentChunk:
+        return BaseDocumentChunk(
+            id=id,
+            page_content=id,
+            namespace="namespace",
+            dense_embedding=dense_embedding,
+        )
+
+    embeddings = dump_embeddings([chunk("a", [1.0, 0.0]), chunk("b")])
+    assert embeddings == {"a": [1.0, 0.0]}
+
+    chunks = [chunk("a"), chunk("b"), chunk("c", [0.0, 1.0])]
+    assert restore_embeddings(chunks, embeddings) == 1
+    assert [c.dense_embedding for c in chunks] == [[1.0, 0.0], None, [0.0, 1.0]]
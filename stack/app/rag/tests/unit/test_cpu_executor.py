@@ -0,0 +1,65 @@
+import asyncio
+from unittest.mock import patch
+
+from stack.app.rag import cpu_executor
+from stack.app.rag.cpu_executor import (
+    get_process_pool,
+    map_batches,
+    shutdown_process_pool,
+)
+
+
+def double(batch: list[int], factor: int = 2) -> list[int]:
+    return [item * factor for item in batch]
+
+
+def test_map_batches_keeps_result_order() -> None:
+    offloaded = []
+
+    async def run_cpu_bound(func, batch, *args, offload):
+        offloaded.append(batch)
+        # Later batches finish first
+        await asyncio.sleep(0.01 * (10 - batch[0] // 3))
+        return func(batch, *args)
+
+    with patch.object(cpu_executor.settings, "CHUNK_PROCESS_POOL_ENABLED", True), (
+        patch.object(cpu_executor.settings, "CHUNK_PROCESS_POOL_MIN_ITEMS", 5)
+    ), patch.object(cpu_executor, "run_cpu_bound", run_cpu_bound):
+        results = asyncio.run(map_batches(double, list(range(10)), 3, batch_size=3))
+
+    assert results == [item * 3 for item in range(10)]
+    assert offloaded == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+
+
+def test_map_batches_runs_small_inputs_inline() -> None:
+    with patch.object(cpu_executor.settings, "CHUNK_PROCESS_POOL_ENABLED", True), (
+        patch.object(cpu_executor.settings, "CHUNK_PROCESS_POOL_MIN_ITEMS", 5)
+    ), patch.object(
+        cpu_executor, "get_process_pool", side_effect=AssertionError("offloaded")
+    ):
+        results = asyncio.run(map_batches(double, [1, 2, 3, 4], batch_size=1))
+
+    assert results == [2, 4, 6, 8]
+
+
+def test_map_batches_runs_inline_when_the_pool_is_disabled() -> None:
+    with patch.object(cpu_executor.settings, "CHUNK_PROCESS_POOL_ENABLED", False), (
+        patch.object(cpu_executor.settings, "CHUNK_PROCESS_POOL_MIN_ITEMS", 1)
+    ), patch.object(
+        cpu_executor, "get_process_pool", side_effect=AssertionError("offloaded")
+    ):
+        results = asyncio.run(map_batches(double, list(range(10)), batch_size=3))
+
+    assert results == [item * 2 for item in range(10)]
+
+
+def test_shutdown_process_pool_is_idempotent() -> None:
+    pool = get_process_pool()
+    assert get_process_pool() is pool
+
+    shutdown_process_pool()
+    shutdown_process_pool()
+
+    new_pool = get_process_pool()
+    assert new_pool is not pool
+    shutdown_process_pool()
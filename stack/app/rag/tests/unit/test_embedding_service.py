@@ -0,0 +1,316 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from stack.app.api.v1 import rag
+from stack.app.rag import embedding_service
+from stack.app.rag.embedding_service import EmbeddingService
+from stack.app.schema.rag import (
+    BaseDocumentChunk,
+    DocumentProcessorConfig,
+    IngestRequestPayload,
+    SplitterConfig,
+)
+
+
+def make_service(files=None) -> EmbeddingService:
+    return EmbeddingService(
+        index_name="documents",
+        encoder=None,
+        vector_credentials={"host": "http://qdrant-test:6333", "api_key": ""},
+        dimensions=3,
+        files=files,
+        namespace="namespace",
+    )
+
+
+def make_chunk(index: int) -> BaseDocumentChunk:
+    return BaseDocumentChunk(
+        id=str(uuid.UUID(int=index)),
+        page_content=f"chunk {index}",
+        namespace="namespace",
+        metadata={"file_id": "file"},
+    )
+
+
+def test_generate_chunks_records_failed_files() -> None:
+    good_file = SimpleNamespace(id=uuid.uuid4(), filename="good.txt")
+    bad_file = SimpleNamespace(id=uuid.uuid4(), filename="bad.txt")
+    service = make_service(files=[(bad_file, b"bad"), (good_file, b"good")])
+
+    async def process_file(file, file_content, config):
+        if file is bad_file:
+            raise ValueError("Unsupported file")
+        return [make_chunk(0)]
+
+    async def filter_chunks(chunks):
+        return chunks
+
+    service._process_file = process_file
+    service._filter_chunks = filter_chunks
+
+    chunks = asyncio.run(service.generate_chunks(DocumentProcessorConfig()))
+
+    assert chunks == [make_chunk(0)]
+    assert service.failed_file_ids == [str(bad_file.id)]
+
+
+class FakeRedisService:
+    def __init__(self):
+        self.messages: list[str] = []
+
+    async def push_progress_message(self, task_id: str, message: str) -> None:
+        self.messages.append(message)
+
+
+def test_failed_files_are_left_out_of_the_ingested_files() -> None:
+    good_file_id, bad_file_id = uuid.uuid4(), uuid.uuid4()
+    payload = IngestRequestPayload(files=[bad_file_id, good_file_id])
+    service = make_service()
+
+    async def generate_chunks(config):
+        service.failed_file_ids = [str(bad_file_id)]
+        return [make_chunk(0)]
+
+    service.generate_chunks = generate_chunks
+
+    all_chunks, chunks, _ = asyncio.run(
+        rag.generate_chunks("task", service, payload, FakeRedisService())
+    )
+
+    assert chunks == all_chunks == [make_chunk(0)]
+    assert payload.files == [good_file_id]
+
+
+def word_counts(texts: list[str]) -> list[int]:
+    return [len(text.split()) for text in texts]
+
+
+def test_structured_data_uses_the_configured_splitter() -> None:
+    file = SimpleNamespace(
+        id=uuid.uuid4(), filename="rows.csv", source=None, mime_type="text/csv"
+    )
+    records = [
+        {"page_content": "first row", "tag": "a"},
+        {"page_content": "second row"},
+    ]
+    service = make_service()
+    partitioned = []
+
+    async def partition_and_chunk(content, config, file=None):
+        partitioned.append(content)
+        return [{"page_content": content, "metadata": {"title": "row"}}]
+
+    service._partition_and_chunk = partition_and_chunk
+
+    def split_texts(texts, chunk_size, chunk_overlap):
+        return [[(text, len(text.split()))] for text in texts]
+
+    async def run(splitter_name: str):
+        config = DocumentProcessorConfig(splitter=SplitterConfig(name=splitter_name))
+        return await service._process_structured_data(file, records, config)
+
+    with patch.object(
+        embedding_service, "get_tiktoken_lengths", word_counts
+    ), patch.object(embedding_service, "split_texts", split_texts):
+        by_title_chunks = asyncio.run(run("by_title"))
+        assert partitioned == ["first row", "second row"]
+        local_chunks = asyncio.run(run("local"))
+        assert len(partitioned) == 2
+
+    assert [chunk.page_content for chunk in by_title_chunks] == [
+        "first row",
+        "second row",
+    ]
+    assert by_title_chunks[0].metadata["title"] == "row"
+    assert by_title_chunks[0].metadata["tag"] == "a"
+    assert [chunk.page_content for chunk in local_chunks] == [
+        "first row",
+        "second row",
+    ]
+    assert "title" not in local_chunks[0].metadata
+
+
+class FakeEncoder:
+    def __init__(self, fail_on_call=None):
+        self.calls: list[list[str]] = []
+        self.fail_on_call = fail_on_call
+
+    async def acall(self, docs: list[str]) -> list[list[float]]:
+        self.calls.append(docs)
+        await asyncio.sleep(0)
+        if len(self.calls) == self.fail_on_call:
+            raise RuntimeError("Encoder unavailable")
+        return [[float(len(doc)), 0.0, 1.0] for doc in docs]
+
+
+class FakeVectorService:
+    def __init__(self):
+        self.batches: list[list[BaseDocumentChunk]] = []
+        self.released = asyncio.Event()
+        self.cancelled = False
+
+    async def upsert(self, chunks: list[BaseDocumentChunk]) -> None:
+        try:
+            await self.released.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        self.batches.append(chunks)
+
+
+async def embed_and_upsert(service, chunks, encoder, vector_service, **kwargs):
+    with patch.object(
+        embedding_service, "get_vector_service", return_value=vector_service
+    ):
+        return await service.embed_and_upsert(
+            chunks, encoder, batch_size=1, **kwargs
+        )
+
+
+def test_embed_and_upsert_upserts_every_chunk_once() -> None:
+    chunks = [make_chunk(index) for index in range(10)]
+    chunks[0].dense_embedding = [0.0, 0.0, 0.0]
+    encoder = FakeEncoder()
+
+    async def run():
+        vector_service = FakeVectorService()
+        vector_service.released.set()
+        upserted = await embed_and_upsert(
+            make_service(), chunks, encoder, vector_service, num_workers=3
+        )
+        return upserted, vector_service
+
+    upserted, vector_service = asyncio.run(run())
+
+    upserted_ids = [chunk.id for batch in vector_service.batches for chunk in batch]
+    assert sorted(upserted_ids) == sorted(chunk.id for chunk in chunks)
+    assert sorted(chunk.id for chunk in upserted) == sorted(upserted_ids)
+    # Chunks embedded while splitting are not sent to the encoder again
+    assert sorted(docs[0] for docs in encoder.calls) == [
+        f"chunk {index}" for index in range(1, 10)
+    ]
+    assert chunks[0].dense_embedding == [0.0, 0.0, 0.0]
+    assert chunks[1].dense_embedding == [7.0, 0.0, 1.0]
+
+
+def test_embed_and_upsert_bounds_batches_waiting_for_upsert() -> None:
+    chunks = [make_chunk(index) for index in range(10)]
+    encoder = FakeEncoder()
+
+    async def run():
+        vector_service = FakeVectorService()
+        upsert = asyncio.create_task(
+            embed_and_upsert(
+                make_service(), chunks, encoder, vector_service, num_workers=1
+            )
+        )
+        for _ in range(50):
+            await asyncio.sleep(0)
+        # One batch is being upserted, two are queued and the worker is
+        # blocked putting the fourth
+        embedded_while_blocked = len(encoder.calls)
+        vector_service.released.set()
+        await upsert
+        return embedded_while_blocked, vector_service
+
+    with patch.object(embedding_service.settings, "EMBED_UPSERT_QUEUE_SIZE", 2):
+        embedded_while_blocked, vector_service = asyncio.run(run())
+
+    assert embedded_while_blocked == 4
+    assert len(vector_service.batches) == 10
+
+
+def test_embed_failure_cancels_upsert_and_propagates() -> None:
+    chunks = [make_chunk(index) for index in range(10)]
+    encoder = FakeEncoder(fail_on_call=2)
+
+    async def run():
+        vector_service = FakeVectorService()
+        with pytest.raises(RuntimeError, match="Encoder unavailable"):
+            await embed_and_upsert(
+                make_service(), chunks, encoder, vector_service, num_workers=1
+            )
+        await asyncio.sleep(0)
+        return vector_service
+
+    vector_service = asyncio.run(run())
+
+    assert vector_service.cancelled
+    assert vector_service.batches == []
+    assert len(encoder.calls) == 2
+
+
+def test_structured_data_records_are_partitioned_concurrently() -> None:
+    file = SimpleNamespace(
+        id=uuid.uuid4(), filename="rows.csv", source=None, mime_type="text/csv"
+    )
+    records = [{"page_content": f"row {index}"} for index in range(5)]
+    service = make_service()
+    in_flight, max_in_flight = 0, 0
+
+    async def partition_and_chunk(content, config, file=None):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [{"page_content": f"{content} a"}, {"page_content": f"{content} b"}]
+
+    service._partition_and_chunk = partition_and_chunk
+    config = DocumentProcessorConfig(splitter=SplitterConfig(name="by_title"))
+
+    with patch.object(
+        embedding_service, "get_tiktoken_lengths", word_counts
+    ), patch.object(embedding_service.settings, "UNSTRUCTURED_MAX_CONNECTIONS", 2):
+        chunks = asyncio.run(service._process_structured_data(file, records, config))
+
+    assert max_in_flight == 2
+    assert [chunk.page_content for chunk in chunks[:3]] == [
+        "row 0 a",
+        "row 0 b",
+        "row 1 a",
+    ]
+    assert len(chunks) == 10
+    assert chunks[0].metadata["token_count"] == 3
+
+
+def make_page_chunks(contents: list[str]) -> list[BaseDocumentChunk]:
+    return [
+        BaseDocumentChunk(
+            id=str(uuid.UUID(int=position)),
+            page_content=content,
+            namespace="namespace",
+            metadata={"file_id": "file", "page_number": 1},
+        )
+        for position, content in enumerate(contents)
+    ]
+
+
+def test_summary_of_a_page_edited_after_its_first_chunk_is_replaced() -> None:
+    service = make_service()
+    old_page = service._group_pages(make_page_chunks(["intro ", "old ending"]))[0]
+
+    async def get_indexed_fingerprints(file_ids, index_name=None):
+        return {old_page.id: old_page.metadata["fingerprint"]}
+
+    async def summarize_pages(pages):
+        return pages
+
+    service.get_indexed_fingerprints = get_indexed_fingerprints
+    service._summarize_pages = summarize_pages
+
+    new_pages, stale_point_ids = asyncio.run(
+        service.generate_incremental_summary_documents(
+            make_page_chunks(["intro ", "new ending"]), index_name="documents_summary"
+        )
+    )
+
+    assert [page.page_content for page in new_pages] == ["intro new ending"]
+    # The new summary is upserted before stale points are deleted, so it must
+    # not take the id of the summary it replaces
+    assert stale_point_ids == [old_page.id]
+    assert new_pages[0].id not in stale_point_ids
@@ -0,0 +1,56 @@
+import pytest
+
+from stack.app.rag.local_partition import (
+    can_partition_locally,
+    partition_locally,
+    split_elements,
+    split_texts,
+)
+
+TEXT = "# Results\n\nThe model scored 85.25 on TriviaQA.\n\n\n  Table 1 lists the baselines.  \n"
+
+
+def test_partition_locally_splits_paragraphs() -> None:
+    elements = partition_locally(TEXT.encode("utf-8"), "text/markdown", "notes.md")
+
+    assert [element["text"] for element in elements] == [
+        "# Results",
+        "The model scored 85.25 on TriviaQA.",
+        "Table 1 lists the baselines.",
+    ]
+    assert all(element["type"] == "NarrativeText" for element in elements)
+    assert elements[0]["metadata"] == {
+        "filetype": "text/markdown",
+        "filename": "notes.md",
+    }
+
+
+def test_partition_locally_rejects_unsupported_types() -> None:
+    assert not can_partition_locally("application/vnd.ms-powerpoint")
+    with pytest.raises(ValueError):
+        partition_locally(b"", "application/vnd.ms-powerpoint")
+
+
+def test_split_elements_bounds_chunks_per_page() -> None:
+    elements = [
+        {"text": "word " * 40, "metadata": {"page_number": 1}},
+        {"text": "other " * 10, "metadata": {"page_number": 2}},
+        {"text": None, "metadata": {"page_number": 2}},
+    ]
+
+    chunks = split_elements(elements, 60, 0, length_function=len)
+
+    assert all(len(chunk["page_content"]) <= 60 for chunk in chunks)
+    assert [chunk["metadata"]["page_number"] for chunk in chunks][-1] == 2
+    assert {chunk["metadata"]["page_number"] for chunk in chunks} == {1, 2}
+
+
+def test_split_texts_keeps_short_texts_whole() -> None:
+    long_text = "\n\n".join(f"Paragraph {i} " + "word " * 30 for i in range(20))
+
+    splits = split_texts(["Short text.", "   ", long_text], 100, 0)
+
+    assert [text for text, _ in splits[0]] == ["Short text."]
+    assert splits[1] == []
+    assert len(splits[2]) > 1
+    assert all(0 < token_count <= 100 for _, token_count in splits[2])
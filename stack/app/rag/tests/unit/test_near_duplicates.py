@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+
+from stack.app.rag.near_duplicates import (
+    find_near_duplicates,
+    lsh_bands,
+    minhash_signatures,
+    shingles,
+)
+
+DISCLAIMER = (
+    "This report is provided for information purposes only and does not "
+    "constitute an offer or solicitation. Past performance is not indicative "
+    "of future results. Copyright 2024 Example Research Ltd."
+)
+
+
+def random_passages(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(5000)]
+    return [" ".join(rng.choices(vocabulary, k=150)) for _ in range(count)]
+
+
+def test_shingles() -> None:
+    assert shingles("The model, the data.", 2) == {"the model", "model the", "the data"}
+    assert shingles("Short text", 5) == {"short text"}
+    assert shingles("...", 5) == set()
+
+
+def test_signatures_estimate_jaccard_similarity() -> None:
+    first, second = random_passages(2)
+    signatures = minhash_signatures([first, first, second], 256, 3)
+
+    assert np.array_equal(signatures[0], signatures[1])
+    assert np.mean(signatures[0] == signatures[2]) < 0.1
+
+
+def test_lsh_bands_use_every_permutation() -> None:
+    bands, rows = lsh_bands(128, 0.8)
+    assert bands * rows == 128
+
+
+def test_find_near_duplicates_keeps_first_occurrence() -> None:
+    passages = random_passages(50)
+    texts = [f"Page {page}. {DISCLAIMER}" for page in range(1, 4)] + passages
+    edited = passages[0].split()
+    edited[10] = "changed"
+    texts.append(" ".join(edited))
+
+    signatures = minhash_signatures(texts, 128, 5)
+    duplicates = find_near_duplicates(signatures, 0.8)
+
+    assert duplicates == [False, True, True] + [False] * 50 + [True]
+
+
+def test_find_near_duplicates_against_indexed_signatures() -> None:
+    passages = random_passages(3, seed=1)
+    indexed = minhash_signatures(passages[:1], 128, 5)
+    signatures = minhash_signatures(passages, 128, 5)
+
+    assert find_near_duplicates(signatures, 0.8, indexed) == [True, False, False]
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from stack.app.rag.partition import (
+    apartition,
+    get_partition_executor,
+    get_unstructured_client,
+    shutdown_partition_executor,
+)
+
+
+def test_apartition_runs_on_the_partition_executor() -> None:
+    threads = []
+
+    def partition(req):
+        threads.append(threading.current_thread().name)
+        return f"partitioned {req}"
+
+    client = SimpleNamespace(general=SimpleNamespace(partition=partition))
+    try:
+        result = asyncio.run(apartition("request", client=client))
+    finally:
+        shutdown_partition_executor()
+
+    assert result == "partitioned request"
+    assert threads[0].startswith("unstructured-partition")
+
+
+def test_shutdown_partition_executor_is_idempotent() -> None:
+    executor = get_partition_executor()
+    client = get_unstructured_client()
+    assert get_partition_executor() is executor
+    assert get_unstructured_client() is client
+
+    shutdown_partition_executor()
+    shutdown_partition_executor()
+
+    assert get_partition_executor() is not executor
+    assert get_unstructured_client() is not client
+    shutdown_partition_executor()
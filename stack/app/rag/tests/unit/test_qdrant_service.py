@@ -0,0 +1,303 @@
+import asyncio
+import uuid
+from unittest.mock import patch
+
+import pytest
+
+from qdrant_client import AsyncQdrantClient
+
+from stack.app import vectordbs
+from stack.app.schema.rag import BaseDocumentChunk, VectorDatabase
+from stack.app.vectordbs import _evict_vector_services, get_vector_service, qdrant
+from stack.app.vectordbs.qdrant import QdrantService, get_client_key
+
+CREDENTIALS = {"host": "http://qdrant-test:6333", "api_key": ""}
+
+
+def test_services_share_client_and_check_collection_once() -> None:
+    client = AsyncQdrantClient(location=":memory:")
+
+    async def run():
+        services = [
+            QdrantService(credentials=CREDENTIALS, index_name="docs", dimension=3)
+            for _ in range(3)
+        ]
+        assert all(service.client is client for service in services)
+        with patch.object(
+            client, "collection_exists", wraps=client.collection_exists
+        ) as collection_exists:
+            fingerprints = await asyncio.gather(
+                *[service.get_fingerprints("file", "namespace") for service in services]
+            )
+        assert fingerprints == [{}, {}, {}]
+        assert collection_exists.call_count == 1
+        assert await client.collection_exists("docs")
+
+    with patch.dict(qdrant._clients, {get_client_key(CREDENTIALS): client}):
+        asyncio.run(run())
+
+
+class FakeEncoder:
+    type = "fake"
+    name = "fake-model"
+    dimensions = 3
+
+
+def test_get_vector_service_reuses_services_and_closes_evicted_clients() -> None:
+    other_credentials = {**CREDENTIALS, "host": "http://qdrant-other:6333"}
+    clients = {
+        get_client_key(CREDENTIALS): AsyncQdrantClient(location=":memory:"),
+        get_client_key(other_credentials): AsyncQdrantClient(location=":memory:"),
+    }
+
+    async def run():
+        def service(index_name: str, credentials: dict) -> QdrantService:
+            return get_vector_service(
+                index_name=index_name,
+                credentials=VectorDatabase(config=credentials),
+                encoder=FakeEncoder(),
+                dimensions=3,
+            )
+
+        first = service("first", CREDENTIALS)
+        assert service("first", CREDENTIALS) is first
+        second = service("second", CREDENTIALS)
+        third = service("third", other_credentials)
+
+        # `first` shares its client with `second`, which stays cached
+        _evict_vector_services(2)
+        await asyncio.sleep(0)
+        assert list(vectordbs._vector_services.values()) == [second, third]
+        assert get_client_key(CREDENTIALS) in qdrant._clients
+
+        _evict_vector_services(1)
+        await asyncio.gather(*vectordbs._closing_tasks)
+        assert list(vectordbs._vector_services.values()) == [third]
+        assert get_client_key(CREDENTIALS) not in qdrant._clients
+
+    with patch.dict(qdrant._clients, clients), patch.dict(
+        vectordbs._vector_services, clear=True
+    ):
+        asyncio.run(run())
+
+
+def test_evicted_client_is_closed_after_requests_in_flight() -> None:
+    client = AsyncQdrantClient(location=":memory:")
+    closed = []
+
+    async def run():
+        started, released = asyncio.Event(), asyncio.Event()
+
+        async def delete(**kwargs):
+            started.set()
+            await released.wait()
+
+        async def close():
+            closed.append(client)
+
+        service = get_vector_service(
+            index_name="documents",
+            credentials=VectorDatabase(config=CREDENTIALS),
+            encoder=FakeEncoder(),
+            dimensions=3,
+        )
+        with patch.object(client, "delete", delete), patch.object(
+            client, "close", close
+        ):
+            request = asyncio.create_task(service.delete_points(["point"]))
+            await started.wait()
+
+            _evict_vector_services(0)
+            for _ in range(10):
+                await asyncio.sleep(0)
+            assert closed == []
+            assert get_client_key(CREDENTIALS) in qdrant._clients
+
+            released.set()
+            await request
+            await asyncio.gather(*vectordbs._closing_tasks)
+            assert closed == [client]
+            assert get_client_key(CREDENTIALS) not in qdrant._clients
+
+    with patch.dict(qdrant._clients, {get_client_key(CREDENTIALS): client}), (
+        patch.dict(vectordbs._vector_services, clear=True)
+    ):
+        asyncio.run(run())
+
+
+def test_abandoned_iter_contents_does_not_keep_the_client_open() -> None:
+    client = AsyncQdrantClient(location=":memory:")
+    closed = []
+
+    async def run():
+        async def close():
+            closed.append(client)
+
+        service = get_vector_service(
+            index_name="documents",
+            credentials=VectorDatabase(config=CREDENTIALS),
+            encoder=FakeEncoder(),
+            dimensions=3,
+        )
+        await service.upsert(
+            [
+                BaseDocumentChunk(
+                    id=str(uuid.uuid4()),
+                    page_content=f"chunk {i}",
+                    namespace="namespace",
+                    dense_embedding=[1.0, float(i), 0.0],
+                )
+                for i in range(3)
+            ]
+        )
+        with patch.object(client, "close", close):
+            contents = service.iter_contents("namespace", batch_size=1)
+            assert len(await anext(contents)) == 1
+
+            # The consumer stops without closing the generator
+            _evict_vector_services(0)
+            await asyncio.wait_for(asyncio.gather(*vectordbs._closing_tasks), timeout=1)
+            assert closed == [client]
+
+    with patch.dict(qdrant._clients, {get_client_key(CREDENTIALS): client}), (
+        patch.dict(vectordbs._vector_services, clear=True)
+    ):
+        asyncio.run(run())
+
+
+def test_query_batch_matches_single_queries() -> None:
+    client = AsyncQdrantClient(location=":memory:")
+    embeddings = {"north": [1.0, 0.0, 0.0], "east": [0.0, 1.0, 0.0]}
+
+    async def generate_vectors_batch(inputs: list[str]) -> list[list[float]]:
+        return [embeddings[text] for text in inputs]
+
+    async def run():
+        service = QdrantService(
+            credentials=CREDENTIALS, index_name="batch", dimension=3, namespace="ns"
+        )
+        service._generate_vectors_batch = generate_vectors_batch
+        service._generate_vectors = lambda input: generate_vectors_batch([input])
+        await service.upsert(
+            [
+                BaseDocumentChunk(
+                    id=str(uuid.UUID(int=index)),
+                    page_content=f"chunk {index}",
+                    namespace=namespace,
+                    dense_embedding=vector,
+                )
+                for index, (namespace, vector) in enumerate(
+                    [
+                        ("ns", [1.0, 0.1, 0.0]),
+                        ("ns", [0.1, 1.0, 0.0]),
+                        ("other", [1.0, 0.0, 0.0]),
+                    ]
+                )
+            ]
+        )
+        batch = await service.query_batch(["east", "north"], top_k=1)
+        single = [await service.query(text, top_k=1) for text in ["east", "north"]]
+        return batch, single
+
+    with patch.dict(qdrant._clients, {get_client_key(CREDENTIALS): client}):
+        batch, single = asyncio.run(run())
+
+    assert [[chunk.page_content for chunk in chunks] for chunks in batch] == [
+        ["chunk 1"],
+        ["chunk 0"],
+    ]
+    assert batch == single
+
+
+def test_hybrid_query_ranks_exact_term_matches_first() -> None:
+    client = AsyncQdrantClient(location=":memory:")
+
+    async def generate_vectors(input: str) -> list[list[float]]:
+        return [[1.0, 0.0, 0.0]]
+
+    async def run():
+        results = {}
+        for hybrid in (False, True):
+            service = QdrantService(
+                credentials=CREDENTIALS,
+                index_name=f"hybrid-{hybrid}",
+                dimension=3,
+                namespace="ns",
+                hybrid=hybrid,
+            )
+            service._generate_vectors = generate_vectors
+            await service.upsert(
+                [
+                    BaseDocumentChunk(
+                        id=str(uuid.UUID(int=1)),
+                        page_content="The pump stopped after a power failure",
+                        namespace="ns",
+                        dense_embedding=[1.0, 0.1, 0.0],
+                    ),
+                    BaseDocumentChunk(
+                        id=str(uuid.UUID(int=2)),
+                        page_content="Error ERR4711 means the pump lost pressure",
+                        namespace="ns",
+                        dense_embedding=[0.5, 1.0, 0.0],
+                    ),
+                ]
+            )
+            chunks = await service.query("what does ERR4711 mean", top_k=1)
+            results[hybrid] = chunks[0].id
+        return results
+
+    with patch.dict(qdrant._clients, {get_client_key(CREDENTIALS): client}):
+        results = asyncio.run(run())
+
+    assert results == {False: str(uuid.UUID(int=1)), True: str(uuid.UUID(int=2))}
+
+
+def test_payload_indexes_created_with_collection_and_by_migration() -> None:
+    client = AsyncQdrantClient(location=":memory:")
+
+    async def run():
+        with patch.object(
+            client, "create_payload_index", wraps=client.create_payload_index
+        ) as create_payload_index:
+            service = QdrantService(
+                credentials=CREDENTIALS, index_name="indexed", dimension=3
+            )
+            await service.get_fingerprints("file", "namespace")
+            created = [
+                call.kwargs["field_name"]
+                for call in create_payload_index.call_args_list
+            ]
+            assert created == list(qdrant.PAYLOAD_INDEX_FIELDS)
+
+            create_payload_index.reset_mock()
+            missing = QdrantService(
+                credentials=CREDENTIALS, index_name="missing", dimension=3
+            )
+            assert await missing.ensure_payload_indexes() == []
+            assert not await client.collection_exists("missing")
+
+            await client.create_collection(
+                "legacy",
+                vectors_config=qdrant.rest.VectorParams(
+                    size=3, distance=qdrant.rest.Distance.COSINE
+                ),
+            )
+            legacy = QdrantService(
+                credentials=CREDENTIALS, index_name="legacy", dimension=3
+            )
+            assert await legacy.ensure_payload_indexes() == list(
+                qdrant.PAYLOAD_INDEX_FIELDS
+            )
+            assert create_payload_index.call_count == len(qdrant.PAYLOAD_INDEX_FIELDS)
+
+    with patch.dict(qdrant._clients, {get_client_key(CREDENTIALS): client}):
+        asyncio.run(run())
+
+
+def test_hybrid_search_fails_fast_on_clients_without_query_api() -> None:
+    with patch.object(qdrant, "supports_hybrid_search", return_value=False):
+        with pytest.raises(ValueError, match="1.10"):
+            QdrantService(credentials=CREDENTIALS, index_name="docs", hybrid=True)
+        assert not QdrantService(
+            credentials=CREDENTIALS, index_name="docs", hybrid=False
+        ).hybrid
@@ -0,0 +1,70 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from stack.app.rag import query
+from stack.app.rag.query import query_documents_batch
+from stack.app.schema.rag import BaseDocumentChunk, EncoderConfig, QueryRequestPayload
+
+
+class FakeAsyncEncoder:
+    def __init__(self, encoder):
+        pass
+
+    async def acall(self, docs: list[str]) -> list[list[float]]:
+        return [[1.0 if doc.startswith("Summarize") else 0.0] for doc in docs]
+
+
+def route_layer(encoder):
+    def route(vector: list[float]) -> SimpleNamespace:
+        return SimpleNamespace(name="summarize" if vector[0] else None)
+
+    return route
+
+
+class FakeVectorService:
+    def __init__(self, index_name: str):
+        self.index_name = index_name
+
+    async def query_batch(self, inputs, top_k, vectors):
+        return [
+            [
+                BaseDocumentChunk(
+                    id=str(uuid.uuid4()),
+                    page_content=f"{self.index_name}: {text}",
+                    namespace="namespace",
+                )
+            ]
+            for text in inputs
+        ]
+
+    async def rerank(self, query: str, documents: list[BaseDocumentChunk]):
+        return [
+            document.model_copy(update={"metadata": {"reranked_by": self.index_name}})
+            for document in documents
+        ]
+
+
+def test_batch_queries_are_reranked_by_the_service_that_searched_them() -> None:
+    payload = QueryRequestPayload(input="", index_name="documents", enable_rerank=True)
+    inputs = ["What is a pump?", "Summarize the manual", "What is a valve?"]
+
+    def get_vector_service(index_name, **kwargs):
+        return FakeVectorService(index_name)
+
+    with patch.object(EncoderConfig, "get_encoder", return_value=None), patch.object(
+        query, "AsyncEncoder", FakeAsyncEncoder
+    ), patch.object(query, "create_route_layer", route_layer), patch.object(
+        query, "get_vector_service", get_vector_service
+    ):
+        results = asyncio.run(query_documents_batch(payload, inputs))
+
+    reranked = [
+        (chunk.page_content, chunk.metadata["reranked_by"]) for [chunk] in results
+    ]
+    assert reranked == [
+        ("documents: What is a pump?", "documents"),
+        ("documents_summary: Summarize the manual", "documents_summary"),
+        ("documents: What is a valve?", "documents"),
+    ]
@@ -0,0 +1,33 @@
+from stack.app.rag.sparse_encoder import (
+    sparse_document_vector,
+    sparse_query_vector,
+    token_index,
+)
+
+
+def weight(text: str, token: str) -> float:
+    indices, values = sparse_document_vector(text)
+    return dict(zip(indices, values)).get(token_index(token), 0.0)
+
+
+def test_document_weights_saturate_with_term_frequency() -> None:
+    once = weight("error code E-42 in module", "e")
+    twice = weight("error code E-42 and E-42 in module", "e")
+
+    assert 0 < once < twice < 2 * once
+
+
+def test_document_weights_decrease_with_length() -> None:
+    short = weight("pump P-100 failure", "p")
+    long = weight("pump P-100 failure " + "filler " * 500, "p")
+
+    assert short > long > 0
+
+
+def test_query_vector_weights_distinct_tokens_once() -> None:
+    indices, values = sparse_query_vector("Reset the reset button")
+
+    assert sorted(indices) == sorted(
+        token_index(token) for token in ("reset", "the", "button")
+    )
+    assert values == [1.0, 1.0, 1.0]
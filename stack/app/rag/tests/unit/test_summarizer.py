@@ -0,0 +1,76 @@
+import asyncio
+from unittest.mock import patch
+
+from langchain_core.runnables import RunnableLambda
+
+from stack.app.rag import summarizer as summarizer_module
+from stack.app.rag.summarizer import Summarizer
+
+
+def fake_summarizer(fail_on: str = "") -> Summarizer:
+    """Summarizer whose map step keeps the first word of each text and whose
+    reduce step joins the partial summaries with `+`."""
+
+    def summarize(inputs: dict) -> str:
+        if fail_on and fail_on in inputs["text"]:
+            raise ValueError("LLM error")
+        return inputs["text"].split()[0]
+
+    summarizer = Summarizer.__new__(Summarizer)
+    summarizer.chain = RunnableLambda(summarize)
+    summarizer.reduce_chain = RunnableLambda(
+        lambda inputs: "+".join(inputs["text"].split())
+    )
+    return summarizer
+
+
+def test_summarize_texts_keeps_order_and_reports_failures() -> None:
+    texts = ["alpha one", "beta two", "gamma three"]
+
+    summaries = asyncio.run(
+        fake_summarizer(fail_on="beta").summarize_texts(texts)
+    )
+
+    assert summaries == ["alpha", None, "gamma"]
+
+
+def test_summarize_texts_reduces_long_texts() -> None:
+    long_text = "\n\n".join(f"part{i} " + "word " * 30 for i in range(3))
+
+    summaries = asyncio.run(
+        fake_summarizer().summarize_texts(
+            ["short text", long_text], max_input_tokens=40
+        )
+    )
+
+    assert summaries == ["short", "part0+part1+part2"]
+
+
+def test_concurrent_summarizations_share_the_call_limit() -> None:
+    in_flight = 0
+    max_in_flight = 0
+
+    async def summarize(inputs: dict) -> str:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return inputs["text"]
+
+    summarizer = Summarizer.__new__(Summarizer)
+    summarizer.chain = summarizer.reduce_chain = RunnableLambda(summarize)
+
+    async def run():
+        return await asyncio.gather(
+            *[
+                summarizer.summarize_texts([f"text {i}{j}" for j in range(4)])
+                for i in range(3)
+            ]
+        )
+
+    with patch.object(summarizer_module.settings, "SUMMARIZATION_MAX_CONCURRENCY", 2):
+        results = asyncio.run(run())
+
+    assert max_in_flight == 2
+    assert results[1] == [f"text 1{j}" for j in range(4)]
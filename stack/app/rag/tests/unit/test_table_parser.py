@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from stack.app.rag.table_parser import (
+    TABLE_SUFFIX,
+    TableParser,
+    build_table,
+    iter_split_table,
+    split_table,
+    split_table_by_retokenizing,
+)
+
+CELLS = ["1", "GPT-4", "85.25", "naïve café", "Table 1: results", " ", "a<b", "x\ny"]
+
+
+def make_table(num_rows: int, num_cols: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    header = "".join(f"<th>col {i}</th>" for i in range(num_cols))
+    body = "".join(
+        "<tr>"
+        + "".join(f"<td>{rng.choice(CELLS)}</td>" for _ in range(num_cols))
+        + "</tr>"
+        for _ in range(num_rows)
+    )
+    return f"<table><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def parse(table_html: str) -> TableParser:
+    parser = TableParser()
+    parser.feed(table_html)
+    return parser
+
+
+@pytest.mark.parametrize(
+    "num_rows,num_cols,max_split_tokens",
+    [(5, 2, 10000), (200, 3, 100), (200, 1, 30), (50, 12, 40), (300, 4, 250)],
+)
+def test_split_table_matches_reference(
+    num_rows: int, num_cols: int, max_split_tokens: int
+) -> None:
+    table_html = make_table(num_rows, num_cols, seed=num_rows * num_cols)
+    parser = parse(table_html)
+    expected = split_table_by_retokenizing(
+        parser.title_row, parser.rows, max_split_tokens
+    )
+    assert split_table(table_html, max_split_tokens) == expected
+
+
+def test_split_table_keeps_every_row_once() -> None:
+    table_html = make_table(500, 3)
+    parser = parse(table_html)
+    head = build_table(parser.title_row, [])[: -len(TABLE_SUFFIX)]
+
+    tables = split_table(table_html, 120)
+
+    assert len(tables) > 1
+    assert all(table.startswith(head) for table in tables)
+    assert "".join(
+        table[len(head) : -len(TABLE_SUFFIX)] for table in tables
+    ) == "".join(parser.rows)
+
+
+def test_iter_split_table_accepts_pieces_of_any_size() -> None:
+    table_html = make_table(300, 4, seed=1)
+    rng = random.Random(1)
+    pieces, start = [], 0
+    while start < len(table_html):
+        end = start + rng.randint(1, 50)
+        pieces.append(table_html[start:end])
+        start = end
+
+    assert list(iter_split_table(pieces, 100)) == split_table(table_html, 100)
+
+
+def test_split_table_with_rows_without_cells() -> None:
+    table_html = make_table(100, 3, seed=2).replace(
+        "<tbody><tr>", "<tbody><tr></tr><tr>"
+    )
+    parser = parse(table_html)
+    assert "</tr>" in parser.rows
+
+    assert split_table(table_html, 60) == split_table_by_retokenizing(
+        parser.title_row, parser.rows, 60
+    )
+
+
+def test_split_table_without_rows() -> None:
+    table_html = "<table><thead><tr><th>a</th></tr></thead><tbody></tbody></table>"
+    assert split_table(table_html, 100) == [build_table("<th>a</th></tr>", [])]
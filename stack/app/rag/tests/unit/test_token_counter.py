@@ -0,0 +1,27 @@
+import pytest
+
+from stack.app.rag.token_counter import get_token_counter
+
+
+def test_count_batch_matches_count() -> None:
+    token_counter = get_token_counter()
+    texts = ["", "Hello world", "Table 1: GPT-4 scored 85.25 on TriviaQA. " * 20]
+    assert token_counter.count_batch(texts) == [
+        token_counter.count(text) for text in texts
+    ]
+
+
+@pytest.mark.parametrize(
+    "text,max_tokens",
+    [
+        ("short", 10),
+        ("a much longer sentence with several words in it", 5),
+        ("naïve café déjà vu", 18),
+        ("<tr><td>1</td><td>2</td></tr>" * 50, 100),
+    ],
+)
+def test_fits_within_is_exact(text: str, max_tokens: int) -> None:
+    token_counter = get_token_counter()
+    assert token_counter.fits_within(text, max_tokens) == (
+        token_counter.count(text) <= max_tokens
+    )
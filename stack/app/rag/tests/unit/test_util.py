@@ -2,7 +2,13 @@ from typing import Tuple
 
 import pytest
 
-from stack.app.rag.util import check_content_is_useful, deduplicate_chunk
+from stack.app.rag.util import (
+    check_content_is_useful,
+    chunk_id,
+    content_fingerprint,
+    deduplicate_chunk,
+    filter_chunk_contents,
+)
 
 
 @pytest.mark.parametrize(
@@ -82,3 +88,48 @@ def test_deduplicate_chunk(chunk: str, expected: str) -> None:
         )
         == expected
     )
+
+
+def test_content_fingerprint_ignores_whitespace() -> None:
+    assert content_fingerprint("Some  chunk\ncontent ") == content_fingerprint(
+        "Some chunk content"
+    )
+    assert content_fingerprint("Some chunk content") != content_fingerprint(
+        "Other chunk content"
+    )
+
+
+def test_chunk_id_is_deterministic() -> None:
+    fingerprint = content_fingerprint("Some chunk content")
+    assert chunk_id("ns", "file", 0, fingerprint) == chunk_id(
+        "ns", "file", 0, fingerprint
+    )
+    assert chunk_id("ns", "file", 0, fingerprint) != chunk_id(
+        "ns", "file", 1, fingerprint
+    )
+    assert chunk_id("ns", "file", 0, fingerprint) != chunk_id(
+        "other", "file", 0, fingerprint
+    )
+
+
+def test_check_content_is_useful_does_not_print(capsys) -> None:
+    check_content_is_useful("This is a highly informative sentence about a fact.")
+    assert capsys.readouterr().out == ""
+
+
+def test_filter_chunk_contents_matches_single_checks() -> None:
+    contents = [
+        "",
+        "asdf asdf asdf",
+        "Repeated sentence here. Repeated sentence here. A new one follows it now.",
+        "GPT-4 GPT-4 GPT-4 GPT-4 GPT-4 63.25 75.00 85.0 56.7 57.50 72.0 72.5 52.75",
+    ]
+    results = filter_chunk_contents(contents, min_word_count=3)
+
+    assert [deduplicated for deduplicated, _, _ in results] == [
+        deduplicate_chunk(content) for content in contents
+    ]
+    assert [(valid, reason) for _, valid, reason in results] == [
+        check_content_is_useful(deduplicate_chunk(content), min_word_count=3)
+        for content in contents
+    ]
@@ -0,0 +1,133 @@
+import asyncio
+from unittest.mock import patch
+
+import numpy as np
+from semantic_router.encoders import BaseEncoder
+from semantic_router.splitters import rolling_window
+
+from stack.app.rag import splitter, vectorized_splitter
+from stack.app.rag.splitter import UnstructuredSemanticSplitter
+from stack.app.rag.vectorized_splitter import (
+    VectorizedSemanticSplitter,
+    find_split_indices,
+    group_documents,
+    rolling_similarities,
+)
+
+
+def windowed_similarities(embeddings: np.ndarray, window_size: int) -> list[float]:
+    """Similarities of a single segment computed one row at a time, the way
+    RollingWindowSplitter computes them."""
+    similarities = []
+    for idx in range(1, len(embeddings)):
+        context = np.mean(embeddings[max(0, idx - window_size) : idx], axis=0)
+        similarities.append(
+            np.dot(context, embeddings[idx])
+            / (np.linalg.norm(context) * np.linalg.norm(embeddings[idx]) + 1e-10)
+        )
+    return similarities
+
+
+def test_rolling_similarities_restart_at_each_segment() -> None:
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(23, 16))
+    offsets = [0, 1, 9, 10, 23]
+
+    for window_size in (1, 3, 5):
+        similarities = rolling_similarities(embeddings, offsets, window_size)
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            assert np.isnan(similarities[start])
+            np.testing.assert_allclose(
+                similarities[start + 1 : end],
+                windowed_similarities(embeddings[start:end], window_size),
+            )
+
+
+def test_find_split_indices() -> None:
+    similarities = np.array([0.9, 0.2, 0.8, 0.1])
+    assert find_split_indices(similarities, 0.5).tolist() == [2, 4]
+
+
+def test_group_documents_respects_token_bounds() -> None:
+    token_counts = np.array([10, 10, 10, 50, 10, 10])
+    split_indices = np.array([1, 3])
+
+    splits = group_documents(
+        token_counts, split_indices, min_split_tokens=15, max_split_tokens=60
+    )
+
+    assert splits == [[0, 1, 2], [3, 4], [5]]
+
+
+def test_splitter_does_not_build_a_rolling_window_splitter() -> None:
+    with patch.object(
+        splitter, "RollingWindowSplitter", side_effect=AssertionError("built")
+    ), patch.object(vectorized_splitter, "get_token_counter"):
+        semantic_splitter = VectorizedSemanticSplitter(
+            encoder=None, window_size=5, min_split_tokens=50, max_split_tokens=300
+        )
+
+    assert semantic_splitter.max_split_tokens == 300
+    assert not hasattr(semantic_splitter, "splitter")
+
+
+class TopicEncoder(BaseEncoder):
+    """Embeds texts by the topic word they start with."""
+
+    name: str = "topic"
+
+    def __call__(self, docs: list[str]) -> list[list[float]]:
+        topics = {"Pumps": [1.0, 0.1], "Valves": [0.1, 1.0]}
+        return [topics.get(doc.split()[0], [1.0, 1.0]) for doc in docs]
+
+
+def word_count(text: str) -> int:
+    return len(text.split())
+
+
+class WordCounter:
+    def count(self, text: str) -> int:
+        return word_count(text)
+
+    def count_batch(self, texts: list[str]) -> list[int]:
+        return [word_count(text) for text in texts]
+
+
+def test_vectorized_splitter_matches_the_rolling_window_splitter() -> None:
+    def element(text: str, type: str = "NarrativeText") -> dict:
+        return {"type": type, "text": text, "metadata": {"page_number": 1}}
+
+    elements = [
+        element("Overview", type="Title"),
+        element("Pumps move water. Pumps need power."),
+        element("Pumps wear out over the years."),
+        element("Valves stop the flow of water."),
+        element("Valves leak when they get old."),
+        {
+            **element("pressure table", type="Table"),
+            "metadata": {"text_as_html": "<table></table>"},
+        },
+        element("Pumps are checked every year. Valves are checked too."),
+        element("Maintenance", type="Title"),
+        element("Valves are replaced. Pumps are repaired. Valves are tested."),
+    ]
+    settings = dict(window_size=2, min_split_tokens=6, max_split_tokens=14)
+
+    async def run():
+        rolling = UnstructuredSemanticSplitter(encoder=TopicEncoder(), **settings)
+        vectorized = VectorizedSemanticSplitter(encoder=TopicEncoder(), **settings)
+        return await rolling(elements), await vectorized(elements)
+
+    with patch.object(rolling_window, "tiktoken_length", word_count), patch.object(
+        vectorized_splitter, "get_token_counter", WordCounter
+    ), patch.object(splitter, "split_table", lambda html, tokens: [html]):
+        rolling_chunks, vectorized_chunks = asyncio.run(run())
+
+    def titled_contents(chunks: list[dict]) -> list[tuple[str, str]]:
+        return [(chunk["metadata"]["title"], chunk["page_content"]) for chunk in chunks]
+
+    assert titled_contents(vectorized_chunks) == titled_contents(rolling_chunks)
+    # Each text appears once, before or after the table it surrounds
+    contents = [chunk["page_content"] for chunk in rolling_chunks]
+    assert sum("Pumps wear out" in content for content in contents) == 1
+    assert contents.index("<table></table>") == 2
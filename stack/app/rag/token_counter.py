@@ -0,0 +1,47 @@
+from functools import lru_cache
+
+import tiktoken
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Rough average for English text with cl100k_base
+CHARS_PER_TOKEN = 4
+
+
+class TokenCounter:
+    """Counts tokens with a single tiktoken encoding that is loaded once."""
+
+    def __init__(self, encoding_name: str = DEFAULT_ENCODING):
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def encode_batch(self, texts: list[str], num_threads: int = 8) -> list[list[int]]:
+        return self.encoding.encode_batch(
+            texts, num_threads=num_threads, disallowed_special=()
+        )
+
+    def count_batch(self, texts: list[str], num_threads: int = 8) -> list[int]:
+        return [len(tokens) for tokens in self.encode_batch(texts, num_threads)]
+
+    @staticmethod
+    def estimate(text: str) -> int:
+        """Approximate token count without tokenizing."""
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    def fits_within(self, text: str, max_tokens: int) -> bool:
+        """Exact check of `count(text) <= max_tokens` that skips tokenizing
+        when the answer follows from the text length alone.
+
+        Every token covers at least one byte of UTF-8, so text with no more
+        bytes than `max_tokens` always fits.
+        """
+        if len(text) <= max_tokens and len(text.encode("utf-8")) <= max_tokens:
+            return True
+        return self.count(text) <= max_tokens
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(encoding_name: str = DEFAULT_ENCODING) -> TokenCounter:
+    return TokenCounter(encoding_name)
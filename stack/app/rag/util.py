@@ -1,13 +1,22 @@
 import hashlib
-from typing import Tuple
+import uuid
+from typing import Any, Tuple
 
-import tiktoken
+from stack.app.rag.token_counter import get_token_counter
 
 
 def get_tiktoken_length(text: str) -> int:
-    tokenizer = tiktoken.get_encoding("cl100k_base")
-    tokens = tokenizer.encode(text, disallowed_special=())
-    return len(tokens)
+    return get_token_counter().count(text)
+
+
+def get_tiktoken_lengths(texts: list[str]) -> list[int]:
+    return get_token_counter().count_batch(texts)
+
+
+def _is_number(word: str) -> bool:
+    if word.isdigit():
+        return True
+    return "." in word and word.replace(".", "").isdigit()
 
 
 def check_content_is_useful(
@@ -17,18 +26,25 @@ def check_content_is_useful(
     information_density_ratio: float = 0.5,
     max_density_word_count: int = 200,
 ) -> Tuple[bool, str]:
-    words = document_content.split(" ")
-    print(f"WORDS={len(words)}")
-    if document_content == "" or not words or not len(words):
+    if document_content == "":
         return False, "No words in content"
 
+    # Count words, unique words and numbers in a single pass
+    word_count = 0
+    number_count = 0
+    unique_words = set()
+    for word in document_content.split(" "):
+        word_count += 1
+        unique_words.add(word)
+        if _is_number(word):
+            number_count += 1
+
     # Check min word length
-    word_count = len(words)
     if word_count < min_word_count:
         return False, f"word_count={word_count} < threshold={min_word_count}"
 
     # Check information density
-    density_ratio = len(set(words)) / len(words)
+    density_ratio = len(unique_words) / word_count
     if (
         word_count < max_density_word_count
         and density_ratio < information_density_ratio
@@ -39,14 +55,31 @@ def check_content_is_useful(
         )
 
     # Check that this chunk is not full of useless numbers
-    number_count = sum(word.replace(".", "").isdigit() for word in words)
-    number_ratio = number_count / word_count if word_count > 0 else 0
+    number_ratio = number_count / word_count
     if number_ratio > max_number_ratio:
         return False, f"number_ratio={number_ratio} > threshold={max_number_ratio}"
 
     return True, "Document content passes checks."
 
 
+def content_fingerprint(content: str) -> str:
+    """Stable fingerprint of chunk content, ignoring whitespace differences."""
+    normalized = " ".join(content.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+# Fixed namespace so chunk ids are stable across processes and deployments
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c4a7e-3b8d-5e2f-9a41-0d7c2b5e8f13")
+
+
+def chunk_id(namespace: Any, file_id: Any, position: int, fingerprint: str) -> str:
+    """Deterministic point id for a chunk, so re-ingesting the same content
+    overwrites existing points instead of duplicating them."""
+    return str(
+        uuid.uuid5(CHUNK_ID_NAMESPACE, f"{namespace}:{file_id}:{position}:{fingerprint}")
+    )
+
+
 def sentence_hash(sentence):
     """Create a hash for a sentence, ignoring whitespace and capitalization."""
     return hashlib.md5(sentence.strip().lower().encode()).hexdigest()
@@ -57,17 +90,44 @@ def deduplicate_chunk(chunk: str) -> str:
     if not chunk:
         return chunk
 
-    final_chunk = ""
-    memory = {}
+    parts = []
+    seen = set()
     for sentence in chunk.split("."):
         # end of chunk
-        if not sentence.strip():
-            final_chunk += "."
+        stripped = sentence.strip()
+        if not stripped:
+            parts.append(".")
             continue
-        hash_value = sentence_hash(sentence.strip())
-        if hash_value in memory:
+        # Same key as `sentence_hash`, without hashing
+        key = stripped.lower()
+        if key in seen:
             continue
-        final_chunk += f".{sentence}" if final_chunk else sentence
-        memory[hash_value] = 1
+        parts.append(f".{sentence}" if parts else sentence)
+        seen.add(key)
+
+    return "".join(parts)
+
 
-    return final_chunk
+def filter_chunk_contents(
+    contents: list[str],
+    min_word_count: int = 10,
+    information_density_ratio: float = 0.5,
+    max_density_word_count: int = 200,
+    max_number_ratio: float = 0.3,
+) -> list[tuple[str, bool, str]]:
+    """Deduplicate and check a batch of chunk contents.
+
+    Returns a `(deduplicated_content, valid, reason)` tuple per content.
+    """
+    results = []
+    for content in contents:
+        deduplicated_content = deduplicate_chunk(content)
+        valid, reason = check_content_is_useful(
+            deduplicated_content,
+            min_word_count=min_word_count,
+            max_number_ratio=max_number_ratio,
+            information_density_ratio=information_density_ratio,
+            max_density_word_count=max_density_word_count,
+        )
+        results.append((deduplicated_content, valid, reason))
+    return results
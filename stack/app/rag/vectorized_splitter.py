@@ -0,0 +1,278 @@
+"""
+vectorized_splitter.py
+----------
+
+Semantic splitting over a single matrix of element embeddings.
+
+Follows the algorithm of semantic_router's `RollingWindowSplitter`
+(similarity of each element with the mean of the preceding window, dynamic
+threshold search, token-bounded splits), but every element of a document is
+embedded up front in a few large batches and the similarities of all
+sections are computed at once with NumPy. Text runs and chunks are the same
+as with `UnstructuredSemanticSplitter`. Chunks made of a single element keep
+that element's vector so it does not have to be embedded again.
+"""
+import asyncio
+from typing import Any, Optional
+
+import numpy as np
+import structlog
+from semantic_router.encoders.base import BaseEncoder
+from semantic_router.splitters.utils import split_to_sentences
+
+from stack.app.core.configuration import get_settings
+from stack.app.rag.encoders.async_encoder import AsyncEncoder
+from stack.app.rag.splitter import UnstructuredSemanticSplitter
+from stack.app.rag.token_counter import get_token_counter
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+# Same defaults as RollingWindowSplitter
+THRESHOLD_ADJUSTMENT = 0.01
+SPLIT_TOKENS_TOLERANCE = 10
+
+
+def rolling_similarities(
+    embeddings: np.ndarray, offsets: list[int], window_size: int
+) -> np.ndarray:
+    """Cosine similarity of every row with the mean of the (up to)
+    `window_size` rows before it in the same segment.
+
+    Segment `i` spans rows `offsets[i]:offsets[i + 1]`. The first row of a
+    segment has nothing to compare with and gets NaN.
+    """
+    num_rows = len(embeddings)
+    cumulative = np.zeros((num_rows + 1, embeddings.shape[1]))
+    np.cumsum(embeddings, axis=0, out=cumulative[1:])
+
+    rows = np.arange(num_rows)
+    segment_starts = np.repeat(offsets[:-1], np.diff(offsets))
+    window_starts = np.maximum(segment_starts, rows - window_size)
+    window_sizes = rows - window_starts
+
+    similarities = np.full(num_rows, np.nan)
+    has_context = window_sizes > 0
+    rows, window_starts = rows[has_context], window_starts[has_context]
+    context = (cumulative[rows] - cumulative[window_starts]) / window_sizes[
+        has_context, None
+    ]
+    current = embeddings[rows]
+    similarities[rows] = np.einsum("ij,ij->i", context, current) / (
+        np.linalg.norm(context, axis=1) * np.linalg.norm(current, axis=1) + 1e-10
+    )
+    return similarities
+
+
+def find_split_indices(similarities: np.ndarray, threshold: float) -> np.ndarray:
+    """Indices of the documents that start a new split: `similarities[i]`
+    compares document `i + 1` with the documents before it."""
+    return np.flatnonzero(similarities < threshold) + 1
+
+
+def find_optimal_threshold(
+    similarities: np.ndarray,
+    token_counts: np.ndarray,
+    min_split_tokens: int,
+    max_split_tokens: int,
+) -> float:
+    """Binary search for the similarity threshold whose splits have a median
+    size within the token bounds."""
+    cumulative_token_counts = np.concatenate(([0], np.cumsum(token_counts)))
+    median_score = np.median(similarities)
+    std_dev = np.std(similarities)
+    low = max(0.0, float(median_score - std_dev))
+    high = min(1.0, float(median_score + std_dev))
+
+    threshold = (low + high) / 2
+    while low <= high:
+        threshold = (low + high) / 2
+        split_indices = find_split_indices(similarities, threshold)
+        boundaries = np.concatenate(([0], split_indices, [len(token_counts)]))
+        median_tokens = np.median(np.diff(cumulative_token_counts[boundaries]))
+        if (
+            min_split_tokens - SPLIT_TOKENS_TOLERANCE
+            <= median_tokens
+            <= max_split_tokens + SPLIT_TOKENS_TOLERANCE
+        ):
+            break
+        elif median_tokens < min_split_tokens:
+            high = threshold - THRESHOLD_ADJUSTMENT
+        else:
+            low = threshold + THRESHOLD_ADJUSTMENT
+    return threshold
+
+
+def group_documents(
+    token_counts: np.ndarray,
+    split_indices: np.ndarray,
+    min_split_tokens: int,
+    max_split_tokens: int,
+) -> list[list[int]]:
+    """Group consecutive documents into splits, starting a new split at a
+    split index when the current one is large enough and whenever the
+    current one would exceed `max_split_tokens`."""
+    split_starts = set(split_indices.tolist())
+    splits: list[list[int]] = []
+    current_split: list[int] = []
+    current_tokens = 0
+
+    for doc_idx, doc_tokens in enumerate(token_counts.tolist()):
+        if (
+            doc_idx + 1 in split_starts
+            and min_split_tokens <= current_tokens + doc_tokens < max_split_tokens
+        ):
+            current_split.append(doc_idx)
+            splits.append(current_split)
+            current_split, current_tokens = [], 0
+            continue
+        if (
+            current_tokens + doc_tokens > max_split_tokens
+            and current_tokens >= min_split_tokens
+        ):
+            splits.append(current_split)
+            current_split, current_tokens = [], 0
+        current_split.append(doc_idx)
+        current_tokens += doc_tokens
+
+    if current_split:
+        splits.append(current_split)
+    return splits
+
+
+class VectorizedSemanticSplitter(UnstructuredSemanticSplitter):
+    def __init__(
+        self,
+        encoder: BaseEncoder,
+        window_size: int,
+        min_split_tokens: int,
+        max_split_tokens: int,
+        batch_size: int = settings.SEMANTIC_EMBEDDING_BATCH_SIZE,
+    ):
+        # The parent's RollingWindowSplitter is not used, so its __init__ is
+        # skipped
+        self.encoder = encoder
+        self.window_size = window_size
+        self.min_split_tokens = min_split_tokens
+        self.max_split_tokens = max_split_tokens
+        self.batch_size = batch_size
+        self.token_counter = get_token_counter()
+
+    async def _embed(self, texts: list[str]) -> np.ndarray:
+        """Embed `texts` in batches of `batch_size`, encoding repeated texts
+        once."""
+        unique_texts = list(dict.fromkeys(texts))
+        async_encoder = AsyncEncoder(self.encoder)
+        batches = await asyncio.gather(
+            *[
+                async_encoder.acall(unique_texts[i : i + self.batch_size])
+                for i in range(0, len(unique_texts), self.batch_size)
+            ]
+        )
+        vectors = np.array(
+            [vector for batch in batches for vector in batch], dtype=np.float64
+        )
+        positions = {text: position for position, text in enumerate(unique_texts)}
+        return vectors[[positions[text] for text in texts]]
+
+    def _split_segment(
+        self, similarities: np.ndarray, token_counts: np.ndarray
+    ) -> list[list[int]]:
+        if len(token_counts) == 1:
+            return [[0]]
+        threshold = find_optimal_threshold(
+            similarities, token_counts, self.min_split_tokens, self.max_split_tokens
+        )
+        return group_documents(
+            token_counts,
+            find_split_indices(similarities, threshold),
+            self.min_split_tokens,
+            self.max_split_tokens,
+        )
+
+    async def split_grouped_elements(
+        self, elements: list[dict[str, Any]], splitter: Optional[Any] = None
+    ) -> list[dict[str, Any]]:
+        """Split the text runs between tables of each section semantically.
+
+        Chunks of several elements are embedded again when they are
+        upserted. Pooling their element vectors would give a vector that is
+        not the encoder's embedding of the chunk text, which queries are
+        compared against.
+        """
+        grouped_elements = self._group_elements_by_title(elements)
+
+        # Texts between tables form the segments that are split semantically.
+        # All of them are laid out in one list so they are embedded together.
+        texts: list[str] = []
+        offsets = [0]
+        sections = []
+        for index, (title, section_elements) in enumerate(grouped_elements.items()):
+            if not section_elements:
+                continue
+            parts: list[tuple[str, Any]] = []
+            segment: list[str] = []
+            for element in section_elements:
+                if not element.get("text"):
+                    continue
+                if element.get("type") == "Table":
+                    if segment:
+                        segment_id = self._add_segment(segment, texts, offsets)
+                        parts.append(("text", segment_id))
+                        segment = []
+                    parts.append(("table", element))
+                else:
+                    segment.append(element.get("text"))
+            if segment:
+                segment_id = self._add_segment(segment, texts, offsets)
+                parts.append(("text", segment_id))
+            sections.append(
+                (index, title, section_elements[0].get("metadata", {}), parts)
+            )
+
+        if texts:
+            embeddings = await self._embed(texts)
+            token_counts = np.array(self.token_counter.count_batch(texts))
+            similarities = rolling_similarities(embeddings, offsets, self.window_size)
+
+        chunks_with_title: list[dict[str, Any]] = []
+        for index, title, section_metadata, parts in sections:
+            for kind, part in parts:
+                if kind == "table":
+                    await self._append_table_chunks(
+                        chunks_with_title,
+                        title=title,
+                        chunk_index=index,
+                        element=part,
+                    )
+                    continue
+                start, end = offsets[part], offsets[part + 1]
+                for split in self._split_segment(
+                    similarities[start + 1 : end], token_counts[start:end]
+                ):
+                    self._append_chunks(
+                        chunks_with_title,
+                        title=title,
+                        page_content=" ".join(texts[start + i] for i in split),
+                        chunk_index=index,
+                        metadata=section_metadata,
+                        dense_embedding=embeddings[start + split[0]].tolist()
+                        if len(split) == 1
+                        else None,
+                    )
+        return chunks_with_title
+
+    def _add_segment(
+        self, segment: list[str], texts: list[str], offsets: list[int]
+    ) -> int:
+        """Append a segment to `texts` and return its position in `offsets`.
+        Like RollingWindowSplitter, a segment of a single text is split into
+        sentences first."""
+        if len(segment) == 1:
+            segment = split_to_sentences(segment[0]) or segment
+        texts.extend(segment)
+        offsets.append(len(texts))
+        return len(offsets) - 2
+
+    async def __call__(self, elements: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        return await self.split_grouped_elements(elements)
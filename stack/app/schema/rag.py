@@ -76,30 +76,40 @@ class EncoderConfig(BaseModel):
                 "default_model_name": "embed-multilingual-light-v3.0",
                 "default_dimensions": 384,
                 "default_score_threshold": 0.3,
+                "max_concurrency": 4,
+                "requests_per_minute": None,
             },
             EncoderProvider.openai: {
                 "class": OpenAIEncoder,
                 "default_model_name": "text-embedding-3-small",
                 "default_dimensions": 1536,
                 "default_score_threshold": 0.82,
+                "max_concurrency": 10,
+                "requests_per_minute": 3000,
             },
             EncoderProvider.ollama: {
                 "class": OllamaEncoder,
                 "default_model_name": "all-minilm",
                 "default_dimensions": 384,
                 "default_score_threshold": 0.67,
+                "max_concurrency": 2,
+                "requests_per_minute": None,
             },
             EncoderProvider.azure_openai: {
                 "class": AzureOpenAIEncoder,
                 "default_model_name": "text-embedding-3-small",
                 "default_dimensions": 1536,
                 "default_score_threshold": 0.82,
+                "max_concurrency": 10,
+                "requests_per_minute": None,
             },
             EncoderProvider.mistral: {
                 "class": MistralEncoder,
                 "default_model_name": "mistral-embed",
                 "default_dimensions": 1024,
                 "default_score_threshold": 0.82,
+                "max_concurrency": 4,
+                "requests_per_minute": None,
             },
         }
         return encoder_configs.get(encoder_provider)
@@ -120,8 +130,10 @@ class EncoderConfig(BaseModel):
 
 
 class UnstructuredConfig(BaseModel):
-    partition_strategy: Literal["auto", "hi_res"] = Field(
-        default=settings.DEFAULT_PARTITION_STRATEGY
+    partition_strategy: Literal["auto", "hi_res", "local"] = Field(
+        default=settings.DEFAULT_PARTITION_STRATEGY,
+        description="`local` parses plain text, markdown, CSV, JSON, HTML, PDF "
+        "and Word files in-process instead of calling the Unstructured API",
     )
     hi_res_model_name: Literal["detectron2_onnx", "chipper"] = Field(
         default=settings.DEFAULT_HI_RES_MODEL_NAME,
@@ -134,8 +146,10 @@ class UnstructuredConfig(BaseModel):
 
 
 class SplitterConfig(BaseModel):
-    name: Literal["semantic", "by_title"] = Field(
-        default=settings.DEFAULT_CHUNKING_STRATEGY, description="Splitter method"
+    name: Literal["semantic", "by_title", "local"] = Field(
+        default=settings.DEFAULT_CHUNKING_STRATEGY,
+        description="Splitter method, `local` parses files in-process and "
+        "splits them recursively by tokens without calling external services",
     )
     min_tokens: int = Field(
         default=settings.DEFAULT_SEMANTIC_CHUNK_MIN_TOKENS,
@@ -143,13 +157,25 @@ class SplitterConfig(BaseModel):
     )
     max_tokens: int = Field(
         default=settings.DEFAULT_SEMANTIC_CHUNK_MAX_TOKENS,
-        description="Only for `semantic` and `recursive` methods",
+        description="Only for `semantic` and `local` methods",
+    )
+    chunk_overlap: int = Field(
+        default=settings.DEFAULT_CHUNK_OVERLAP,
+        ge=0,
+        description="Only for `local` method",
     )
     rolling_window_size: int = Field(
         default=settings.SEMANTIC_ROLLING_WINDOW_SIZE,
         description="Only for `semantic` method, cumulative window size "
         "for comparing similarity between elements",
     )
+    vectorized: bool = Field(
+        default=settings.SEMANTIC_VECTORIZED_SPLITTING,
+        description="Only for `semantic` method, embed all elements of a "
+        "document in a few large batches, compute split points over the "
+        "resulting matrix and reuse the element vectors for chunks made of "
+        "a single element",
+    )
     prefix_titles: bool = Field(
         default=settings.PREFIX_TITLES,
         description="Add to prefix titles in chunk, only `semantic` method",
@@ -159,6 +185,32 @@ class SplitterConfig(BaseModel):
     )
 
 
+class DeduplicationConfig(BaseModel):
+    enabled: bool = Field(
+        default=settings.NEAR_DUPLICATE_FILTER_ENABLED,
+        description="Drop chunks that are near-duplicates of an earlier chunk "
+        "before embedding them",
+    )
+    threshold: float = Field(
+        default=settings.NEAR_DUPLICATE_THRESHOLD,
+        gt=0,
+        le=1,
+        description="Estimated Jaccard similarity of the word shingles of two "
+        "chunks above which they are near-duplicates",
+    )
+    num_perm: int = Field(
+        default=128, ge=16, description="Number of MinHash permutations"
+    )
+    shingle_size: int = Field(
+        default=5, ge=1, description="Number of words per shingle"
+    )
+    against_namespace: bool = Field(
+        default=settings.NEAR_DUPLICATE_AGAINST_NAMESPACE,
+        description="Also drop chunks that are near-duplicates of chunks "
+        "already stored in the namespace",
+    )
+
+
 class ParserConfig(BaseModel):
     structured_data_content_field: Optional[str] = Field(
         default="page_content",
@@ -187,6 +239,15 @@ class DocumentProcessorConfig(BaseModel):
         default=ParserConfig(),
         description="Content-specific keyword arguments for processing",
     )
+    deduplication: DeduplicationConfig = Field(
+        default=DeduplicationConfig(),
+        description="Near-duplicate chunk filtering configuration. If not provided, this comes from the env config.",
+    )
+    max_concurrent_files: int = Field(
+        default=settings.INGEST_MAX_CONCURRENT_FILES,
+        ge=1,
+        description="Maximum number of files partitioned and chunked concurrently.",
+    )
 
 
 class IngestRequestPayload(BaseModel):
@@ -215,6 +276,21 @@ class IngestRequestPayload(BaseModel):
         None,
         description="Webhook url to send the notification to when the ingestion is completed.",
     )
+    incremental: bool = Field(
+        default=False,
+        description="Re-ingest files that are already indexed by only embedding new chunks and deleting removed ones.",
+    )
+
+
+class ResumeIngestRequestPayload(BaseModel):
+    vector_database: VectorDatabase = Field(
+        ...,
+        description="Vector database to store the embeddings. Credentials are not stored with the checkpoints of a task, so this is supplied again on resume. Pass an empty object to use the env config.",
+    )
+    webhook_url: Optional[str] = Field(
+        None,
+        description="Webhook url to send the notification to when the ingestion is completed.",
+    )
 
 
 # Query Schemas
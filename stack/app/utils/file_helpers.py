@@ -1,7 +1,9 @@
 import mimetypes
-import json
 import csv
 import io
+from typing import Any, Iterator
+
+import orjson
 from langchain_community.document_loaders.parsers.html.bs4 import BS4HTMLParser
 from langchain_community.document_loaders.parsers.pdf import PDFMinerParser
 from langchain_community.document_loaders.parsers.generic import MimeTypeBasedParser
@@ -112,21 +114,32 @@ def is_mime_type_supported(mime_type: str) -> bool:
     return mime_type in SUPPORTED_MIMETYPES
 
 
+def iter_json_records(file_content: bytes) -> Iterator[Any]:
+    """Iterate over the items of a JSON array. Unlike CSV files, JSON files
+    are parsed as a whole before the first item is returned."""
+    yield from parse_json_file(file_content)
+
+
+def iter_csv_records(file_content: bytes) -> Iterator[dict]:
+    """Lazily iterate over the rows of a CSV file, decoding it as it is
+    read."""
+    stream = io.TextIOWrapper(io.BytesIO(file_content), encoding="utf-8", newline="")
+    try:
+        yield from csv.DictReader(stream)
+    except csv.Error:
+        raise ValueError("Invalid CSV file")
+
+
 def parse_json_file(file_content: bytes) -> list:
     try:
-        data = json.loads(file_content.decode("utf-8"))
+        data = orjson.loads(file_content)
         if isinstance(data, list):
             return data
         else:
             raise ValueError("JSON file must contain an array of objects")
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         raise ValueError("Invalid JSON file")
 
 
 def parse_csv_file(file_content: bytes) -> list:
-    try:
-        csv_content = file_content.decode("utf-8")
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
-        return list(csv_reader)
-    except csv.Error:
-        raise ValueError("Invalid CSV file")
+    return list(iter_csv_records(file_content))
@@ -36,7 +36,7 @@ async def ingest_task_event_generator(task_id: str, redis_service: RedisService)
                 last_index += 1
 
             status = await redis_service.get_ingestion_status(task_id)
-            if status in ["completed", "failed"]:
+            if status in ["completed", "partially_completed", "failed"]:
                 logger.debug(f"Sending completion event: {status}")
                 yield {
                     "event": "data",
@@ -1,4 +1,10 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
 from typing import Optional
+
+import orjson
+import structlog
 from dotenv import load_dotenv
 from semantic_router.encoders import BaseEncoder
 from stack.app.schema.rag import (
@@ -9,11 +15,41 @@ from stack.app.schema.rag import (
 )
 from stack.app.vectordbs.base import BaseVectorDatabase
 from stack.app.vectordbs.qdrant import QdrantService
+from stack.app.cache.embedding_cache import get_encoder_namespace
 from stack.app.core.configuration import get_settings
 
 load_dotenv()
+logger = structlog.get_logger()
 settings = get_settings()
 
+# Services by the settings they were created with, least recently used first
+_vector_services: "OrderedDict[tuple, BaseVectorDatabase]" = OrderedDict()
+# Keeps a reference to pending close tasks so they are not garbage collected
+_closing_tasks: set[asyncio.Task] = set()
+
+
+def _credentials_hash(config: dict) -> str:
+    return hashlib.sha256(
+        orjson.dumps(config, option=orjson.OPT_SORT_KEYS, default=str)
+    ).hexdigest()
+
+
+def _evict_vector_services(max_size: int) -> None:
+    """Drop the least recently used services beyond `max_size`, closing the
+    clients that no cached service uses anymore once their requests in
+    flight have finished."""
+    while len(_vector_services) > max_size:
+        _, service = _vector_services.popitem(last=False)
+        if any(service.shares_client(other) for other in _vector_services.values()):
+            continue
+        try:
+            task = asyncio.get_running_loop().create_task(service.close())
+        except RuntimeError:
+            logger.warning(f"Could not close the client of {service.index_name}")
+            continue
+        _closing_tasks.add(task)
+        task.add_done_callback(_closing_tasks.discard)
+
 
 def get_vector_service(
     *,
@@ -27,6 +63,8 @@ def get_vector_service(
     dimensions: Optional[int] = settings.VECTOR_DB_ENCODER_DIMENSIONS,
     enable_rerank: Optional[bool] = settings.ENABLE_RERANK_BY_DEFAULT,
 ) -> BaseVectorDatabase:
+    """Return the vector service for these settings. Services are cached, so
+    repeated calls reuse the same encoder and database client."""
     services = {
         VectorDatabaseType.qdrant: QdrantService,
         # Add other providers here
@@ -44,6 +82,20 @@ def get_vector_service(
     if service is None:
         raise ValueError(f"Unsupported provider: {db_type}")
 
+    key = (
+        db_type,
+        index_name,
+        namespace,
+        _credentials_hash(dict(vector_db.config)),
+        get_encoder_namespace(encoder) if encoder is not None else encoder_provider,
+        dimensions,
+        enable_rerank,
+    )
+    cached_service = _vector_services.get(key)
+    if cached_service is not None:
+        _vector_services.move_to_end(key)
+        return cached_service
+
     encoder_config = EncoderConfig.get_encoder_config(encoder_provider)
     if encoder_config is None:
         raise ValueError(f"Unsupported encoder provider: {encoder_provider}")
@@ -56,11 +108,14 @@ def get_vector_service(
             )
         encoder: BaseEncoder = encoder_class()
 
-    return service(
+    vector_service = service(
         index_name=index_name,
         dimension=dimensions,
-        credentials=dict(credentials.config),
+        credentials=dict(vector_db.config),
         encoder=encoder,
         enable_rerank=enable_rerank,
         namespace=namespace,
     )
+    _vector_services[key] = vector_service
+    _evict_vector_services(settings.VECTOR_SERVICE_CACHE_SIZE)
+    return vector_service
@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
 
 from semantic_router.encoders import BaseEncoder
 from tqdm import tqdm
 
 from stack.app.schema.rag import DeleteDocumentsResponse, BaseDocumentChunk
+from stack.app.rag.encoders.async_encoder import AsyncEncoder
 import structlog
 from stack.app.core.configuration import get_settings
 
@@ -37,14 +39,57 @@ class BaseVectorDatabase(ABC):
     async def query(self, input: str, top_k: int = 25) -> list[BaseDocumentChunk]:
         pass
 
+    @abstractmethod
+    async def query_batch(
+        self,
+        inputs: list[str],
+        top_k: int = 25,
+        namespace: Optional[str] = None,
+        vectors: Optional[list[list[float]]] = None,
+    ) -> list[list[BaseDocumentChunk]]:
+        """Query with several inputs at once, returning the results of each
+        input in order. All inputs are embedded in a single encoder call,
+        unless their `vectors` are passed in."""
+        pass
+
     @abstractmethod
     async def delete(
         self, file_id: str, assistant_id: str = None
     ) -> DeleteDocumentsResponse:
         pass
 
+    @abstractmethod
+    async def get_fingerprints(self, file_id: str, namespace: str) -> dict[str, str]:
+        """Map point ids stored for a file in a namespace to their content
+        fingerprints."""
+        pass
+
+    @abstractmethod
+    async def delete_points(self, point_ids: list[str]) -> None:
+        pass
+
+    @abstractmethod
+    def iter_contents(
+        self, namespace: str, batch_size: int = 1000
+    ) -> AsyncIterator[list[tuple[str, str]]]:
+        """Yield batches of (point id, page content) stored in a
+        namespace."""
+        pass
+
+    def shares_client(self, other: "BaseVectorDatabase") -> bool:
+        """Whether closing this service would close the client of `other`."""
+        return False
+
+    async def close(self) -> None:
+        """Release the database client. Called when the service is evicted
+        from the cache of `get_vector_service`."""
+        pass
+
     async def _generate_vectors(self, input: str) -> list[list[float]]:
-        return self.encoder([input])
+        return await AsyncEncoder(self.encoder).acall([input])
+
+    async def _generate_vectors_batch(self, inputs: list[str]) -> list[list[float]]:
+        return await AsyncEncoder(self.encoder).acall(inputs)
 
     async def rerank(
         self, query: str, documents: list[BaseDocumentChunk], top_n: int = 5
@@ -59,7 +104,8 @@ class BaseVectorDatabase(ABC):
             raise ValueError("API key for Cohere is not present.")
         cohere_client = Client(api_key=api_key)
 
-        # Avoid duplications, TODO: fix ingestion for duplications
+        # Chunk ids are deterministic so re-ingestion no longer duplicates points,
+        # but identical content can still exist across files or older indexes.
         # Deduplicate documents based on content while preserving order
         seen = set()
         deduplicated_documents = [
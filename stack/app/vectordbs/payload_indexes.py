@@ -0,0 +1,59 @@
+"""
+payload_indexes.py
+----------
+
+Adds the payload indexes of `PAYLOAD_INDEX_FIELDS` to Qdrant collections
+created before they were declared. New collections get them when they are
+created. Collections that do not exist are skipped.
+
+Usage:
+    python -m stack.app.vectordbs.payload_indexes --collections documents
+"""
+import argparse
+import asyncio
+
+import structlog
+
+from stack.app.core.configuration import get_settings
+from stack.app.core.logger import init_logging
+from stack.app.core.struct_logger import init_structlogger
+from stack.app.vectordbs.qdrant import QdrantService, close_qdrant_clients
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+async def main(collections: list[str]) -> None:
+    try:
+        for collection in collections:
+            created_fields = await QdrantService(
+                index_name=collection
+            ).ensure_payload_indexes()
+            logger.info(
+                f"Created payload indexes on {collection}: {created_fields}"
+                if created_fields
+                else f"No payload indexes to create on {collection}"
+            )
+    finally:
+        await close_qdrant_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Add missing payload indexes to Qdrant collections."
+    )
+    parser.add_argument(
+        "--collections",
+        nargs="+",
+        default=[
+            settings.VECTOR_DB_COLLECTION_NAME,
+            f"{settings.VECTOR_DB_COLLECTION_NAME}_summary",
+        ],
+        help="Collections to migrate, the default collection and its summaries"
+        " by default.",
+    )
+    args = parser.parse_args()
+
+    init_structlogger(settings)
+    init_logging()
+    asyncio.run(main(args.collections))
@@ -1,6 +1,9 @@
-from typing import List, Optional
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable, List, Optional
 
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.http import models as rest
 from semantic_router.encoders import BaseEncoder
 from tqdm import tqdm
@@ -8,6 +11,8 @@ import structlog
 from stack.app.schema.rag import DeleteDocumentsResponse, BaseDocumentChunk
 from stack.app.vectordbs.base import BaseVectorDatabase
 from stack.app.core.configuration import get_settings
+from stack.app.rag.cpu_executor import run_cpu_bound, should_offload
+from stack.app.rag.sparse_encoder import sparse_document_vectors, sparse_query_vector
 from qdrant_client.http import models as qdrant_models
 
 
@@ -15,6 +20,111 @@ settings = get_settings()
 
 logger = structlog.get_logger()
 
+# Clients are shared by every QdrantService that connects to the same server
+# with the same credentials, so their connection pools are reused
+_clients: dict[tuple, AsyncQdrantClient] = {}
+# Collections known to exist, per client, and whether they have a sparse vector
+_existing_collections: dict[tuple[tuple, str], bool] = {}
+_collection_locks: dict[tuple[tuple, str], asyncio.Lock] = {}
+# Requests in flight per client, so an evicted client is closed once idle
+_client_users: dict[tuple, int] = {}
+_idle_client_events: dict[tuple, asyncio.Event] = {}
+
+
+def get_client_key(credentials: dict) -> tuple:
+    return (
+        credentials["host"],
+        credentials.get("api_key"),
+        credentials.get("prefer_grpc", settings.VECTOR_DB_PREFER_GRPC),
+        credentials.get("grpc_port", settings.VECTOR_DB_GRPC_PORT),
+    )
+
+
+def get_qdrant_client(credentials: dict) -> AsyncQdrantClient:
+    """Return the shared client for `credentials`, creating it on first
+    use."""
+    key = get_client_key(credentials)
+    client = _clients.get(key)
+    if client is None:
+        host, api_key, prefer_grpc, grpc_port = key
+        client = AsyncQdrantClient(
+            url=host,
+            api_key=api_key or None,
+            https=False,
+            prefer_grpc=prefer_grpc,
+            grpc_port=grpc_port,
+        )
+        _clients[key] = client
+    return client
+
+
+SPARSE_VECTOR_NAME = "page_content_sparse"
+# Payload fields that queries and deletes filter on
+PAYLOAD_INDEX_FIELDS = ("namespace", "metadata.file_id", "metadata.namespace")
+# Candidates fetched by each of the dense and sparse searches before fusion
+HYBRID_PREFETCH_MULTIPLIER = 4
+
+
+def supports_hybrid_search() -> bool:
+    """Whether the installed qdrant-client has the query API, fusion and
+    the IDF modifier of sparse vectors, added in 1.10."""
+    return (
+        hasattr(AsyncQdrantClient, "query_points")
+        and hasattr(AsyncQdrantClient, "query_batch_points")
+        and hasattr(rest, "FusionQuery")
+        and hasattr(rest, "Modifier")
+    )
+
+
+@asynccontextmanager
+async def client_in_use(key: tuple) -> AsyncIterator[None]:
+    """Count a request on the client of `key`, so closing the client waits
+    for it to finish."""
+    _client_users[key] = _client_users.get(key, 0) + 1
+    try:
+        yield
+    finally:
+        _client_users[key] -= 1
+        if not _client_users[key]:
+            del _client_users[key]
+            idle = _idle_client_events.pop(key, None)
+            if idle is not None:
+                idle.set()
+
+
+def uses_client(method):
+    @functools.wraps(method)
+    async def wrapper(self: "QdrantService", *args, **kwargs):
+        async with client_in_use(self.client_key):
+            return await method(self, *args, **kwargs)
+
+    return wrapper
+
+
+async def close_qdrant_client(key: tuple) -> None:
+    """Close the client of `key` once no request is using it. Requests
+    started while waiting still get the client, later ones a new one."""
+    while key in _client_users:
+        await _idle_client_events.setdefault(key, asyncio.Event()).wait()
+    client = _clients.pop(key, None)
+    if client is None:
+        return
+    for collection_key in [
+        collection_key
+        for collection_key in _existing_collections
+        if collection_key[0] == key
+    ]:
+        del _existing_collections[collection_key]
+    await client.close()
+
+
+async def close_qdrant_clients() -> None:
+    for client in _clients.values():
+        await client.close()
+    _clients.clear()
+    _existing_collections.clear()
+    _collection_locks.clear()
+
 
 class QdrantService(BaseVectorDatabase):
     def __init__(
@@ -25,6 +135,7 @@ class QdrantService(BaseVectorDatabase):
         encoder: Optional[BaseEncoder] = None,
         enable_rerank: bool = False,
         namespace: Optional[str] = settings.VECTOR_DB_DEFAULT_NAMESPACE,
+        hybrid: bool = settings.VECTOR_DB_HYBRID_SEARCH,
     ):
         super().__init__(
             index_name=index_name,
@@ -35,31 +146,134 @@ class QdrantService(BaseVectorDatabase):
             namespace=namespace,
         )
 
-        self.client = QdrantClient(
-            credentials["host"], api_key=credentials["api_key"], https=False
+        if hybrid and not supports_hybrid_search():
+            raise ValueError(
+                "Hybrid search requires qdrant-client and a Qdrant server 1.10 "
+                "or later, disable VECTOR_DB_HYBRID_SEARCH or upgrade them"
+            )
+        self.client_key = get_client_key(credentials)
+        self.hybrid = hybrid
+        self.namespace_tenant_index = settings.VECTOR_DB_NAMESPACE_TENANT_INDEX
+
+    @property
+    def client(self) -> AsyncQdrantClient:
+        # Looked up on every use, so a service outliving its client after
+        # `close` gets a new one
+        return get_qdrant_client(self.credentials)
+
+    def shares_client(self, other: BaseVectorDatabase) -> bool:
+        return (
+            isinstance(other, QdrantService) and other.client_key == self.client_key
         )
 
-        collections = self.client.get_collections()
-        if index_name not in [c.name for c in collections.collections]:
-            self.client.create_collection(
+    async def close(self) -> None:
+        await close_qdrant_client(self.client_key)
+
+    async def _ensure_collection(self) -> bool:
+        """Create the collection if it does not exist, and return whether it
+        has a sparse vector. Only the first call per client and collection
+        asks Qdrant."""
+        collection_key = (self.client_key, self.index_name)
+        if collection_key in _existing_collections:
+            return _existing_collections[collection_key]
+        lock = _collection_locks.setdefault(collection_key, asyncio.Lock())
+        async with lock:
+            if collection_key in _existing_collections:
+                return _existing_collections[collection_key]
+            if await self.client.collection_exists(self.index_name):
+                collection = await self.client.get_collection(self.index_name)
+                has_sparse_vector = SPARSE_VECTOR_NAME in (
+                    collection.config.params.sparse_vectors or {}
+                )
+            else:
+                await self.client.create_collection(
+                    collection_name=self.index_name,
+                    vectors_config={
+                        "page_content": rest.VectorParams(
+                            size=self.dimension, distance=rest.Distance.COSINE
+                        )
+                    },
+                    sparse_vectors_config={
+                        SPARSE_VECTOR_NAME: rest.SparseVectorParams(
+                            modifier=rest.Modifier.IDF
+                        )
+                    }
+                    if self.hybrid
+                    else None,
+                    optimizers_config=rest.OptimizersConfigDiff(
+                        indexing_threshold=0,
+                    ),
+                )
+                has_sparse_vector = self.hybrid
+                await self._create_payload_indexes(PAYLOAD_INDEX_FIELDS)
+            _existing_collections[collection_key] = has_sparse_vector
+            return has_sparse_vector
+
+    def _payload_index_schema(self, field_name: str):
+        if field_name == "namespace" and self.namespace_tenant_index:
+            # Tenant indexes need Qdrant and qdrant-client 1.11 or later
+            keyword_index_params = getattr(rest, "KeywordIndexParams", None)
+            if keyword_index_params is not None:
+                return keyword_index_params(type="keyword", is_tenant=True)
+            logger.warning(
+                "Tenant indexes are not supported by this version of "
+                "qdrant-client, indexing namespace as a plain keyword"
+            )
+        return rest.PayloadSchemaType.KEYWORD
+
+    async def _create_payload_indexes(self, field_names: Iterable[str]) -> None:
+        for field_name in field_names:
+            await self.client.create_payload_index(
                 collection_name=self.index_name,
-                vectors_config={
-                    "page_content": rest.VectorParams(
-                        size=dimension, distance=rest.Distance.COSINE
-                    )
-                },
-                optimizers_config=rest.OptimizersConfigDiff(
-                    indexing_threshold=0,
-                ),
+                field_name=field_name,
+                field_schema=self._payload_index_schema(field_name),
+                wait=True,
             )
 
+    @uses_client
+    async def ensure_payload_indexes(self) -> list[str]:
+        """Create the payload indexes missing from an existing collection,
+        and return the fields they were created for. Collections created
+        before the indexes were declared are migrated with this."""
+        if not await self.client.collection_exists(self.index_name):
+            return []
+        collection = await self.client.get_collection(self.index_name)
+        missing_fields = [
+            field_name
+            for field_name in PAYLOAD_INDEX_FIELDS
+            if field_name not in (collection.payload_schema or {})
+        ]
+        await self._create_payload_indexes(missing_fields)
+        return missing_fields
+
+    @uses_client
     async def upsert(self, chunks: List[BaseDocumentChunk]) -> None:
+        has_sparse_vector = await self._ensure_collection()
+        # Collections with a sparse vector get one for every point, even
+        # when hybrid search is disabled, so they can be searched either way
+        sparse_vectors = (
+            await run_cpu_bound(
+                sparse_document_vectors,
+                [chunk.page_content for chunk in chunks],
+                offload=should_offload(len(chunks)),
+            )
+            if has_sparse_vector
+            else [None] * len(chunks)
+        )
+
         points = []
-        for chunk in tqdm(chunks, desc="Upserting to Qdrant"):
+        for chunk, sparse_vector in tqdm(
+            zip(chunks, sparse_vectors), total=len(chunks), desc="Upserting to Qdrant"
+        ):
+            vector = {"page_content": chunk.dense_embedding}
+            if sparse_vector and sparse_vector[0]:
+                vector[SPARSE_VECTOR_NAME] = rest.SparseVector(
+                    indices=sparse_vector[0], values=sparse_vector[1]
+                )
             points.append(
                 rest.PointStruct(
                     id=chunk.id,
-                    vector={"page_content": chunk.dense_embedding},
+                    vector=vector,
                     payload={
                         "page_content": chunk.page_content,
                         "namespace": chunk.namespace,
@@ -68,8 +282,63 @@ class QdrantService(BaseVectorDatabase):
                 )
             )
 
-        self.client.upsert(collection_name=self.index_name, wait=True, points=points)
+        await self.client.upsert(
+            collection_name=self.index_name, wait=True, points=points
+        )
+
+    @staticmethod
+    def _namespace_filter(namespace: str) -> qdrant_models.Filter:
+        return qdrant_models.Filter(
+            must=[
+                qdrant_models.FieldCondition(
+                    key="namespace",
+                    match=qdrant_models.MatchValue(
+                        value=namespace,
+                    ),
+                )
+            ]
+        )
+
+    @staticmethod
+    def _to_chunks(search_result: list[rest.ScoredPoint]) -> list[BaseDocumentChunk]:
+        return [
+            BaseDocumentChunk(
+                id=result.id,
+                page_content=result.payload.get("page_content", ""),
+                namespace=result.payload.get("namespace"),
+                metadata={
+                    k: v
+                    for k, v in result.payload.items()
+                    if k not in ["page_content", "namespace"]
+                },
+            )
+            for result in search_result
+        ]
+
+    @staticmethod
+    def _hybrid_prefetch(
+        input: str, vector: list[float], top_k: int, query_filter: rest.Filter
+    ) -> list[rest.Prefetch]:
+        """Dense and sparse searches whose results are fused with RRF."""
+        limit = top_k * HYBRID_PREFETCH_MULTIPLIER
+        prefetch = [
+            rest.Prefetch(
+                query=vector, using="page_content", filter=query_filter, limit=limit
+            )
+        ]
+        indices, values = sparse_query_vector(input)
+        if indices:
+            prefetch.append(
+                rest.Prefetch(
+                    query=rest.SparseVector(indices=indices, values=values),
+                    using=SPARSE_VECTOR_NAME,
+                    filter=query_filter,
+                    limit=limit,
+                )
+            )
+        return prefetch
 
+    @uses_client
     async def query(
         self,
         input: str,
@@ -79,37 +348,75 @@ class QdrantService(BaseVectorDatabase):
         vectors = await self._generate_vectors(input=input)
         if not namespace:
             namespace = self.namespace
+        query_filter = self._namespace_filter(namespace)
+
+        has_sparse_vector = await self._ensure_collection()
+        if self.hybrid and has_sparse_vector:
+            response = await self.client.query_points(
+                collection_name=self.index_name,
+                prefetch=self._hybrid_prefetch(input, vectors[0], top_k, query_filter),
+                query=rest.FusionQuery(fusion=rest.Fusion.RRF),
+                limit=top_k,
+                with_payload=True,
+            )
+            return self._to_chunks(response.points)
 
-        search_result = self.client.search(
+        search_result = await self.client.search(
             collection_name=self.index_name,
             query_vector=("page_content", vectors[0]),
             limit=top_k,
             with_payload=True,
-            query_filter=qdrant_models.Filter(
-                must=[
-                    qdrant_models.FieldCondition(
-                        key="namespace",
-                        match=qdrant_models.MatchValue(
-                            value=namespace,
+            query_filter=query_filter,
+        )
+        return self._to_chunks(search_result)
+
+    @uses_client
+    async def query_batch(
+        self,
+        inputs: list[str],
+        top_k: int = settings.MAX_QUERY_TOP_K,
+        namespace: Optional[str] = None,
+        vectors: Optional[list[list[float]]] = None,
+    ) -> list[list[BaseDocumentChunk]]:
+        if not inputs:
+            return []
+        if vectors is None:
+            vectors = await self._generate_vectors_batch(inputs)
+        query_filter = self._namespace_filter(namespace or self.namespace)
+
+        has_sparse_vector = await self._ensure_collection()
+        if self.hybrid and has_sparse_vector:
+            responses = await self.client.query_batch_points(
+                collection_name=self.index_name,
+                requests=[
+                    rest.QueryRequest(
+                        prefetch=self._hybrid_prefetch(
+                            input, vector, top_k, query_filter
                         ),
+                        query=rest.FusionQuery(fusion=rest.Fusion.RRF),
+                        limit=top_k,
+                        with_payload=True,
                     )
-                ]
-            ),
-        )
-        return [
-            BaseDocumentChunk(
-                id=result.id,
-                page_content=result.payload.get("page_content", ""),
-                namespace=result.payload.get("namespace"),
-                metadata={
-                    k: v
-                    for k, v in result.payload.items()
-                    if k not in ["page_content", "namespace"]
-                },
+                    for input, vector in zip(inputs, vectors)
+                ],
             )
-            for result in search_result
-        ]
+            return [self._to_chunks(response.points) for response in responses]
 
+        search_results = await self.client.search_batch(
+            collection_name=self.index_name,
+            requests=[
+                rest.SearchRequest(
+                    vector=rest.NamedVector(name="page_content", vector=vector),
+                    limit=top_k,
+                    with_payload=True,
+                    filter=query_filter,
+                )
+                for vector in vectors
+            ],
+        )
+        return [self._to_chunks(search_result) for search_result in search_results]
+
+    @uses_client
     async def delete(
         self, file_id: str, assistant_id: Optional[str] = None
     ) -> DeleteDocumentsResponse:
@@ -128,16 +435,87 @@ class QdrantService(BaseVectorDatabase):
 
         common_filter = rest.Filter(must=must_conditions)
 
-        deleted_chunks = self.client.count(
+        await self._ensure_collection()
+        deleted_chunks = await self.client.count(
             collection_name=self.index_name,
             count_filter=common_filter,
             exact=True,
         )
         logger.info(f"Preparing to delete {deleted_chunks.count} chunks")
 
-        self.client.delete(
+        await self.client.delete(
             collection_name=self.index_name,
             points_selector=rest.FilterSelector(filter=common_filter),
         )
 
         return DeleteDocumentsResponse(num_deleted_chunks=deleted_chunks.count)
+
+    @uses_client
+    async def get_fingerprints(self, file_id: str, namespace: str) -> dict[str, str]:
+        scroll_filter = rest.Filter(
+            must=[
+                rest.FieldCondition(
+                    key="metadata.file_id", match=rest.MatchValue(value=str(file_id))
+                ),
+                rest.FieldCondition(
+                    key="namespace", match=rest.MatchValue(value=str(namespace))
+                ),
+            ]
+        )
+        fingerprints: dict[str, str] = {}
+        offset = None
+        await self._ensure_collection()
+        while True:
+            points, offset = await self.client.scroll(
+                collection_name=self.index_name,
+                scroll_filter=scroll_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=["metadata.fingerprint"],
+                with_vectors=False,
+            )
+            for point in points:
+                fingerprint = (point.payload.get("metadata") or {}).get("fingerprint")
+                if fingerprint:
+                    fingerprints[str(point.id)] = fingerprint
+            if offset is None:
+                return fingerprints
+
+    async def iter_contents(
+        self, namespace: str, batch_size: int = 1000
+    ) -> AsyncIterator[list[tuple[str, str]]]:
+        scroll_filter = rest.Filter(
+            must=[
+                rest.FieldCondition(
+                    key="namespace", match=rest.MatchValue(value=str(namespace))
+                )
+            ]
+        )
+        offset = None
+        while True:
+            # The client is only counted in use while fetching a page, so a
+            # consumer that stops early does not keep it from being closed
+            async with client_in_use(self.client_key):
+                await self._ensure_collection()
+                points, offset = await self.client.scroll(
+                    collection_name=self.index_name,
+                    scroll_filter=scroll_filter,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=["page_content"],
+                    with_vectors=False,
+                )
+            yield [
+                (str(point.id), point.payload.get("page_content", ""))
+                for point in points
+            ]
+            if offset is None:
+                return
+
+    @uses_client
+    async def delete_points(self, point_ids: list[str]) -> None:
+        await self._ensure_collection()
+        await self.client.delete(
+            collection_name=self.index_name,
+            points_selector=rest.PointIdsList(points=point_ids),
+        )
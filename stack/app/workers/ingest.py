@@ -0,0 +1,145 @@
+"""
+ingest.py
+----------
+
+Standalone worker that runs ingestion jobs from the Redis queue.
+
+Usage:
+    python -m stack.app.workers.ingest --concurrency 4
+"""
+import argparse
+import asyncio
+import signal
+from contextlib import asynccontextmanager
+
+import structlog
+
+from stack.app.api.v1.rag import process_ingestion
+from stack.app.core.configuration import get_settings
+from stack.app.core.datastore import (
+    cleanup_db,
+    get_postgresql_session,
+    get_redis_connection,
+    initialize_db,
+)
+from stack.app.core.logger import init_logging
+from stack.app.core.redis import RedisService
+from stack.app.core.struct_logger import init_structlogger
+from stack.app.rag.cpu_executor import shutdown_process_pool
+from stack.app.rag.partition import shutdown_partition_executor
+from stack.app.vectordbs.qdrant import close_qdrant_clients
+from stack.app.repositories.assistant import AssistantRepository
+from stack.app.repositories.file import FileRepository
+from stack.app.workers.queue import IngestionJob, IngestionJobQueue
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+POLL_INTERVAL = 1.0
+
+
+async def run_job(job: IngestionJob) -> None:
+    redis = await get_redis_connection()
+    try:
+        async with asynccontextmanager(get_postgresql_session)() as session:
+            await process_ingestion(
+                job.task_id,
+                job.payload,
+                FileRepository(postgresql_session=session),
+                AssistantRepository(postgresql_session=session),
+                RedisService(redis),
+                raise_errors=True,
+            )
+    finally:
+        await redis.close()
+
+
+async def keep_lease(queue: IngestionJobQueue, job: IngestionJob) -> None:
+    while True:
+        await asyncio.sleep(queue.visibility_timeout / 3)
+        # A failed extension is retried on the next beat, so the lease only
+        # lapses if Redis stays unreachable for most of the timeout
+        try:
+            await queue.extend_lease(job)
+        except Exception as e:
+            logger.warning(
+                f"Could not extend the lease of ingestion {job.task_id}: {str(e)}"
+            )
+
+
+async def worker(
+    worker_id: int, queue: IngestionJobQueue, stop_event: asyncio.Event
+) -> None:
+    logger.info(f"Ingestion worker {worker_id} started")
+    while not stop_event.is_set():
+        job = await queue.dequeue()
+        if job is None:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        logger.info(
+            f"Worker {worker_id} running ingestion {job.task_id} (attempt {job.attempts})"
+        )
+        heartbeat = asyncio.create_task(keep_lease(queue, job))
+        try:
+            await run_job(job)
+            await queue.ack(job)
+        except Exception as e:
+            logger.exception(f"Ingestion {job.task_id} failed: {str(e)}")
+            await queue.fail(job, e)
+        finally:
+            heartbeat.cancel()
+    logger.info(f"Ingestion worker {worker_id} stopped")
+
+
+async def requeue_loop(queue: IngestionJobQueue, stop_event: asyncio.Event) -> None:
+    while not stop_event.is_set():
+        try:
+            await queue.requeue_due_jobs()
+        except Exception as e:
+            logger.exception(f"Error requeuing ingestion jobs: {str(e)}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main(concurrency: int) -> None:
+    await initialize_db()
+    redis = await get_redis_connection()
+    queue = IngestionJobQueue(redis)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        await asyncio.gather(
+            requeue_loop(queue, stop_event),
+            *[worker(worker_id, queue, stop_event) for worker_id in range(concurrency)],
+        )
+    finally:
+        await redis.close()
+        await cleanup_db()
+        shutdown_partition_executor()
+        shutdown_process_pool()
+        await close_qdrant_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run ingestion queue workers.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.INGESTION_WORKER_CONCURRENCY,
+        help="Number of ingestion jobs processed concurrently.",
+    )
+    args = parser.parse_args()
+
+    init_structlogger(settings)
+    init_logging()
+    asyncio.run(main(args.concurrency))
@@ -0,0 +1,162 @@
+"""
+queue.py
+----------
+
+Redis-backed durable queue for ingestion jobs.
+
+Jobs are stored under `ingestion:{task_id}:job` and their ids move between
+three structures:
+
+- `ingestion:queue:pending`: list of jobs ready to run.
+- `ingestion:queue:leases`: sorted set of running jobs scored by the time
+  their lease expires. Workers extend the lease while a job runs, and jobs
+  whose lease expired (e.g. the worker died) are put back on the queue.
+- `ingestion:queue:delayed`: sorted set of failed jobs scored by the time
+  their retry becomes due.
+"""
+import time
+from typing import Optional
+
+import orjson
+import structlog
+from pydantic import BaseModel
+from redis.asyncio import Redis
+
+from stack.app.core.configuration import get_settings
+from stack.app.core.redis import RedisService
+from stack.app.schema.rag import IngestRequestPayload
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+PENDING_KEY = "ingestion:queue:pending"
+LEASES_KEY = "ingestion:queue:leases"
+DELAYED_KEY = "ingestion:queue:delayed"
+
+# Pops the next pending job and leases it in a single atomic step
+_LEASE_NEXT_JOB = """
+local task_id = redis.call('LPOP', KEYS[1])
+if task_id then
+    redis.call('ZADD', KEYS[2], ARGV[1], task_id)
+end
+return task_id
+"""
+
+# Moves every member of a sorted set scored at or below ARGV[1] back onto the queue
+_REQUEUE_DUE_JOBS = """
+local task_ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, task_id in ipairs(task_ids) do
+    redis.call('ZREM', KEYS[1], task_id)
+    redis.call('RPUSH', KEYS[2], task_id)
+end
+return #task_ids
+"""
+
+
+class IngestionJob(BaseModel):
+    task_id: str
+    payload: IngestRequestPayload
+    attempts: int = 0
+
+
+class IngestionJobQueue:
+    def __init__(
+        self,
+        redis: Redis,
+        visibility_timeout: int = settings.INGESTION_VISIBILITY_TIMEOUT,
+        max_retries: int = settings.INGESTION_MAX_RETRIES,
+        retry_backoff: int = settings.INGESTION_RETRY_BACKOFF,
+    ):
+        self.redis = redis
+        self.redis_service = RedisService(redis)
+        self.visibility_timeout = visibility_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._lease_next_job = redis.register_script(_LEASE_NEXT_JOB)
+        self._requeue_due_jobs = redis.register_script(_REQUEUE_DUE_JOBS)
+
+    @staticmethod
+    def _job_key(task_id: str) -> str:
+        return f"ingestion:{task_id}:job"
+
+    async def _save(self, job: IngestionJob) -> None:
+        await self.redis.set(self._job_key(job.task_id), job.model_dump_json())
+
+    async def enqueue(self, task_id: str, payload: IngestRequestPayload) -> None:
+        await self._save(IngestionJob(task_id=task_id, payload=payload))
+        await self.redis.rpush(PENDING_KEY, task_id)
+        await self.redis_service.set_ingestion_status(task_id, "queued")
+
+    async def dequeue(self) -> Optional[IngestionJob]:
+        """Lease the next pending job, or return None if the queue is
+        empty."""
+        task_id = await self._lease_next_job(
+            keys=[PENDING_KEY, LEASES_KEY],
+            args=[time.time() + self.visibility_timeout],
+        )
+        if task_id is None:
+            return None
+        task_id = task_id.decode("utf-8") if isinstance(task_id, bytes) else task_id
+
+        data = await self.redis.get(self._job_key(task_id))
+        if data is None:
+            logger.warning(f"Ingestion job {task_id} has no stored payload")
+            await self.redis.zrem(LEASES_KEY, task_id)
+            return None
+
+        job = IngestionJob.model_validate(orjson.loads(data))
+        job.attempts += 1
+        # Jobs requeued after their lease expired count as an attempt too
+        if job.attempts > self.max_retries + 1:
+            await self._give_up(job, "Exceeded maximum number of attempts")
+            return None
+        await self._save(job)
+        return job
+
+    async def extend_lease(self, job: IngestionJob) -> None:
+        await self.redis.zadd(
+            LEASES_KEY,
+            {job.task_id: time.time() + self.visibility_timeout},
+            xx=True,
+        )
+
+    async def ack(self, job: IngestionJob) -> None:
+        await self.redis.zrem(LEASES_KEY, job.task_id)
+        await self.redis.delete(self._job_key(job.task_id))
+
+    async def fail(self, job: IngestionJob, error: Exception) -> None:
+        """Schedule a retry with exponential backoff, or mark the job as
+        failed once its retries are exhausted."""
+        if job.attempts > self.max_retries:
+            await self._give_up(job, str(error))
+            return
+
+        delay = self.retry_backoff * 2 ** (job.attempts - 1)
+        await self.redis.zrem(LEASES_KEY, job.task_id)
+        await self.redis.zadd(DELAYED_KEY, {job.task_id: time.time() + delay})
+        await self.redis_service.set_ingestion_status(job.task_id, "retrying")
+        await self.redis_service.push_progress_message(
+            job.task_id,
+            f"Attempt {job.attempts} failed: {error}. Retrying in {delay} seconds",
+        )
+
+    async def _give_up(self, job: IngestionJob, reason: str) -> None:
+        await self.redis.zrem(LEASES_KEY, job.task_id)
+        await self.redis.delete(self._job_key(job.task_id))
+        await self.redis_service.set_ingestion_status(job.task_id, "failed")
+        await self.redis_service.push_progress_message(
+            job.task_id, f"Error: {reason}"
+        )
+
+    async def requeue_due_jobs(self) -> int:
+        """Requeue retries that are due and jobs whose lease expired."""
+        now = time.time()
+        retried = await self._requeue_due_jobs(
+            keys=[DELAYED_KEY, PENDING_KEY], args=[now]
+        )
+        expired = await self._requeue_due_jobs(
+            keys=[LEASES_KEY, PENDING_KEY], args=[now]
+        )
+        if expired:
+            logger.warning(f"Requeued {expired} ingestion jobs with expired leases")
+        return retried + expired
@@ -0,0 +1,124 @@
+import asyncio
+import itertools
+from unittest.mock import patch
+
+from stack.app.cache import backends
+from stack.app.cache.backends import DiskCacheBackend, RedisCacheBackend, make_cache_key
+from stack.app.cache.embedding_cache import EmbeddingCache, get_encoder_namespace
+
+
+def make_backend(path, max_size_bytes: int) -> DiskCacheBackend:
+    return DiskCacheBackend(path, max_size_bytes=max_size_bytes, table="embeddings")
+
+
+class FakeEncoder:
+    type = "openai"
+    name = "text-embedding-3-small"
+    dimensions = 3
+
+
+def test_cache_key_ignores_whitespace_and_unicode_form() -> None:
+    namespace = get_encoder_namespace(FakeEncoder())
+    assert namespace == "openai:text-embedding-3-small:3"
+    assert make_cache_key(namespace, "  café\n au  lait ") == (
+        make_cache_key(namespace, "café au lait")
+    )
+    assert make_cache_key(namespace, "a b") != make_cache_key(namespace, "ab")
+
+
+def test_cache_keys_are_separated_by_encoder(tmp_path) -> None:
+    other_encoder = FakeEncoder()
+    other_encoder.dimensions = 1536
+    cache = EmbeddingCache(make_backend(tmp_path / "embeddings.sqlite3", 10**6))
+
+    async def run():
+        await cache.set_many(FakeEncoder(), ["text"], [[1.0, 2.0, 3.0]])
+        return (
+            await cache.get_many(FakeEncoder(), ["text"]),
+            await cache.get_many(other_encoder, ["text"]),
+        )
+
+    assert asyncio.run(run()) == ([[1.0, 2.0, 3.0]], [None])
+
+
+def test_cache_counts_hits_and_misses(tmp_path) -> None:
+    cache = EmbeddingCache(make_backend(tmp_path / "embeddings.sqlite3", 10**6))
+
+    async def run():
+        await cache.set_many(FakeEncoder(), ["one", "two"], [[1.0] * 3, [2.0] * 3])
+        return await cache.get_many(FakeEncoder(), ["two", "three", " one"])
+
+    assert asyncio.run(run()) == [[2.0] * 3, None, [1.0] * 3]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_ratio"] == 2 / 3
+
+
+def test_disk_backend_evicts_least_recently_accessed(tmp_path) -> None:
+    # Three vectors of 12 bytes do not fit in 30 bytes
+    backend = make_backend(tmp_path / "embeddings.sqlite3", 30)
+    value = bytes(12)
+    with patch.object(backends.time, "time", side_effect=itertools.count()):
+        backend._set_many({"a": value, "b": value})
+        backend._get_many(["a"])
+        backend._set_many({"c": value})
+    assert backend._get_many(["a", "b", "c"]) == [value, None, value]
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    def set(self, *args, **kwargs) -> None:
+        self.calls.append(("set", args, kwargs))
+
+    def zadd(self, *args) -> None:
+        self.calls.append(("zadd", args, {}))
+
+    async def execute(self) -> list:
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.calls
+        ]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values: dict[str, bytes] = {}
+        self.counters: dict[str, int] = {}
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    async def set(self, key: str, value: bytes, nx: bool = False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def zadd(self, key: str, mapping: dict) -> int:
+        return len(mapping)
+
+    async def incrby(self, key: str, amount: int) -> int:
+        self.counters[key] = self.counters.get(key, 0) + amount
+        return self.counters[key]
+
+
+def test_redis_backend_counts_only_inserted_keys() -> None:
+    redis = FakeRedis()
+    backend = RedisCacheBackend(redis, max_size_bytes=10**6, prefix="embedding_cache")
+
+    async def run():
+        await backend.set_many({"a": bytes(12), "b": bytes(12)})
+        await backend.set_many({"a": bytes(12), "b": bytes(12)})
+        await backend.set_many({"b": bytes(12), "c": bytes(12)})
+
+    asyncio.run(run())
+    assert redis.counters[backend.size_key] == 36
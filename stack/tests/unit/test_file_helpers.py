@@ -0,0 +1,38 @@
+import pytest
+
+from stack.app.utils.file_helpers import (
+    iter_csv_records,
+    iter_json_records,
+    parse_csv_file,
+    parse_json_file,
+)
+
+
+def test_iter_json_records_yields_items() -> None:
+    records = iter_json_records(
+        b'[{"page_content": "a", "n": 1.5}, {"page_content": "b"}]'
+    )
+
+    assert next(records) == {"page_content": "a", "n": 1.5}
+    assert list(records) == [{"page_content": "b"}]
+
+
+def test_iter_json_records_matches_parse_json_file() -> None:
+    content = b' [{"page_content": "caf\\u00e9", "tags": ["x", "y"]}, {"id": 2}]'
+    assert list(iter_json_records(content)) == parse_json_file(content)
+
+
+@pytest.mark.parametrize("content", [b'{"page_content": "a"}', b"[{]"])
+def test_iter_json_records_rejects_invalid_files(content: bytes) -> None:
+    with pytest.raises(ValueError):
+        list(iter_json_records(content))
+
+
+def test_iter_csv_records() -> None:
+    content = 'page_content,source\n"Line one,\nline two",a.pdf\nnaïve,b.pdf\n'.encode()
+
+    assert list(iter_csv_records(content)) == [
+        {"page_content": "Line one,\nline two", "source": "a.pdf"},
+        {"page_content": "naïve", "source": "b.pdf"},
+    ]
+    assert parse_csv_file(content) == list(iter_csv_records(content))
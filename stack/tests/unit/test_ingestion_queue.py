@@ -0,0 +1,165 @@
+import asyncio
+from unittest.mock import patch
+
+from stack.app.schema.rag import IngestRequestPayload
+from stack.app.workers import queue as queue_module
+from stack.app.workers.queue import (
+    DELAYED_KEY,
+    LEASES_KEY,
+    PENDING_KEY,
+    IngestionJobQueue,
+)
+
+
+class FakeRedis:
+    """In-memory Redis with the commands used by the queue. The Lua scripts
+    are emulated by their Python equivalent."""
+
+    def __init__(self):
+        self.values: dict[str, bytes] = {}
+        self.lists: dict[str, list] = {}
+        self.sorted_sets: dict[str, dict[str, float]] = {}
+
+    def register_script(self, script: str):
+        async def lease_next_job(keys, args):
+            pending = self.lists.get(keys[0], [])
+            if not pending:
+                return None
+            task_id = pending.pop(0)
+            self.sorted_sets.setdefault(keys[1], {})[task_id] = args[0]
+            return task_id.encode("utf-8")
+
+        async def requeue_due_jobs(keys, args):
+            members = self.sorted_sets.setdefault(keys[0], {})
+            due = sorted(
+                (score, task_id)
+                for task_id, score in members.items()
+                if score <= args[0]
+            )
+            for _, task_id in due:
+                del members[task_id]
+                self.lists.setdefault(keys[1], []).append(task_id)
+            return len(due)
+
+        return lease_next_job if "LPOP" in script else requeue_due_jobs
+
+    async def get(self, key: str):
+        return self.values.get(key)
+
+    async def set(self, key: str, value) -> None:
+        self.values[key] = value.encode("utf-8") if isinstance(value, str) else value
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.values.pop(key, None)
+
+    async def rpush(self, key: str, value: str) -> None:
+        self.lists.setdefault(key, []).append(value)
+
+    async def zadd(self, key: str, mapping: dict, xx: bool = False) -> None:
+        members = self.sorted_sets.setdefault(key, {})
+        for member, score in mapping.items():
+            if not xx or member in members:
+                members[member] = score
+
+    async def zrem(self, key: str, member: str) -> None:
+        self.sorted_sets.get(key, {}).pop(member, None)
+
+    def status(self, task_id: str) -> str:
+        return self.values[f"ingestion:{task_id}:status"].decode("utf-8")
+
+
+PAYLOAD = IngestRequestPayload(index_name="documents", files=[])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_queue(redis: FakeRedis) -> IngestionJobQueue:
+    return IngestionJobQueue(
+        redis, visibility_timeout=60, max_retries=2, retry_backoff=10
+    )
+
+
+def test_expired_lease_requeues_job() -> None:
+    redis, clock = FakeRedis(), Clock()
+    queue = make_queue(redis)
+
+    async def run():
+        await queue.enqueue("task", PAYLOAD)
+        job = await queue.dequeue()
+        clock.now += 30
+        await queue.extend_lease(job)
+        clock.now += 59
+        assert await queue.requeue_due_jobs() == 0
+        clock.now += 1
+        assert await queue.requeue_due_jobs() == 1
+        return await queue.dequeue()
+
+    with patch.object(queue_module.time, "time", clock):
+        job = asyncio.run(run())
+    assert job.task_id == "task"
+    assert job.attempts == 2
+
+
+def test_failed_jobs_are_retried_with_exponential_backoff() -> None:
+    redis, clock = FakeRedis(), Clock()
+    queue = make_queue(redis)
+
+    async def run():
+        await queue.enqueue("task", PAYLOAD)
+        delays = []
+        for _ in range(2):
+            job = await queue.dequeue()
+            await queue.fail(job, RuntimeError("boom"))
+            delays.append(redis.sorted_sets[DELAYED_KEY]["task"] - clock.now)
+            assert redis.status("task") == "retrying"
+            assert "task" not in redis.sorted_sets[LEASES_KEY]
+            clock.now += delays[-1]
+            assert await queue.requeue_due_jobs() == 1
+        return delays
+
+    with patch.object(queue_module.time, "time", clock):
+        assert asyncio.run(run()) == [10, 20]
+
+
+def test_job_fails_after_max_attempts() -> None:
+    redis, clock = FakeRedis(), Clock()
+    queue = make_queue(redis)
+
+    async def run():
+        await queue.enqueue("task", PAYLOAD)
+        for _ in range(3):
+            job = await queue.dequeue()
+            await queue.fail(job, RuntimeError("boom"))
+            clock.now += 3600
+            await queue.requeue_due_jobs()
+
+    with patch.object(queue_module.time, "time", clock):
+        asyncio.run(run())
+    assert redis.status("task") == "failed"
+    assert "ingestion:task:job" not in redis.values
+    assert not redis.lists.get(PENDING_KEY)
+    assert not redis.sorted_sets[DELAYED_KEY]
+
+
+def test_job_requeued_by_expired_leases_fails_after_max_attempts() -> None:
+    redis, clock = FakeRedis(), Clock()
+    queue = make_queue(redis)
+
+    async def run():
+        await queue.enqueue("task", PAYLOAD)
+        for _ in range(3):
+            assert await queue.dequeue() is not None
+            clock.now += 61
+            await queue.requeue_due_jobs()
+        return await queue.dequeue()
+
+    with patch.object(queue_module.time, "time", clock):
+        assert asyncio.run(run()) is None
+    assert redis.status("task") == "failed"
@@ -0,0 +1,44 @@
+import asyncio
+
+from stack.app.cache.backends import DiskCacheBackend
+from stack.app.cache.summary_cache import SummaryCache
+
+
+def make_backend(path, max_size_bytes: int) -> DiskCacheBackend:
+    return DiskCacheBackend(path, max_size_bytes=max_size_bytes, table="summaries")
+
+
+def test_summary_cache_round_trip(tmp_path) -> None:
+    cache = SummaryCache(make_backend(tmp_path / "summaries.sqlite3", 10**6))
+
+    async def run():
+        await cache.set_many(["page one", "page two"], ["summary one", "summary two"])
+        return await cache.get_many(["page  two ", "page three", "page one"])
+
+    assert asyncio.run(run()) == ["summary two", None, "summary one"]
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_summary_cache_evicts_least_recently_used(tmp_path) -> None:
+    backend = make_backend(tmp_path / "summaries.sqlite3", 20)
+    cache = SummaryCache(backend)
+
+    async def run():
+        await cache.set_many(["first"], ["x" * 15])
+        await cache.set_many(["second"], ["y" * 15])
+        return await cache.get_many(["first", "second"])
+
+    assert asyncio.run(run()) == [None, "y" * 15]
+
+
+def test_summary_and_embedding_caches_share_a_file_apart(tmp_path) -> None:
+    path = tmp_path / "cache.sqlite3"
+    summaries = make_backend(path, 10**6)
+    embeddings = DiskCacheBackend(path, max_size_bytes=10**6, table="embeddings")
+
+    async def run():
+        await summaries.set_many({"key": b"summary"})
+        await embeddings.set_many({"key": b"vector"})
+        return await summaries.get_many(["key"]), await embeddings.get_many(["key"])
+
+    assert asyncio.run(run()) == ([b"summary"], [b"vector"])